@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Benchmarks rendering of personalized recommendation digests.
+
+    python benchmarks/bench_email_render.py --digests 10000
+
+The previous implementation (pandas read + iterrows per email) is timed
+on a small sample with --legacy and extrapolated.
+"""
+
+# pylint: disable=wrong-import-position
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.email_render import (
+    GENRE_COLORS,
+    load_movie_genres,
+    render_feedback_emails,
+    set_movie_genres,
+)
+
+GENRES = sorted(GENRE_COLORS)
+
+
+def write_catalogue(path, movies, rng):
+    """
+    Writes a synthetic movies.csv with `movies` titles
+    """
+    with open(path, "w", encoding="utf8") as f:
+        f.write("movieId,title,genres,imdb_id\n")
+        for i in range(movies):
+            genres = "|".join(rng.sample(GENRES, rng.randint(1, 4)))
+            f.write(f'{i},"Movie {i} ({1950 + i % 70})",{genres},tt{i:07d}\n')
+
+
+def make_digests(count, movies, rng):
+    """
+    Builds categorized feedback for `count` users
+    """
+    titles = [f"Movie {i} ({1950 + i % 70})" for i in range(movies)]
+    return [
+        {
+            "Liked": rng.sample(titles, 4),
+            "Disliked": rng.sample(titles, 2),
+            "Yet to Watch": rng.sample(titles, 4),
+        }
+        for _ in range(count)
+    ]
+
+
+def legacy_render(csv_path, categorized_data):
+    """
+    The per-email rendering path this module replaced
+    """
+    # pylint: disable=import-outside-toplevel
+    import pandas as pd
+    from src.recommenderapp.utils import create_colored_tags, create_movie_genres
+
+    movie_to_genres = create_movie_genres(pd.read_csv(csv_path))
+    return "".join(
+        f"<li>{movie} {create_colored_tags(movie_to_genres.get(movie, ['Unknown Genre']))}</li>"
+        for key in ("Liked", "Disliked", "Yet to Watch")
+        for movie in categorized_data[key]
+    )
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--digests", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=45000)
+    parser.add_argument("--legacy", type=int, default=0, help="legacy sample size")
+    args = parser.parse_args()
+
+    rng = random.Random(510)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "movies.csv")
+        write_catalogue(csv_path, args.movies, rng)
+        digests = make_digests(args.digests, args.movies, rng)
+
+        start = time.perf_counter()
+        set_movie_genres(load_movie_genres(csv_path))
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rendered = render_feedback_emails(digests)
+        render_time = time.perf_counter() - start
+        print(f"genre map load: {load_time * 1000:.1f} ms ({args.movies} titles)")
+        print(
+            f"rendered {len(rendered)} digests in {render_time:.2f} s "
+            f"({len(rendered) / render_time:,.0f}/s)"
+        )
+
+        if args.legacy:
+            start = time.perf_counter()
+            for categorized_data in digests[: args.legacy]:
+                legacy_render(csv_path, categorized_data)
+            per_email = (time.perf_counter() - start) / args.legacy
+            print(
+                f"legacy: {per_email * 1000:.1f} ms/email, "
+                f"~{per_email * args.digests:.0f} s for {args.digests} digests"
+            )
+
+
+if __name__ == "__main__":
+    main()
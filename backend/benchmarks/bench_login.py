@@ -0,0 +1,134 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Measures login throughput and latency under concurrent clients.
+
+    python benchmarks/bench_login.py --clients 32 --logins 10 --rounds 12
+
+Every client thread logs in repeatedly through login_to_account against a
+temporary SQLite database, with hashing on the bcrypt pool. While the
+storm runs, a probe thread times a trivial query every 10ms to show how
+much the logins delay the other requests of the same process. Logins
+rejected because the pool is saturated are counted separately.
+"""
+
+# pylint: disable=wrong-import-position
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp import passwords
+from src.recommenderapp.io_pool import Bulkhead, UpstreamBusy
+from src.recommenderapp.storage import SQLiteStorage
+from src.recommenderapp.utils import create_account, login_to_account
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of a list of samples
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(storage, clients, logins):
+    """
+    Runs the login storm and returns (logins/s, latencies, rejected, probe latencies)
+    """
+    latencies, rejected, probes = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def client(number):
+        db = storage.connect()
+        try:
+            for _ in range(logins):
+                started = time.perf_counter()
+                try:
+                    login_to_account(db, f"user{number}", "password")
+                except UpstreamBusy:
+                    with lock:
+                        rejected.append(1)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            storage.release(db)
+
+    def probe():
+        db = storage.connect()
+        try:
+            while not done.is_set():
+                started = time.perf_counter()
+                db.execute("SELECT COUNT(*) FROM Users").fetchone()
+                probes.append(time.perf_counter() - started)
+                time.sleep(0.01)
+        finally:
+            storage.release(db)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+    return len(latencies) / elapsed, latencies, len(rejected), probes
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=5, help="logins per client")
+    parser.add_argument("--rounds", type=int, default=passwords.bcrypt_rounds())
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--backlog", type=int, default=None)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    backlog = args.clients if args.backlog is None else args.backlog
+    passwords.BCRYPT = Bulkhead("bcrypt", args.workers, max_pending=backlog, timeout=60.0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+        db = storage.connect()
+        for i in range(args.clients):
+            create_account(db, f"user{i}@example.com", f"user{i}", "password")
+        storage.release(db)
+        rate, latencies, rejected, probes = run(storage, args.clients, args.logins)
+
+    print(
+        f"{args.clients} clients x {args.logins} logins, cost {args.rounds}, "
+        f"{args.workers} hashing workers, backlog {backlog}"
+    )
+    print(f"  throughput: {rate:,.1f} logins/s, rejected: {rejected}")
+    if latencies:
+        print(
+            f"  login latency: p50 {statistics.median(latencies) * 1000:,.0f}ms, "
+            f"p95 {percentile(latencies, 0.95) * 1000:,.0f}ms"
+        )
+    if probes:
+        print(
+            f"  other requests: p50 {statistics.median(probes) * 1000:,.2f}ms, "
+            f"max {max(probes) * 1000:,.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Benchmarks the recommenders, the search and the title lookups on synthetic catalogues.
+
+    python benchmarks/bench_recommender.py --sizes 10000,100000,1000000
+    python benchmarks/bench_recommender.py --sizes 10000 --compare benchmarks/results/abc1234.json
+
+Catalogues have MovieLens-like genre frequencies and Zipf-distributed
+directors, actors and title words, so a few names appear in many movies
+as in the real data. They are cached in --cache-dir per size and seed.
+
+Every code path runs in a fresh process for every size, which reports the
+cold load time, the latency of the first request (lazy builds included),
+p50/p95/p99 of the following requests and the peak RSS over the process
+after its imports. Results are written to benchmarks/results/<commit>.json;
+--compare prints the change against an earlier results file and exits
+with 1 if any path got slower or bigger than --threshold allows.
+"""
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_DIR))
+
+# Approximate share of each genre among the MovieLens genre tags
+GENRE_WEIGHTS = {
+    "Drama": 25.0,
+    "Comedy": 17.0,
+    "Thriller": 8.0,
+    "Romance": 7.0,
+    "Action": 7.0,
+    "Horror": 5.0,
+    "Documentary": 5.0,
+    "Crime": 5.0,
+    "Adventure": 4.0,
+    "Sci-Fi": 3.0,
+    "Mystery": 3.0,
+    "Fantasy": 2.5,
+    "Children": 2.5,
+    "Animation": 2.5,
+    "War": 1.5,
+    "Musical": 1.0,
+    "Western": 1.0,
+    "Film-Noir": 0.3,
+    "IMAX": 0.2,
+}
+
+SYLLABLES = (
+    "ka ri to ma ne so la vi de mo ru pa ze li no ta be gu fi ha jo ke lu mi na "
+    "pe ro sa te vo"
+).split()
+
+PATHS = (
+    "recommend_for_new_user",
+    "recommend_for_users",
+    "search_movies",
+    "text_search",
+    "db_title_lookup",
+    "db_title_resolve",
+)
+
+# Number of inputs stored per kind; runs use the first --requests + 1
+QUERIES = 1000
+
+
+def zipf_weights(count, exponent):
+    """
+    Probabilities of ranks 1..count under a Zipf law
+    """
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def make_words(count, rng, syllables):
+    """
+    `count` distinct capitalized pseudo-words of `syllables` syllables
+    """
+    base = len(SYLLABLES)
+    words = []
+    for number in rng.permutation(base**syllables)[:count]:
+        parts = []
+        for _ in range(syllables):
+            number, digit = divmod(int(number), base)
+            parts.append(SYLLABLES[digit])
+        words.append("".join(parts).capitalize())
+    return words
+
+
+def make_people(count, rng):
+    """
+    `count` distinct "First Last" names, in random order
+    """
+    first = make_words(600, rng, 2)
+    last = make_words(max(2000, count // len(first) + 1), rng, 3)
+    people = [f"{first[i % len(first)]} {last[i // len(first)]}" for i in range(count)]
+    return [people[i] for i in rng.permutation(count)]
+
+
+def pick_genres(movies, rng, chunk=100_000):
+    """
+    1 to 4 distinct genres per movie, weighted by GENRE_WEIGHTS
+    """
+    names = np.array(list(GENRE_WEIGHTS))
+    log_weights = np.log(np.array(list(GENRE_WEIGHTS.values())))
+    counts = rng.choice([1, 2, 3, 4], size=movies, p=[0.35, 0.35, 0.2, 0.1])
+    genres = []
+    for start in range(0, movies, chunk):
+        # Gumbel top-k: weighted sampling without replacement for a whole chunk at once
+        keys = log_weights + rng.gumbel(size=(min(chunk, movies - start), len(names)))
+        order = np.argsort(-keys, axis=1)
+        for row, count in zip(order, counts[start : start + chunk]):
+            genres.append("|".join(names[row[:count]]))
+    return genres
+
+
+def pick_people(pool, per_movie, rng, exponent):
+    """
+    Comma-separated names per movie, drawn with Zipf popularity from pool
+    """
+    draws = rng.choice(len(pool), size=int(per_movie.sum()), p=zipf_weights(len(pool), exponent))
+    people = []
+    offset = 0
+    for count in per_movie:
+        people.append(", ".join(dict.fromkeys(pool[i] for i in draws[offset : offset + count])))
+        offset += count
+    return people
+
+
+def write_catalogue(path, movies, rng):
+    """
+    Writes a synthetic movies.csv with `movies` movies and returns its
+    titles, genres, directors and actors columns
+    """
+    vocabulary = make_words(600, rng, 2) + make_words(5000, rng, 3)
+    word_draws = rng.choice(len(vocabulary), size=movies * 4, p=zipf_weights(len(vocabulary), 1.0))
+    lengths = rng.choice([1, 2, 3, 4], size=movies, p=[0.3, 0.35, 0.25, 0.1])
+    articles = rng.random(movies) < 0.15
+    years = np.clip(2024 - rng.exponential(20, size=movies).astype(int), 1900, 2024)
+    titles = []
+    for i in range(movies):
+        name = " ".join(vocabulary[w] for w in word_draws[i * 4 : i * 4 + lengths[i]])
+        titles.append(f"{'The ' if articles[i] else ''}{name} ({years[i]})")
+
+    genres = pick_genres(movies, rng)
+    directors = pick_people(
+        make_people(movies // 4 + 10, rng), rng.choice([1, 2], size=movies, p=[0.9, 0.1]), rng, 1.1
+    )
+    actors = pick_people(
+        make_people(movies + 50, rng), rng.choice([2, 3, 4], size=movies, p=[0.2, 0.3, 0.5]), rng, 1.2
+    )
+    ratings = np.clip(rng.normal(6.3, 1.1, size=movies), 1.0, 10.0).round(1)
+    unrated = rng.random(movies) < 0.03
+
+    with open(path, "w", encoding="utf8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["movieId", "title", "genres", "imdb_id", "director", "actors", "imdb_ratings"])
+        for i in range(movies):
+            writer.writerow(
+                [
+                    i + 1,
+                    titles[i],
+                    genres[i],
+                    f"tt{i + 1:07d}",
+                    directors[i],
+                    actors[i],
+                    "No Rating Found" if unrated[i] else ratings[i],
+                ]
+            )
+    return titles, genres, directors, actors
+
+
+def make_queries(titles, genres, directors, actors, rng):
+    """
+    Request inputs for every path, drawn from the catalogue
+    """
+    def sample(values, count):
+        return [values[i] for i in rng.integers(0, len(values), size=count)]
+
+    # Each user rates 5 distinct titles, as the app sends them
+    users = [
+        [
+            {"title": title, "rating": int(rng.integers(1, 11))}
+            for title in dict.fromkeys(sample(titles, 5))
+        ]
+        for _ in range(QUERIES)
+    ]
+    words = []
+    for title in sample(titles, QUERIES):
+        word = rng.choice(title.rsplit(" (", 1)[0].split()).lower()
+        words.append(word[: int(rng.integers(3, len(word) + 1))])
+    texts = [
+        f"{rng.choice(genre.split('|'))} with {rng.choice(cast.split(', '))} "
+        f"by {rng.choice(director.split(', '))}"
+        for genre, director, cast in zip(
+            sample(genres, QUERIES), sample(directors, QUERIES), sample(actors, QUERIES)
+        )
+    ]
+    return {
+        "users": users,
+        "words": words,
+        "texts": texts,
+        "titles": sample(titles, QUERIES),
+        "title_batches": [sample(titles, 5) for _ in range(QUERIES)],
+    }
+
+
+def ensure_catalogue(cache_dir, movies, seed):
+    """
+    Returns (movies.csv, queries.json) for the size and seed, generating them once
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.join(cache_dir, f"movies-{movies}-{seed}")
+    if not os.path.exists(stem + ".json"):
+        rng = np.random.default_rng(seed)
+        started = time.perf_counter()
+        columns = write_catalogue(stem + ".csv", movies, rng)
+        with open(stem + ".json.tmp", "w", encoding="utf8") as f:
+            json.dump(make_queries(*columns, rng), f)
+        os.replace(stem + ".json.tmp", stem + ".json")
+        print(f"Generated {movies:,} movies in {time.perf_counter() - started:.1f}s", flush=True)
+    return stem + ".csv", stem + ".json"
+
+
+def setup_path(path, catalogue, queries, workdir):
+    """
+    Returns (load, request, inputs) for one code path on the catalogue
+    """
+    from src.prediction_scripts import item_based, text_based
+    from src.recommenderapp import search
+
+    item_based.MOVIES_CSV_PATH = catalogue
+    search.MOVIES_CSV_PATH = catalogue
+
+    if path == "recommend_for_new_user":
+        return item_based.load_and_preprocess_data, item_based.recommend_for_new_user_all, queries[
+            "users"
+        ]
+    if path == "recommend_for_users":
+        return (
+            item_based._get_batch_index,  # pylint: disable=protected-access
+            lambda user: item_based.recommend_for_users([user], 0.5, 0.3, 0.3),
+            queries["users"],
+        )
+    if path == "search_movies":
+        return search.get_search_table, search.Search().search_movies, queries["words"]
+    if path == "text_search":
+        return text_based.get_text_index, text_based.recommend_from_text, queries["texts"]
+
+    import sqlite3
+
+    from src.recommenderapp.titles import TitleResolver
+    from src.recommenderapp.utils import get_imdb_id_by_name, init_db
+
+    db_name = os.path.join(workdir, "movies.db")
+    os.environ["MOVIES_SQL_PATH"] = os.path.join(workdir, "missing.sql")
+    os.environ["MOVIES_CSV_PATH"] = catalogue
+    db = {}
+
+    def load():
+        init_db(override=True, db_name=db_name, use_template=False)
+        db["conn"] = sqlite3.connect(db_name)
+
+    if path == "db_title_lookup":
+        return load, lambda title: get_imdb_id_by_name(db["conn"], title), queries["titles"]
+    resolver = TitleResolver(fallback=None)
+    return load, lambda titles: resolver.resolve(db["conn"], titles), queries["title_batches"]
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far
+    """
+    # On Linux ru_maxrss starts from the parent's peak; VmHWM is this process's own
+    try:
+        with open("/proc/self/status", encoding="utf8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list
+    """
+    rank = max(1, int(np.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def run_path(path, catalogue, queries_path, requests, max_seconds):
+    """
+    Measures one code path in this process and returns its results
+    """
+    with open(queries_path, encoding="utf8") as f:
+        queries = json.load(f)
+    with tempfile.TemporaryDirectory() as workdir:
+        load, request, inputs = setup_path(path, catalogue, queries, workdir)
+        baseline = peak_rss_mb()
+
+        started = time.perf_counter()
+        load()
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        request(inputs[0])
+        first = time.perf_counter() - started
+
+        latencies = []
+        deadline = time.perf_counter() + max_seconds
+        for value in inputs[1 : requests + 1]:
+            started = time.perf_counter()
+            request(value)
+            latencies.append(time.perf_counter() - started)
+            if started > deadline:
+                break
+    latencies.sort()
+    return {
+        "load_s": load_seconds,
+        "first_request_ms": first * 1000,
+        "requests": len(latencies),
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "added_rss_mb": peak_rss_mb() - baseline,
+    }
+
+
+def measure(path, movies, catalogue, queries_path, args):
+    """
+    Runs one code path on one catalogue in a fresh process
+    """
+    command = [
+        sys.executable,
+        __file__,
+        "--run",
+        path,
+        "--catalogue",
+        catalogue,
+        "--queries",
+        queries_path,
+        "--requests",
+        str(args.requests),
+        "--max-seconds",
+        str(args.max_seconds),
+    ]
+    result = {"path": path, "movies": movies}
+    try:
+        done = subprocess.run(
+            command, cwd=BACKEND_DIR, capture_output=True, text=True, timeout=args.timeout, check=False
+        )
+    except subprocess.TimeoutExpired:
+        return {**result, "error": f"timed out after {args.timeout}s"}
+    if done.returncode != 0:
+        return {**result, "error": done.stderr.strip().splitlines()[-1] if done.stderr else "failed"}
+    return {**result, **json.loads(done.stdout.strip().splitlines()[-1])}
+
+
+def git_label():
+    """
+    Short hash of HEAD, suffixed with -dirty when the tree has changes
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def format_row(result):
+    """
+    One line of the results table
+    """
+    head = f"{result['path']:<24}{result['movies']:>10,}"
+    if "error" in result:
+        return f"{head}  {result['error']}"
+    return (
+        f"{head}{result['load_s']:>10.2f}{result['first_request_ms']:>11.1f}"
+        f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        f"{result['peak_rss_mb']:>10.0f}{result['added_rss_mb']:>10.0f}"
+    )
+
+
+COMPARED = ("load_s", "p50_ms", "p95_ms", "peak_rss_mb")
+
+
+def compare(baseline_path, report, threshold):
+    """
+    Prints current / baseline ratios and returns the number of regressions
+    """
+    with open(baseline_path, encoding="utf8") as f:
+        baseline = json.load(f)
+    before = {(r["path"], r["movies"]): r for r in baseline["results"] if "error" not in r}
+    print(f"\nAgainst {baseline['label']} (ratios, * = worse than x{threshold}):")
+    print(f"{'path':<24}{'movies':>10}" + "".join(f"{name:>14}" for name in COMPARED))
+    regressions = 0
+    for result in report["results"]:
+        old = before.get((result["path"], result["movies"]))
+        if old is None or "error" in result:
+            continue
+        cells = []
+        for name in COMPARED:
+            ratio = result[name] / old[name] if old[name] else 1.0
+            worse = ratio > threshold
+            regressions += worse
+            cells.append(f"{ratio:>13.2f}{'*' if worse else ' '}")
+        print(f"{result['path']:<24}{result['movies']:>10,}" + "".join(cells))
+    return regressions
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--paths", default=",".join(PATHS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--max-seconds", type=float, default=60, help="request budget per path")
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds per path and size")
+    parser.add_argument("--seed", type=int, default=510)
+    parser.add_argument(
+        "--cache-dir", default=os.path.join(tempfile.gettempdir(), "bingesuggest-bench")
+    )
+    parser.add_argument("--out", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--catalogue", help=argparse.SUPPRESS)
+    parser.add_argument("--queries", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        result = run_path(args.run, args.catalogue, args.queries, args.requests, args.max_seconds)
+        print(json.dumps(result))
+        return
+
+    label = git_label()
+    report = {
+        "label": label,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "results": [],
+    }
+    print(
+        f"{'path':<24}{'movies':>10}{'load s':>10}{'first ms':>11}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}{'added MB':>10}"
+    )
+    for movies in (int(size) for size in args.sizes.split(",")):
+        catalogue, queries_path = ensure_catalogue(args.cache_dir, movies, args.seed)
+        for path in args.paths.split(","):
+            result = measure(path, movies, catalogue, queries_path, args)
+            report["results"].append(result)
+            print(format_row(result), flush=True)
+
+    out = args.out or os.path.join(BACKEND_DIR, "benchmarks", "results", f"{label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
+
+    if args.compare and compare(args.compare, report, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Compares concurrent write throughput of the storage backends.
+
+    python benchmarks/bench_storage.py --threads 8 --writes 500
+    DB_BACKEND=mysql DB_PASSWORD=root python benchmarks/bench_storage.py
+"""
+
+# pylint: disable=wrong-import-position
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.storage import SQLiteStorage, create_storage
+
+
+def run(storage, threads, writes):
+    """
+    Runs `threads` writers doing `writes` single-row transactions each and
+    returns the achieved writes per second
+    """
+    conn = storage.connect()
+    conn.cursor().execute("DROP TABLE IF EXISTS BenchWrites")
+    conn.cursor().execute(
+        "CREATE TABLE BenchWrites (worker INTEGER NOT NULL, seq INTEGER NOT NULL)"
+    )
+    conn.commit()
+    storage.release(conn)
+
+    def writer(worker):
+        db = storage.connect()
+        try:
+            cursor = db.cursor()
+            for seq in range(writes):
+                cursor.execute(
+                    "INSERT INTO BenchWrites (worker, seq) VALUES (?, ?)", (worker, seq)
+                )
+                db.commit()
+        finally:
+            storage.release(db)
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    conn = storage.connect()
+    conn.cursor().execute("DROP TABLE BenchWrites")
+    conn.commit()
+    storage.release(conn)
+    return threads * writes / elapsed
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    if os.getenv("DB_BACKEND", "sqlite") == "sqlite":
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+            rate = run(storage, args.threads, args.writes)
+    else:
+        storage = create_storage()
+        rate = run(storage, args.threads, args.writes)
+    print(
+        f"{type(storage).__name__}: {args.threads} threads x {args.writes} writes "
+        f"-> {rate:,.0f} writes/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import os
 import unittest
 from unittest.mock import patch, MagicMock
 
+# Importing the app builds it, which needs a session key
+os.environ.setdefault("SECRET_KEY", "test secret key")
+
 class TestAIAndGetIMDB(unittest.TestCase):
 
     def test_get_imdb_id_success(self):
@@ -38,7 +42,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -60,7 +64,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
     def test_ai_recommendations_exception(self):
         """Test AI recommendations where an exception occurs."""
         client = MagicMock()
-        with patch("src.recommenderapp.app.openai.OpenAI", side_effect=Exception("API failure")):
+        with patch("openai.OpenAI", side_effect=Exception("API failure")):
             response = client.post("/ai_recommendations", json={"query": "Comedy movies"})
             response.status_code = 500
             response.json = {"error": "Error occurred"}
@@ -130,7 +134,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -146,7 +150,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -174,7 +178,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -200,7 +204,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -226,7 +230,7 @@ class TestAIAndGetIMDB(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="Movie1\nMovie2\nMovie3\nMovie4\nMovie5"))]
 
-        with patch("src.recommenderapp.app.openai.OpenAI") as mock_openai:
+        with patch("openai.OpenAI") as mock_openai:
             mock_client = mock_openai.return_value
             mock_client.chat.completions.create.return_value = mock_response
 
@@ -8,6 +8,8 @@ import pandas as pd
 import os
 import numpy as np
 
+from src.recommenderapp.metrics import span
+
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 CODE_DIR = os.path.dirname(APP_DIR)
 PROJECT_DIR = os.path.dirname(CODE_DIR)
@@ -81,56 +83,61 @@ def recommend_for_new_user(user_rating, gw, dw, aw):
     Uses pre-calculated movie data and genre matrix for efficiency.
     """
     if _MOVIES_DF is None or _MOVIES_GENRE_MATRIX is None:
-        load_and_preprocess_data()
+        with span("recommend.load"):
+            load_and_preprocess_data()
 
     movies_df = _MOVIES_DF
     movies_genre_matrix = _MOVIES_GENRE_MATRIX
 
-    user = pd.DataFrame(user_rating)
+    with span("recommend.seed"):
+        user = pd.DataFrame(user_rating)
 
-    # Create a df of all the movies that appear in the system DB and the users list of movies, and of those only keep the movieId and title
-    user_movie_ids_df = movies_df.reset_index()[movies_df.reset_index()["title"].isin(user["title"])][['movieId', 'title']]
+        # Create a df of all the movies that appear in the system DB and the users list of movies, and of those only keep the movieId and title
+        user_movie_ids_df = movies_df.reset_index()[movies_df.reset_index()["title"].isin(user["title"])][['movieId', 'title']]
 
-    user_ratings = pd.merge(user_movie_ids_df, user, on="title", how="inner")
+        user_ratings = pd.merge(user_movie_ids_df, user, on="title", how="inner")
 
-    user_ratings.set_index('movieId', inplace=True)
+        user_ratings.set_index('movieId', inplace=True)
 
-    common_movie_ids = movies_genre_matrix.index.intersection(user_ratings.index)
+        common_movie_ids = movies_genre_matrix.index.intersection(user_ratings.index)
 
-    user_genre = movies_genre_matrix.loc[common_movie_ids]
-    user_ratings = user_ratings.loc[common_movie_ids]
+    with span("recommend.profile"):
+        user_genre = movies_genre_matrix.loc[common_movie_ids]
+        user_ratings = user_ratings.loc[common_movie_ids]
 
-    user_profile = user_genre.T.dot(user_ratings.rating.astype(float))
+        user_profile = user_genre.T.dot(user_ratings.rating.astype(float))
 
-    recommendations = (movies_genre_matrix.dot(user_profile)) / user_profile.sum()
+        user_rated_movies_details = movies_df.loc[user_ratings.index] # Get details using index lookup
+        user_directors = set().union(*user_rated_movies_details['director_set'])
+        user_actors = set().union(*user_rated_movies_details['actors_set'])
 
-    top_recommendations = movies_df.copy()
-    top_recommendations['recommended'] = recommendations
+    with span("recommend.score"):
+        recommendations = (movies_genre_matrix.dot(user_profile)) / user_profile.sum()
 
-    user_rated_movies_details = movies_df.loc[user_ratings.index] # Get details using index lookup
-    user_directors = set().union(*user_rated_movies_details['director_set'])
-    user_actors = set().union(*user_rated_movies_details['actors_set'])
+        top_recommendations = movies_df.copy()
+        top_recommendations['recommended'] = recommendations
 
-    top_recommendations["director_match_score"] = top_recommendations["director_set"].apply(
-        lambda movie_directors: len(movie_directors.intersection(user_directors))
-    )
-    top_recommendations["actor_match_score"] = top_recommendations["actors_set"].apply(
-        lambda movie_actors: len(movie_actors.intersection(user_actors))
-    )
+        top_recommendations["director_match_score"] = top_recommendations["director_set"].apply(
+            lambda movie_directors: len(movie_directors.intersection(user_directors))
+        )
+        top_recommendations["actor_match_score"] = top_recommendations["actors_set"].apply(
+            lambda movie_actors: len(movie_actors.intersection(user_actors))
+        )
 
-    # Increase weights for director, actor scores, and IMDb rating in the final recommendation score
-    top_recommendations["final_score"] = (
-        gw * top_recommendations["recommended"]
-        + dw * top_recommendations["director_match_score"]
-        + aw * top_recommendations["actor_match_score"]
-        + 0.4 * top_recommendations["normalized_imdb_rating"]
-    )
+        # Increase weights for director, actor scores, and IMDb rating in the final recommendation score
+        top_recommendations["final_score"] = (
+            gw * top_recommendations["recommended"]
+            + dw * top_recommendations["director_match_score"]
+            + aw * top_recommendations["actor_match_score"]
+            + 0.4 * top_recommendations["normalized_imdb_rating"]
+        )
 
-    # Filter out movies the user has already rated
-    rated_titles = set(user["title"])
-    candidates = top_recommendations[~top_recommendations["title"].isin(rated_titles)]
+    with span("recommend.topk"):
+        # Filter out movies the user has already rated
+        rated_titles = set(user["title"])
+        candidates = top_recommendations[~top_recommendations["title"].isin(rated_titles)]
 
-    final_recommendations = candidates.nlargest(201, 'final_score')
+        final_recommendations = candidates.nlargest(201, 'final_score')
 
     return (
         list(final_recommendations["title"]),
@@ -153,3 +160,114 @@ def recommend_for_new_user_a(user_rating):
 
 def recommend_for_new_user_all(user_rating):
     return recommend_for_new_user(user_rating, 0.5, 0.3, 0.3)
+
+
+_BATCH_INDEX = None
+
+
+def _get_batch_index():
+    """
+    Builds (once) the array-based view of the catalogue used for batch scoring:
+    the genre matrix as a dense array plus title/director/actor -> row indexes.
+    """
+    global _BATCH_INDEX
+    if _BATCH_INDEX is not None:
+        return _BATCH_INDEX
+    if _MOVIES_DF is None or _MOVIES_GENRE_MATRIX is None:
+        load_and_preprocess_data()
+
+    def build_index(sets):
+        index = {}
+        for position, names in enumerate(sets):
+            for name in names:
+                index.setdefault(name, []).append(position)
+        return {name: np.array(rows, dtype=np.int64) for name, rows in index.items()}
+
+    title_positions = {}
+    for position, title in enumerate(_MOVIES_DF["title"]):
+        title_positions.setdefault(title, []).append(position)
+
+    _BATCH_INDEX = {
+        "genre": _MOVIES_GENRE_MATRIX.to_numpy(dtype=np.float64),
+        "imdb": _MOVIES_DF["normalized_imdb_rating"].to_numpy(dtype=np.float64),
+        "titles": _MOVIES_DF["title"].to_numpy(),
+        "genres": _MOVIES_DF["genres"].to_numpy(),
+        "imdb_ids": _MOVIES_DF["imdb_id"].to_numpy(),
+        "title_positions": title_positions,
+        "director_sets": _MOVIES_DF["director_set"].to_numpy(),
+        "actor_sets": _MOVIES_DF["actors_set"].to_numpy(),
+        "directors": build_index(_MOVIES_DF["director_set"]),
+        "actors": build_index(_MOVIES_DF["actors_set"]),
+    }
+    return _BATCH_INDEX
+
+
+def _match_counts(index, names, size):
+    """
+    For every movie, counts how many of `names` it shares (set intersection size)
+    """
+    rows = [index[name] for name in names if name in index]
+    if not rows:
+        return np.zeros(size)
+    return np.bincount(np.concatenate(rows), minlength=size).astype(np.float64)
+
+
+def recommend_for_users(users_ratings, gw, dw, aw, top_k=10):
+    """
+    Scores many users at once with the same model as recommend_for_new_user.
+    users_ratings is a list with one [{"title", "rating"}, ...] list per user.
+    The genre part is a single matrix product for the whole batch; director
+    and actor matches use inverted indexes instead of per-movie set
+    intersections. Returns one (titles, genres, imdb_ids) tuple per user;
+    users without any known title get empty lists.
+    """
+    index = _get_batch_index()
+    genre = index["genre"]
+    size = genre.shape[0]
+
+    rated = []
+    profiles = np.zeros((len(users_ratings), genre.shape[1]))
+    for row, user_rating in enumerate(users_ratings):
+        positions, ratings = [], []
+        for entry in user_rating:
+            for position in index["title_positions"].get(entry["title"], ()):
+                positions.append(position)
+                ratings.append(float(entry["rating"]))
+        rated.append((positions, {entry["title"] for entry in user_rating}))
+        if positions:
+            profiles[row] = genre[positions].T.dot(np.array(ratings))
+
+    totals = profiles.sum(axis=1)
+    genre_scores = genre.dot(profiles.T)
+
+    results = []
+    for row, (positions, titles) in enumerate(rated):
+        if not positions or totals[row] == 0:
+            results.append(([], [], []))
+            continue
+        user_directors = set().union(*index["director_sets"][positions])
+        user_actors = set().union(*index["actor_sets"][positions])
+        scores = (
+            gw * genre_scores[:, row] / totals[row]
+            + dw * _match_counts(index["directors"], user_directors, size)
+            + aw * _match_counts(index["actors"], user_actors, size)
+            + 0.4 * index["imdb"]
+        )
+        # Filter out movies the user has already rated
+        for title in titles:
+            scores[index["title_positions"].get(title, [])] = -np.inf
+        k = min(top_k, size)
+        # Everything tied with the k-th best score is a candidate so that,
+        # like nlargest, ties are broken in catalogue order
+        threshold = np.partition(scores, size - k)[size - k]
+        top = np.flatnonzero(scores >= threshold)
+        top = top[np.lexsort((top, -scores[top]))][:k]
+        top = top[np.isfinite(scores[top])]
+        results.append(
+            (
+                list(index["titles"][top]),
+                list(index["genres"][top]),
+                list(index["imdb_ids"][top]),
+            )
+        )
+    return results
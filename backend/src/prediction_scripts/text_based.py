@@ -0,0 +1,199 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Free-text movie retrieval over the local catalogue.
+
+A BM25 index is built over the title, genres, director and actors of
+every movie in movies.csv. Fields are weighted (a word in the title or
+genres counts more than one in the cast list) and the index is stored as
+a sparse term x movie matrix in CSR form: for every term, the movies it
+occurs in and their precomputed BM25 weights. Answering a query is then a
+few vectorized scatter-adds into a score array plus a partial sort, with
+no network access and no model to load.
+"""
+
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from src.prediction_scripts import item_based
+
+K1 = 1.2
+B = 0.75
+
+FIELD_WEIGHTS = {"title": 2.0, "genres": 1.5, "director": 1.0, "actors": 1.0}
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+
+_STOPWORDS = frozenset(
+    "a about an and any are as at be by film films for from give great good i in is it "
+    "like me movie movies of on or please recommend show similar some something that "
+    "the their them this to want was with".split()
+)
+
+# Everyday words for genres, expanded into the catalogue's genre words
+QUERY_ALIASES = {
+    "scifi": ("science", "fiction", "sci", "fi"),
+    "sci": ("science",),
+    "fi": ("fiction",),
+    "funny": ("comedy",),
+    "comedies": ("comedy",),
+    "scary": ("horror",),
+    "animated": ("animation",),
+    "cartoon": ("animation",),
+    "romantic": ("romance",),
+    "romcom": ("romance", "comedy"),
+    "documentaries": ("documentary",),
+    "thrillers": ("thriller",),
+    "westerns": ("western",),
+    "musical": ("music",),
+    "kids": ("family", "animation"),
+}
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase, accent-free words
+    """
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD_RE.findall(text)
+
+
+def query_terms(query):
+    """
+    Returns the distinct search terms of a query, aliases expanded
+    """
+    terms = []
+    for word in tokenize(query):
+        if word in _STOPWORDS:
+            continue
+        terms.append(word)
+        terms.extend(QUERY_ALIASES.get(word, ()))
+    return list(dict.fromkeys(terms))
+
+
+class Bm25Index:
+    """
+    BM25 index over the catalogue, stored as CSR arrays indexed by term
+    """
+
+    def __init__(self, movies, k1=K1, b=B, field_weights=None):
+        field_weights = field_weights or FIELD_WEIGHTS
+        movies = movies.reset_index(drop=True)
+        size = len(movies)
+        self.titles = movies["title"].to_numpy()
+        self.genres = movies["genres"].to_numpy()
+        self.imdb_ids = movies["imdb_id"].to_numpy()
+        if "imdb_ratings" in movies.columns:
+            # "No Rating Found" and "Error" rank below every rated movie
+            ratings = pd.to_numeric(movies["imdb_ratings"], errors="coerce").fillna(0.0)
+            self.ratings = ratings.to_numpy(dtype=np.float64)
+        else:
+            self.ratings = np.zeros(size)
+
+        # Weighted term frequencies of every (term, movie) pair
+        self.vocabulary = {}
+        term_ids, doc_ids, frequencies = [], [], []
+        lengths = np.zeros(size)
+        columns = [
+            (movies[field].fillna("").to_numpy(), weight)
+            for field, weight in field_weights.items()
+            if field in movies.columns
+        ]
+        for doc in range(size):
+            counts = {}
+            for values, weight in columns:
+                for word in tokenize(values[doc]):
+                    counts[word] = counts.get(word, 0.0) + weight
+                    lengths[doc] += weight
+            for word, count in counts.items():
+                term_ids.append(self.vocabulary.setdefault(word, len(self.vocabulary)))
+                doc_ids.append(doc)
+                frequencies.append(count)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        frequencies = np.array(frequencies, dtype=np.float64)
+
+        # Group the pairs by term (CSR with terms as rows)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, frequencies = term_ids[order], doc_ids[order], frequencies[order]
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+        self.doc_ids = doc_ids
+
+        idf = np.log1p((size - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if size and lengths.mean() > 0 else 1.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / average_length)
+        self.weights = (idf[term_ids] * frequencies * (k1 + 1) / (frequencies + norm)).astype(
+            np.float32
+        )
+
+    def __len__(self):
+        return len(self.titles)
+
+    def scores(self, query):
+        """
+        Returns the BM25 score of every movie for a query
+        """
+        scores = np.zeros(len(self.titles), dtype=np.float32)
+        for term in query_terms(query):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # A term lists each movie once, so plain fancy indexing is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, top_k=10):
+        """
+        Returns the positions of the top_k matching movies, best first.
+        Ties are broken by IMDb rating, then catalogue order.
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            threshold = np.partition(scores[candidates], len(candidates) - top_k)[
+                len(candidates) - top_k
+            ]
+            candidates = candidates[scores[candidates] >= threshold]
+        order = np.lexsort((candidates, -self.ratings[candidates], -scores[candidates]))
+        return candidates[order][:top_k]
+
+    def recommend(self, query, top_k=10):
+        """
+        Returns (titles, genres, imdb_ids) of the best matches for a query
+        """
+        top = self.search(query, top_k)
+        return list(self.titles[top]), list(self.genres[top]), list(self.imdb_ids[top])
+
+
+_TEXT_INDEX = None
+_TEXT_INDEX_LOCK = threading.Lock()
+
+
+def get_text_index():
+    """
+    Builds (once) the BM25 index of item_based.MOVIES_CSV_PATH
+    """
+    global _TEXT_INDEX  # pylint: disable=global-statement
+    if _TEXT_INDEX is None:
+        with _TEXT_INDEX_LOCK:
+            if _TEXT_INDEX is None:
+                _TEXT_INDEX = Bm25Index(pd.read_csv(item_based.MOVIES_CSV_PATH))
+    return _TEXT_INDEX
+
+
+def recommend_from_text(query, top_k=10):
+    """
+    Recommends movies matching a free-text description
+    """
+    return get_text_index().recommend(query, top_k)
@@ -0,0 +1,298 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Free-text movie recommendations backed by OpenAI.
+
+One OpenAI client is shared by the whole process so its HTTP connections
+are kept alive between requests. Answers are cached for AI_CACHE_TTL
+seconds under a normalized form of the query, so rephrasings such as
+"Movies like Alien!" and "films like alien" share an entry. Every request
+has a hard latency budget (AI_BUDGET seconds): when OpenAI is slow,
+saturated or returns garbage, the local recommenders answer instead.
+OpenAI gets most of the budget and the fallback what is left of it; a
+fallback that does not fit (e.g. still loading the catalogue on a cold
+start) returns nothing and keeps loading for the next request.
+
+Local answers come from the content recommender when the query names
+catalogue titles ("something like Alien"), and from the BM25 text index
+(see prediction_scripts/text_based.py) otherwise. With AI_MODE=local
+every query is answered locally and OpenAI is never contacted.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from src.recommenderapp import io_pool
+from src.recommenderapp.titles import split_title
+
+logger = logging.getLogger(__name__)
+
+AI_MODEL = "gpt-3.5-turbo"
+AI_SYSTEM_PROMPT = (
+    "You are a movie recommendation AI. Please provide recommendations in a JSON array "
+    "format with just movie titles, the only key should be movies, I should be able to "
+    "call json.loads(response.choices[0].message.content) and get a list of movies."
+)
+AI_USER_PROMPT = "Recommend {count} movies based on: {query}. Return just the movie titles in a JSON array."
+AI_COUNT = 5
+
+OPENAI_MODE = "openai"
+LOCAL_MODE = "local"
+
+DEFAULT_BUDGET = 8.0
+DEFAULT_TTL = 24 * 3600
+# Share of the budget kept for the local fallback when OpenAI fails
+DEFAULT_FALLBACK_RESERVE = 0.25
+
+# Runs the local fallback so that it can be abandoned when over budget
+FALLBACK_POOL = io_pool.Bulkhead("ai-fallback", max_workers=2, max_pending=8)
+
+# Words that do not change what a query asks for
+_QUERY_STOPWORDS = frozenset(
+    "a an and any film films for give her i it like me movie movies of please recommend "
+    "similar some something suggest that the them this to us want we with you".split()
+)
+_WORD_RE = re.compile(r"[0-9a-z]+")
+# Longest title, in words, looked for in a query by the fallback
+_MAX_TITLE_WORDS = 8
+
+# Recommender weights, as used for the "all" prediction endpoint
+_FALLBACK_WEIGHTS = (0.5, 0.3, 0.3)
+
+
+def normalize_query(query):
+    """
+    Returns the cache key of a query: its distinct meaningful words, sorted
+    """
+    words = _WORD_RE.findall(split_title(query)[0])
+    return " ".join(sorted({word for word in words if word not in _QUERY_STOPWORDS}))
+
+
+class ResponseCache:
+    """
+    Bounded in-memory cache of normalized query -> titles, with a TTL
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached titles, or None if missing or expired
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            if cached[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def put(self, key, titles):
+        """
+        Caches the titles of a query
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, titles)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_SEED_INDEX = None
+_SEED_INDEX_LOCK = threading.Lock()
+
+
+def _get_seed_index():
+    """
+    Returns {normalized name: catalogue title} for the recommender's catalogue
+    """
+    global _SEED_INDEX  # pylint: disable=global-statement
+    if _SEED_INDEX is None:
+        with _SEED_INDEX_LOCK:
+            if _SEED_INDEX is None:
+                # pylint: disable=import-outside-toplevel
+                from src.prediction_scripts.item_based import _get_batch_index
+
+                seeds = {}
+                for title in _get_batch_index()["titles"]:
+                    seeds.setdefault(split_title(title)[0], title)
+                _SEED_INDEX = seeds
+    return _SEED_INDEX
+
+
+def find_seed_titles(query, seeds):
+    """
+    Returns the catalogue titles named in a query, longest names first.
+    One-word names that are stopwords or under 3 letters ("it", "up"...)
+    are ignored.
+    """
+    words = _WORD_RE.findall(split_title(query)[0])
+    found = []
+    start = 0
+    while start < len(words):
+        for size in range(min(_MAX_TITLE_WORDS, len(words) - start), 0, -1):
+            name = " ".join(words[start : start + size])
+            if name in seeds and not (
+                size == 1 and (len(name) < 3 or name in _QUERY_STOPWORDS)
+            ):
+                found.append(seeds[name])
+                start += size
+                break
+        else:
+            start += 1
+    return list(dict.fromkeys(found))
+
+
+def local_recommendations(query, count=AI_COUNT):
+    """
+    Recommends movies similar to the catalogue titles mentioned in a query
+    with the content-based recommender, or matching its description with
+    the BM25 text index when it names none
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_users
+    from src.prediction_scripts.text_based import recommend_from_text
+
+    seeds = find_seed_titles(query, _get_seed_index())
+    if not seeds:
+        return recommend_from_text(query, top_k=count)[0]
+    ratings = [{"title": title, "rating": 5.0} for title in seeds]
+    titles, _, _ = recommend_for_users([ratings], *_FALLBACK_WEIGHTS, top_k=count)[0]
+    return list(titles)
+
+
+def parse_titles(content):
+    """
+    Extracts the list of titles from the model's JSON answer
+    """
+    titles = json.loads(content)["movies"]
+    if not isinstance(titles, list):
+        raise ValueError("movies is not a list")
+    return [str(title) for title in titles if title]
+
+
+class AiRecommender:
+    """
+    Answers free-text queries from the cache, OpenAI or the local fallback
+    """
+
+    def __init__(
+        self,
+        client_factory=None,
+        cache=None,
+        budget=DEFAULT_BUDGET,
+        fallback=local_recommendations,
+        bulkhead=io_pool.OPENAI,
+        mode=OPENAI_MODE,
+        fallback_reserve=DEFAULT_FALLBACK_RESERVE,
+        fallback_pool=None,
+    ):
+        self.client_factory = client_factory or self._default_client
+        self.cache = cache if cache is not None else ResponseCache()
+        self.budget = budget
+        self.fallback = fallback
+        self.bulkhead = bulkhead
+        self.mode = mode
+        self.fallback_reserve = fallback_reserve
+        self.fallback_pool = fallback_pool or FALLBACK_POOL
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def _default_client(self):
+        # pylint: disable=import-outside-toplevel
+        import openai
+
+        # No retries: a retry would not fit in the budget anyway
+        return openai.OpenAI(timeout=self.budget, max_retries=0)
+
+    @property
+    def client(self):
+        """
+        The shared OpenAI client, created on first use
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.client_factory()
+        return self._client
+
+    def _ask(self, query, timeout):
+        response = self.client.chat.completions.create(
+            model=AI_MODEL,
+            timeout=timeout,
+            messages=[
+                {"role": "system", "content": AI_SYSTEM_PROMPT},
+                {"role": "user", "content": AI_USER_PROMPT.format(count=AI_COUNT, query=query)},
+            ],
+        )
+        return parse_titles(response.choices[0].message.content)
+
+    def recommend(self, query):
+        """
+        Returns (titles, source) where source is "cache", "openai",
+        "fallback" or, in local mode, "local"
+        """
+        if self.mode == LOCAL_MODE:
+            return self.fallback(query), "local"
+        deadline = time.monotonic() + self.budget
+        key = normalize_query(query)
+        titles = self.cache.get(key)
+        if titles is not None:
+            return titles, "cache"
+        ask_timeout = self.budget * (1 - self.fallback_reserve)
+        try:
+            titles = self.bulkhead.run(self._ask, query, ask_timeout, wait_timeout=ask_timeout)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Timeouts, a saturated pool, API errors and malformed answers
+            logger.warning("AI recommendations falling back for %r: %s", query, e)
+            return self._fallback_until(query, deadline), "fallback"
+        self.cache.put(key, titles)
+        return titles, "openai"
+
+    def _fallback_until(self, query, deadline):
+        """
+        Runs the fallback with what is left of the budget. Returns no titles
+        if it does not finish in time; it keeps running, so a cold catalogue
+        load is done by the time the next request falls back.
+        """
+        try:
+            return self.fallback_pool.run(
+                self.fallback, query, wait_timeout=max(0.0, deadline - time.monotonic())
+            )
+        except (io_pool.UpstreamBusy, io_pool.UpstreamTimeout) as e:
+            logger.warning("Local fallback for %r did not fit the budget: %s", query, e)
+            return []
+
+
+_AI_RECOMMENDER = None
+_AI_RECOMMENDER_LOCK = threading.Lock()
+
+
+def get_ai_recommender():
+    """
+    Returns the process-wide AI recommender
+    """
+    global _AI_RECOMMENDER  # pylint: disable=global-statement
+    if _AI_RECOMMENDER is None:
+        with _AI_RECOMMENDER_LOCK:
+            if _AI_RECOMMENDER is None:
+                _AI_RECOMMENDER = AiRecommender(
+                    cache=ResponseCache(ttl=float(os.getenv("AI_CACHE_TTL", str(DEFAULT_TTL)))),
+                    budget=float(os.getenv("AI_BUDGET", str(DEFAULT_BUDGET))),
+                    mode=os.getenv("AI_MODE", OPENAI_MODE).lower(),
+                )
+    return _AI_RECOMMENDER
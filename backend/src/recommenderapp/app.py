@@ -9,28 +9,20 @@ This code is licensed under MIT license (see LICENSE for details)
 # pylint: disable=wrong-import-order
 # pylint: disable=import-error
 import json
+import logging
 import sys
 import os
-from flask import Flask, jsonify, render_template, request, g, send_from_directory
+import secrets
+import time
+from flask import Blueprint, Flask, current_app, jsonify, render_template, request, g, session
 from flask_cors import CORS
-import requests
 from dotenv import load_dotenv
-import sqlite3
-import openai  # NEW: Import OpenAI
-import requests
-from datetime import datetime, timedelta
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
 
 sys.path.append("../../")
 from src.recommenderapp.utils import (
     beautify_feedback_data,
-    format_trakt_movies_to_html,
-    send_email,
-    send_email_to_user,
+    build_feedback_email_html,
+    FEEDBACK_EMAIL_SUBJECT,
     create_account,
     login_to_account,
     submit_review,
@@ -48,115 +40,38 @@ from src.recommenderapp.utils import (
     get_discussion,
     get_username_data,
     remove_from_watchlist,
-    init_db,
     download_thumbnails
 )
-from src.recommenderapp.search import Search
-from datetime import datetime
-from src.prediction_scripts.item_based import (
-    recommend_for_new_user_g,
-    recommend_for_new_user_d,
-    recommend_for_new_user_a,
-    recommend_for_new_user_all,
-)
+from src.recommenderapp.storage import get_storage
+from src.recommenderapp import io_pool, metrics
+from src.recommenderapp.ai_recommender import get_ai_recommender
+from src.recommenderapp.omdb import get_omdb_cache
+from src.recommenderapp.log_config import setup_logging
+from src.recommenderapp.outbox import enqueue_email
+from src.recommenderapp.titles import get_title_resolver
+from src.recommenderapp.thumbnail_variants import get_variant_cache, negotiate_format
+from src.recommenderapp.http_cache import send_cached_bytes, send_cached_file
+from src.recommenderapp.poster_pack import get_poster_pack
 
 sys.path.remove("../../")
 
-app = Flask(__name__)
-app.secret_key = "secret key"
-
-cors = CORS(app, resources={r"/*": {"origins": "*"}})
-user = {1: None}
+# All routes live on a blueprint, the application is built by create_app()
+bp = Blueprint("recommenderapp", __name__)
+logger = logging.getLogger(__name__)
 comments: []
 
-# Load environment variables early so that OpenAI API key is available.
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")  # NEW: Set the OpenAI API key
-
-def get_recent_movies_from_trakt():
-    """Fetch top 10 new movies from the past month using Trakt API"""
-    try:
-
-        TRAKT_CLIENT_ID = os.getenv("TRAKT_CLIENT_ID")
-        TRAKT_CLIENT_SECRET = os.getenv("TRAKT_CLIENT_SECRET")
-        URL = "https://api.trakt.tv/movies/trending"
-
-        # Headers for the API request
-        headers = {
-            "Content-Type": "application/json",
-            "trakt-api-version": "2",
-            "trakt-api-key": TRAKT_CLIENT_ID,
-            "trakt-api-secret": TRAKT_CLIENT_SECRET
-        }
-
-        # Make the API request
-        response = requests.get(URL, headers=headers)
-        movies = response.json()
+# Origins of the frontend's Vite dev server, allowed by `python app.py`
+DEV_CORS_ORIGINS = "http://localhost:5173,http://127.0.0.1:5173"
 
-        return [{
-            "title": movie['movie']["title"],
-            "imdb_id": movie['movie']["ids"]["imdb"]
-        } for movie in movies[:10]]
 
-    except Exception as e:
-        app.logger.error(f"Error fetching movies from Trakt: {str(e)}")
-        return []
-
-
-def send_weekly_recommendations():
-    """Sends weekly recommendations to all users"""
-    with app.app_context():
-        try:
-            recent_movies = format_trakt_movies_to_html(get_recent_movies_from_trakt())
-            if not recent_movies:
-                app.logger.error("No movies found from Trakt API")
-                return
-
-            # Get all users with emails
-            before_request()
-            cursor = g.db.cursor()
-            cursor.execute("SELECT email FROM Users WHERE email IS NOT NULL;")
-            users = cursor.fetchall()
-            print('users', users)
-
-            # Send emails to all users
-            print('starting email sending')
-            for (email_address,) in users:
-                try:
-                    email = MIMEMultipart("alternative")
-                    email["To"] = email_address
-                    email["Subject"] = "Newly Released Movies for You"
-                    email.attach(MIMEText(recent_movies, "html"))
-
-                    send_email(email, email_address)
-
-                    app.logger.info(f"Sent recommendations to {email_address}")
-                except Exception as e:
-                    app.logger.error(f"Error sending email to {email_address}: {str(e)}")
-
-        except Exception as e:
-            app.logger.error(f"Error in weekly recommendations: {str(e)}")
-
-
-# Run every Monday at 9 AM
-scheduler = BackgroundScheduler(daemon=True)
-scheduler.add_job(
-    send_weekly_recommendations,
-    # This was left for testing the send_weekly_recommendations function.
-    # trigger=DateTrigger(run_date=datetime.now() + timedelta(seconds=5)),
-    trigger=CronTrigger(
-        day_of_week="mon",
-        hour=9,
-        minute=0,
-        timezone="UTC",
-        week="*/4"  # Send updates once a month
-    ),
-    name="Weekly Recommendations"
-)
-scheduler.start()
+def current_user():
+    """
+    Returns the id of the client's logged-in user, "guest", or None
+    """
+    return session.get("user_id")
 
 
-@app.route("/")
+@bp.route("/")
 def login_page():
     """
     Renders the login page.
@@ -164,57 +79,57 @@ def login_page():
     return render_template("login.html")
 
 
-@app.route("/profile")
+@bp.route("/profile")
 def profile_page():
     """
     Renders the login page.
     """
-    if user[1] is not None:
+    if current_user() is not None:
         return render_template("profile.html")
     return render_template("login.html")
 
 
-@app.route("/wall")
+@bp.route("/wall")
 def wall_page():
     """
     Renders the wall page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("wall.html")
     return render_template("login.html")
 
 
-@app.route("/review")
+@bp.route("/review")
 def review_page():
     """
     Renders the review page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("review.html")
     return render_template("login.html")
 
 
-@app.route("/landing")
+@bp.route("/landing")
 def landing_page():
     """
     Renders the landing page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("landing_page.html")
     return render_template("login.html")
 
 
-@app.route("/search_page")
+@bp.route("/search_page")
 def search_page():
     """
     Renders the search page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("search_page.html")
     return render_template("login.html")
 
 
-@app.route("/genreBased", methods=["POST"])
+@bp.route("/genreBased", methods=["POST"])
 def predict_g():
     """
     Predicts movie recommendations based on user ratings.
@@ -226,14 +141,16 @@ def predict_g():
         movie_with_rating = {"title": movie, "rating": 5.0}
         if movie_with_rating not in training_data:
             training_data.append(movie_with_rating)
+    # pylint: disable-next=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_new_user_g
+
     recommendations, genres, imdb_id = recommend_for_new_user_g(training_data)
     recommendations, genres, imdb_id = recommendations[:10], genres[:10], imdb_id[:10]
     resp = {"recommendations": recommendations, "genres": genres, "imdb_id": imdb_id}
-    print(resp)
     return resp
 
 
-@app.route("/dirBased", methods=["POST"])
+@bp.route("/dirBased", methods=["POST"])
 def predict_d():
     """
     Predicts movie recommendations based on user ratings.
@@ -245,13 +162,16 @@ def predict_d():
         movie_with_rating = {"title": movie, "rating": 5.0}
         if movie_with_rating not in training_data:
             training_data.append(movie_with_rating)
+    # pylint: disable-next=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_new_user_d
+
     recommendations, genres, imdb_id = recommend_for_new_user_d(training_data)
     recommendations, genres, imdb_id = recommendations[:10], genres[:10], imdb_id[:10]
     resp = {"recommendations": recommendations, "genres": genres, "imdb_id": imdb_id}
     return resp
 
 
-@app.route("/actorBased", methods=["POST"])
+@bp.route("/actorBased", methods=["POST"])
 def predict_a():
     """
     Predicts movie recommendations based on user ratings.
@@ -263,13 +183,16 @@ def predict_a():
         movie_with_rating = {"title": movie, "rating": 5.0}
         if movie_with_rating not in training_data:
             training_data.append(movie_with_rating)
+    # pylint: disable-next=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_new_user_a
+
     recommendations, genres, imdb_id = recommend_for_new_user_a(training_data)
     recommendations, genres, imdb_id = recommendations[:10], genres[:10], imdb_id[:10]
     resp = {"recommendations": recommendations, "genres": genres, "imdb_id": imdb_id}
     return resp
 
 
-@app.route("/all", methods=["POST"])
+@bp.route("/all", methods=["POST"])
 def predict_all():
     """
     Predicts movie recommendations based on user ratings.
@@ -281,18 +204,23 @@ def predict_all():
         movie_with_rating = {"title": movie, "rating": 5.0}
         if movie_with_rating not in training_data:
             training_data.append(movie_with_rating)
+    # pylint: disable-next=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_new_user_all
+
     recommendations, genres, imdb_id = recommend_for_new_user_all(training_data)
     recommendations, genres, imdb_id = recommendations[:10], genres[:10], imdb_id[:10]
     resp = {"recommendations": recommendations, "genres": genres, "imdb_id": imdb_id}
     return resp
 
 
-@app.route("/search", methods=["POST"])
+@bp.route("/search", methods=["POST"])
 def search():
     """
     Handles movie search requests.
     """
     term = request.form["q"]
+    from src.recommenderapp.search import Search  # pylint: disable=import-outside-toplevel
+
     finder = Search()
     filtered_dict = finder.results_top_ten(term)
     out = [(t["title"], os.path.join("http://localhost:5000/thumbnails", f"{t['imdb_id']}.jpg")) for t in filtered_dict]
@@ -301,59 +229,77 @@ def search():
     return resp
 
 
-@app.route("/", methods=["POST"])
+def _passwords_busy():
+    """
+    Response for when the password hashing pool is saturated (see passwords.py)
+    """
+    response = jsonify({"error": "Too many logins right now, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@bp.route("/", methods=["POST"])
 def create_acc():
     """
     Handles creating a new account
     """
     data = json.loads(request.data)
-    create_account(g.db, data["email"], data["username"], data["password"])
+    try:
+        create_account(g.db, data["email"], data["username"], data["password"])
+    except (io_pool.UpstreamBusy, io_pool.UpstreamTimeout):
+        return _passwords_busy()
     return request.data
 
 
-@app.route("/out", methods=["POST"])
+@bp.route("/out", methods=["POST"])
 def signout():
     """
     Handles signing out the active user
     """
-    user[1] = None
+    session.pop("user_id", None)
     return request.data
 
 
-@app.route("/log", methods=["POST"])
+@bp.route("/log", methods=["POST"])
 def login():
     """
     Handles logging in the active user
     """
     data = json.loads(request.data)
-    resp = login_to_account(g.db, data["username"], data["password"])
+    try:
+        resp = login_to_account(g.db, data["username"], data["password"])
+    except (io_pool.UpstreamBusy, io_pool.UpstreamTimeout):
+        return _passwords_busy()
     if resp is None:
         return 400
-    user[1] = resp
+    # A fresh session on login, so a pre-login cookie cannot be reused
+    session.clear()
+    session["user_id"] = resp
     return request.data
 
 
-@app.route("/friend", methods=["POST"])
+@bp.route("/friend", methods=["POST"])
 def friend():
     """
     Handles adding a new friend
     """
     data = json.loads(request.data)
-    add_friend(g.db, data["username"], user[1])
+    add_friend(g.db, data["username"], current_user())
     return request.data
 
 
-@app.route("/guest", methods=["POST"])
+@bp.route("/guest", methods=["POST"])
 def guest():
     """
-    Sets the user to be a guest user
+    Sets the user to be a guest user. The identity is always "guest":
+    the request body is ignored, so it cannot name another user.
     """
-    data = json.loads(request.data)
-    user[1] = data["guest"]
-    return request.data
+    session.clear()
+    session["user_id"] = "guest"
+    return jsonify({"guest": "guest"})
 
 
-@app.route("/review", methods=["POST"])
+@bp.route("/review", methods=["POST"])
 def review():
     """
     Handles the submission of a movie review
@@ -361,12 +307,11 @@ def review():
     data = request.get_json()
     movie_name = data.get("movie")[0]
     data["imdb_id"] = get_imdb_id_by_name(g.db, movie_name)
-    print(get_imdb_id_by_name(g.db, movie_name))
-    submit_review(g.db, user[1], movie_name, data.get("score"), data.get("review"))
+    submit_review(g.db, current_user(), movie_name, data.get("score"), data.get("review"))
     return request.data
 
 
-@app.route("/getWallData", methods=["GET"])
+@bp.route("/getWallData", methods=["GET"])
 def wall_posts():
     """
     Gets the posts for the wall
@@ -374,15 +319,15 @@ def wall_posts():
     return get_wall_posts(g.db)
 
 
-@app.route("/getRecentMovies", methods=["GET"])
+@bp.route("/getRecentMovies", methods=["GET"])
 def recent_movies():
     """
     Gets the recent movies of the active user
     """
-    return get_recent_movies(g.db, user[1])
+    return get_recent_movies(g.db, current_user())
 
 
-@app.route("/getRecentFriendMovies", methods=["POST"])
+@bp.route("/getRecentFriendMovies", methods=["POST"])
 def recent_friend_movies():
     """
     Gets the recent movies of a certain friend
@@ -391,23 +336,23 @@ def recent_friend_movies():
     return get_recent_friend_movies(g.db, str(data))
 
 
-@app.route("/getUserName", methods=["GET"])
+@bp.route("/getUserName", methods=["GET"])
 def username():
     """
     Gets the username of the active user
     """
-    return get_username(g.db, user[1])
+    return get_username(g.db, current_user())
 
 
-@app.route("/getFriends", methods=["GET"])
+@bp.route("/getFriends", methods=["GET"])
 def get_friend():
     """
     Gets the friends of the active user
     """
-    return get_friends(g.db, user[1])
+    return get_friends(g.db, current_user())
 
 
-@app.route("/feedback", methods=["POST"])
+@bp.route("/feedback", methods=["POST"])
 def feedback():
     """
     Handles user feedback submission and mails the results.
@@ -416,46 +361,45 @@ def feedback():
     return data
 
 
-@app.route("/sendMail", methods=["POST"])
+@bp.route("/sendMail", methods=["POST"])
 def send_mail():
     """
     Handles user feedback submission and mails the results.
     """
     data = json.loads(request.data)
     user_email = data["email"]
-    send_email_to_user(user_email, beautify_feedback_data(data))
+    # Only queue the email; process_outbox delivers it
+    enqueue_email(
+        g.db,
+        user_email,
+        FEEDBACK_EMAIL_SUBJECT,
+        build_feedback_email_html(beautify_feedback_data(data)),
+    )
     return data
 
 
-@app.route("/add_to_watchlist", methods=["POST"])
+@bp.route("/add_to_watchlist", methods=["POST"])
 def add_movie_to_watchlist():
     """
     Adds a movie to the user's watchlist.
     """
-    print("Entered func")
     data = request.get_json()
-    print(data)
+    logger.debug("Add to watchlist: %s", data)
     movie_name = data.get("movieName")[0]
-    print(movie_name)
     imdb_id = (
         get_imdb_id_by_name(g.db, movie_name) if movie_name else data.get("imdb_id")
     )
-    print("Got imdb id")
     if not imdb_id:
         return jsonify({"status": "error", "message": "Movie not found"}), 404
-    print("imdb id is present")
 
     cursor = g.db.cursor()
     cursor.execute("SELECT idMovies FROM Movies WHERE imdb_id = ?", [imdb_id])
     movie_id_result = cursor.fetchone()
-    print("Selected movie.")
     if movie_id_result:
         movie_id = movie_id_result[0]
-        user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
-        print("Before was added.")
+        user_id = current_user()
         # Add to watchlist and check if it was added successfully
         was_added = add_to_watchlist(g.db, user_id, movie_id)
-        print(was_added)
         if was_added:
             return (
                 jsonify({"status": "success", "message": "Movie added to watchlist"}),
@@ -470,22 +414,22 @@ def add_movie_to_watchlist():
         return jsonify({"status": "error", "message": "Movie not found"}), 404
 
 
-@app.route("/watchlist", methods=["GET"])
+@bp.route("/watchlist", methods=["GET"])
 def watchlist_page():
     """
     Renders the watchlist page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("watchlist.html")
     return render_template("login.html")
 
 
-@app.route("/getWatchlistData", methods=["GET"])
+@bp.route("/getWatchlistData", methods=["GET"])
 def get_watchlist():
     """
     Retrieves the current user's watchlist.
     """
-    user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
+    user_id = current_user()
     cursor = g.db.cursor()
     cursor.execute(
         """
@@ -501,12 +445,12 @@ def get_watchlist():
     return jsonify(watchlist), 200
 
 
-@app.route("/deleteWatchlistData", methods=["POST"])
+@bp.route("/deleteWatchlistData", methods=["POST"])
 def delete_watchlist_data():
     """
     Retrieves the current user
     """
-    user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
+    user_id = current_user()
     imdb_id = json.loads(request.data)
     idMovies, _ = remove_from_watchlist(g.db, user_id, imdb_id)
 
@@ -524,24 +468,23 @@ def delete_watchlist_data():
         )
 
 
-@app.route("/get_api_key", methods=["GET"])
+@bp.route("/get_api_key", methods=["GET"])
 def get_api_key():
     """
     Provides the OMDB API key securely to the frontend.
     """
-    if user[1] is not None and user[1] != "guest":
+    if current_user() is not None and current_user() != "guest":
         return jsonify({"apikey": os.getenv("OMDB_API_KEY")})
     return jsonify({"error": "Unauthorized"}), 403
 
 
-@app.route("/add_to_watched_history", methods=["POST"])
+@bp.route("/add_to_watched_history", methods=["POST"])
 def add_movie_to_watched_history():
     """
     Adds a movie to the user's watched history.
     """
-    print("Entered add_to_watched_history function")
     data = request.get_json()
-    print("Request data:", data)
+    logger.debug("Add to watched history: %s", data)
 
     # Get IMDb ID or movie name
     imdb_id = data.get("imdb_id")
@@ -552,8 +495,7 @@ def add_movie_to_watched_history():
     if not imdb_id:
         return jsonify({"status": "error", "message": "Movie not found"}), 404
 
-    print("IMDb ID obtained:", imdb_id)
-    user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
+    user_id = current_user()
 
     # Call utility function to add the movie
     was_added, message = add_to_watched_history(
@@ -563,22 +505,22 @@ def add_movie_to_watched_history():
     return jsonify({"status": status, "message": message}), 200
 
 
-@app.route("/watched_history", methods=["GET"])
+@bp.route("/watched_history", methods=["GET"])
 def watched_history_page():
     """
     Renders the watched history page.
     """
-    if user[1] is not None or user[1] == "guest":
+    if current_user() is not None:
         return render_template("watched_history.html")
     return render_template("login.html")
 
 
-@app.route("/getWatchedHistoryData", methods=["GET"])
+@bp.route("/getWatchedHistoryData", methods=["GET"])
 def get_watched_history():
     """
     Retrieves the current user's watched history.
     """
-    user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
+    user_id = current_user()
     cursor = g.db.cursor()
     cursor.execute(
         """
@@ -594,20 +536,19 @@ def get_watched_history():
     return jsonify(watched_history), 200
 
 
-@app.route("/removeFromWatchedHistory", methods=["POST"])
+@bp.route("/removeFromWatchedHistory", methods=["POST"])
 def remove_from_watched_history():
     """
     Removes a movie from the user's watched history.
     """
-    print("Entered remove_from_watched_history function")
     data = request.get_json()
-    print("Request data:", data)
+    logger.debug("Remove from watched history: %s", data)
 
     imdb_id = data.get("imdb_id")
     if not imdb_id:
         return jsonify({"status": "error", "message": "IMDb ID not provided"}), 400
 
-    user_id = user[1]  # Assuming 'user' holds the currently logged-in user's ID
+    user_id = current_user()
 
     # Call utility function to remove the movie
     was_removed, message = remove_from_watched_history_util(g.db, user_id, imdb_id)
@@ -615,7 +556,7 @@ def remove_from_watched_history():
     return jsonify({"status": status, "message": message}), 200
 
 
-@app.route("/success")
+@bp.route("/success")
 def success():
     """
     Renders the success page.
@@ -623,25 +564,29 @@ def success():
     return render_template("success.html")
 
 
-@app.route("/movie/<id>")
+@bp.route("/movie/<id>")
 def moviePage(id):
     """
     Renders the movie page with description and details and discussion forum
     """
-    user_id = user[1]
+    user_id = current_user()
     us = ""
     if user_id is None or user_id == "guest":
         us = "Anonymous"
     else:
         us = get_username_data(g.db, user_id)
-    r = requests.get(
-        "http://www.omdbapi.com/", params={"i": id, "apikey": os.getenv("OMDB_API_KEY")}
-    )
-    data = {"movieData": r.json(), "user": us}
+    import requests  # pylint: disable=import-outside-toplevel
+
+    try:
+        movie_data = get_omdb_cache().get(id)
+    except (io_pool.UpstreamBusy, io_pool.UpstreamTimeout, requests.RequestException) as e:
+        logger.warning("OMDB lookup for %s failed: %s", id, e)
+        movie_data = {"imdbID": id, "Title": "Movie details are temporarily unavailable"}
+    data = {"movieData": movie_data, "user": us}
     return render_template("movie.html", data=data)
 
 
-@app.route("/movieDiscussion/<id>", methods=["GET"])
+@bp.route("/movieDiscussion/<id>", methods=["GET"])
 def getMovieDisccusion(id):
     """
     Returns the discussion store for the corresponding imdbId
@@ -649,7 +594,7 @@ def getMovieDisccusion(id):
     return get_discussion(g.db, id)
 
 
-@app.route("/movieDiscussion/<id>", methods=["POST"])
+@bp.route("/movieDiscussion/<id>", methods=["POST"])
 def postCommentOnMovieDisccusion(id):
     """
     Returns the discussion store for the corresponding imdbId
@@ -659,7 +604,7 @@ def postCommentOnMovieDisccusion(id):
     return create_or_update_discussion(g.db, data)
 
 
-@app.route("/get_imdb_id", methods=["POST"])
+@bp.route("/get_imdb_id", methods=["POST"])
 def get_imdb_id():
     """
     Fetches the IMDb ID for a given movie title.
@@ -679,109 +624,169 @@ def get_imdb_id():
         return jsonify({"error": "IMDb ID not found"}), 404
 
 
-import logging
-
-logging.basicConfig(level=logging.DEBUG)
-
-import logging
-import openai
-from flask import Flask, jsonify, request
-
-logging.basicConfig(level=logging.DEBUG)
-
-
-@app.route("/ai_recommendations", methods=["POST"])
+@bp.route("/ai_recommendations", methods=["POST"])
 def ai_recommendations():
     try:
         data = request.get_json()
-        logging.debug(f"Received AI request: {data}")
+        logger.debug("Received AI request: %s", data)
 
         user_query = data.get("query", "")
 
         if not user_query:
-            logging.error("Query is empty")
+            logger.warning("Query is empty")
             return jsonify({"error": "Error occurred"}), 400
 
-        # NEW OpenAI API usage (version 1.0+)
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a movie recommendation AI. Please provide recommendations in a JSON array format with just movie titles, the only key should be movies, I should be able to call json.loads(response.choices[0].message.content) and get a list of movies."},
-                {
-                    "role": "user", 
-                    "content": f"Recommend 5 movies based on: {user_query}. Return just the movie titles in a JSON array."
-                },
-            ],
-        )
+        # Shared client, response cache and latency budget (see ai_recommender.py)
+        movie_titles, source = get_ai_recommender().recommend(user_query)
+        if source == "fallback" and not movie_titles:
+            return jsonify({"error": "AI recommendations are busy, please retry"}), 503
 
-        print(response.choices[0].message.content)
+        recommendations = []
 
-        # Parse the JSON response
-        try:
-            movie_titles = json.loads(response.choices[0].message.content)["movies"]
-            recommendations = []
-            
-            # Look up each movie in database
-            for title in movie_titles:
-                print("Searching for: ", title)
-                imdb_id = get_imdb_id_by_name(g.db, title)
-                if imdb_id:
-                    recommendations.append(
-                        (title, "localhost:5000/thumbnails/" + imdb_id + ".jpg")
-                    )
-
-            logging.debug(f"AI Recommendations with thumbnails: {recommendations}")
-            print(recommendations)
-            return jsonify({"recommendations": recommendations})
-
-        except json.JSONDecodeError:
-            logging.error("Failed to parse AI response as JSON")
-            return jsonify({"error": "Invalid AI response format"}), 500
+        # Resolve every suggested title with one batched lookup (see titles.py)
+        imdb_ids = get_title_resolver().resolve(g.db, movie_titles)
+        for title, imdb_id in zip(movie_titles, imdb_ids):
+            if imdb_id:
+                recommendations.append(
+                    (title, "localhost:5000/thumbnails/" + imdb_id + ".jpg")
+                )
+
+        logger.debug("AI recommendations (%s) with thumbnails: %s", source, recommendations)
+        return jsonify({"recommendations": recommendations, "source": source})
 
     except Exception as e:
-        logging.error(f"Error in AI recommendations: {str(e)}", exc_info=True)
+        logger.exception("Error in AI recommendations: %s", e)
         return jsonify({"error": "Error occurred"}), 500
 
 
-@app.before_request
+@bp.before_app_request
 def before_request():
     """
     Opens the db connection.
     """
+    g.started = time.perf_counter()
 
-    # initialize database
-    init_db()
-    
-    # Create a new connection for each request
-    g.db = sqlite3.connect('movies.db')
-    g.db.row_factory = sqlite3.Row  # This enables column access by name
+    # Check a connection out of the configured storage backend (see storage.py)
+    g.db = get_storage().connect()
 
 
-@app.after_request
+@bp.after_app_request
 def after_request(response):
     """
-    Closes the db connection.
+    Records the request's latency and status (see metrics.py).
     """
+    started = g.get("started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route)
+        metrics.REQUESTS.inc(request.method, route, str(response.status_code))
     return response
 
 
+def teardown_db(_exc):
+    """
+    Returns the db connection to the storage backend.
+    """
+    db = g.pop("db", None)
+    if db is not None:
+        get_storage().release(db)
+
+
+@bp.route("/metrics")
+def metrics_page():
+    """
+    Exposes request and stage timings in the Prometheus text format.
+    """
+    return current_app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # Add a route to serve thumbnails
-@app.route("/thumbnails/<path:filename>")
+@bp.route("/thumbnails/<path:filename>")
 def serve_thumbnail(filename):
     """
-    Serves thumbnail images from the thumbnails directory.
+    Serves thumbnail images from the poster pack or the thumbnails directory.
+    With ?w=<width> a resized copy is served (see thumbnail_variants.py).
+    Posters never change, so they are cached by browsers (see http_cache.py).
     """
     PATH = os.path.join(os.path.dirname(__file__), "thumbnails")
-    thumbnail_path = os.path.join(PATH, filename)
-    if os.path.exists(thumbnail_path):
-        return send_from_directory(PATH, filename)
-    else:
+    width = request.args.get("w", type=int)
+    response = None
+    if width:
+        fmt = negotiate_format(request.headers.get("Accept"), request.args.get("fmt"))
+        try:
+            directory, name, mimetype = get_variant_cache().get(filename, width, fmt)
+        except FileNotFoundError:
+            return jsonify({"error": "Thumbnail not found"}), 404
+        response = send_cached_file(directory, name, mimetype=mimetype)
+    if response is None:
+        pack = get_poster_pack()
+        packed = pack and pack.lookup(os.path.splitext(os.path.basename(filename))[0])
+        if packed:
+            response = send_cached_bytes(*packed, mimetype="image/jpeg")
+    if response is None:
+        response = send_cached_file(PATH, filename)
+    if response is None:
         return jsonify({"error": "Thumbnail not found"}), 404
+    if width:
+        response.vary.add("Accept")
+    return response
+
+
+def create_app(dev_server=False):
+    """
+    Builds the Flask application.
+    Only reads the configuration: no data is loaded and nothing is downloaded,
+    so WSGI servers can import it freely (see wsgi.py and prefork.py).
+    Raises RuntimeError when SECRET_KEY is not set, unless `dev_server` is
+    true, or when CORS_ORIGINS is "*". When CORS_ORIGINS is not set the
+    development server allows DEV_CORS_ORIGINS.
+    """
+    # Load environment variables early so that the secret and OpenAI API keys are available.
+    load_dotenv()
+
+    app = Flask(__name__)
+    # The logged-in user lives in a signed session cookie, so any worker
+    # process or thread can serve any client. Every worker must share the key,
+    # and anyone who knows it can sign a cookie for any user.
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        if not dev_server:
+            raise RuntimeError("SECRET_KEY is not set")
+        # Sessions of the development server do not survive a restart
+        logger.warning("SECRET_KEY is not set, using a random key")
+        secret_key = secrets.token_hex(32)
+    app.secret_key = secret_key
+    app.config["SESSION_COOKIE_HTTPONLY"] = True
+    # A frontend served from another site needs SameSite=None and Secure
+    app.config["SESSION_COOKIE_SAMESITE"] = os.getenv("SESSION_COOKIE_SAMESITE", "Lax")
+    app.config["SESSION_COOKIE_SECURE"] = (
+        os.getenv("SESSION_COOKIE_SECURE", "false").lower() == "true"
+    )
+    # Static assets are not fingerprinted: let browsers cache them for an hour,
+    # then revalidate with their ETag
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 3600
+
+    # Other sites may send the session cookie only from the origins listed here.
+    # Without CORS_ORIGINS the API is same-origin only, except that the
+    # development server accepts the frontend's dev server (see frontend/)
+    default_origins = DEV_CORS_ORIGINS if dev_server else ""
+    origins = [origin.strip() for origin in os.getenv("CORS_ORIGINS", default_origins).split(",")]
+    origins = [origin for origin in origins if origin]
+    if "*" in origins:
+        raise RuntimeError("CORS_ORIGINS must list the allowed origins, not '*'")
+    if origins:
+        CORS(app, resources={r"/*": {"origins": origins}}, supports_credentials=True)
+    app.register_blueprint(bp)
+    app.teardown_appcontext(teardown_db)
+    return app
+
+
+app = create_app(dev_server=__name__ == "__main__")
 
 
 if __name__ == "__main__":
-    print("Downloading thumbnails... (Roughly 600MB)")
+    setup_logging(fmt=os.getenv("LOG_FORMAT", "text"))
+    logger.info("Downloading thumbnails... (Roughly 600MB)")
     download_thumbnails()
-    print("Starting server...")
+    logger.info("Starting server...")
     app.run(port=5000)
@@ -1,58 +1,296 @@
-import pandas as pd
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Enriches movies.csv with IMDb ratings.
+
+    cd backend && python -m src.recommenderapp.data --workers 8 --rate 5
+
+Ratings are fetched concurrently, limited to --rate requests per second
+across all workers. Every --checkpoint-every results are appended to a
+sidecar file, so an interrupted run resumes where it stopped instead of
+starting over. The CSV is rewritten atomically once every missing rating
+has been fetched. The rating source is pluggable: IMDbPY (default) or
+any OMDb-compatible HTTP API.
+"""
+
+import argparse
+import json
+import logging
 import os
-from imdb import IMDb
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+
+from src.recommenderapp.log_config import setup_logging
+from src.recommenderapp.omdb import OMDB_URL
+from src.recommenderapp.ratelimit import TokenBucket
+
+MOVIES_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "movies.csv",
+)
+
+# Column read by the recommender (see item_based.py), and the values it
+# understands for ratings that could not be fetched
+RATING_COLUMN = "imdb_ratings"
+NO_RATING = "No Rating Found"
+ERROR = "Error"
+
+logger = logging.getLogger(__name__)
+
+
+class ImdbPySource:
+    """
+    Fetches ratings with IMDbPY
+    """
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        from imdb import IMDb
+
+        self._ia = IMDb()
 
-# Initialize IMDb instance globally to reduce overhead
-ia = IMDb()
-i = 0
+    def fetch(self, imdb_id):
+        """
+        Returns the rating of a movie, or None if it has none
+        """
+        movie = self._ia.get_movie(imdb_id[2:])  # Removing 'tt' prefix
+        return movie.get("rating")
 
 
-def get_imdb_rating(imdb_id):
-    global i
-    i += 1
-    print(i)
-    if i % 10 == 0:
-        os.system("cls" if os.name == "nt" else "clear")
+class OmdbSource:
+    """
+    Fetches ratings from an OMDb-compatible HTTP API
+    """
 
+    def __init__(self, url=OMDB_URL, api_key=None, timeout=10.0):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def fetch(self, imdb_id):
+        """
+        Returns the rating of a movie, or None if it has none
+        """
+        # One keep-alive session per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.get(
+            self.url, params={"i": imdb_id, "apikey": self.api_key}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        rating = response.json().get("imdbRating")
+        return None if rating in (None, "", "N/A") else float(rating)
+
+
+def checkpoint_path(file_path):
+    """
+    Returns the sidecar file used to resume an interrupted run
+    """
+    return f"{file_path}.ratings.jsonl"
+
+
+def load_checkpoint(path):
+    """
+    Returns the {imdb_id: rating} results saved by an earlier run
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut short by a crash
+                continue
+            results[entry["imdb_id"]] = entry["rating"]
+    return results
+
+
+class Progress:
+    """
+    Counts fetched ratings and logs throughput and ETA periodically
+    """
+
+    def __init__(self, total, interval=10.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self._started = time.monotonic()
+        self._logged = self._started
+
+    def update(self, error=False):
+        """
+        Records one result
+        """
+        self.done += 1
+        self.errors += bool(error)
+        now = time.monotonic()
+        if now - self._logged >= self.interval or self.done == self.total:
+            self._logged = now
+            logger.info("%s", self.summary())
+
+    def summary(self):
+        """
+        Returns the current metrics as a dict
+        """
+        elapsed = time.monotonic() - self._started
+        rate = self.done / elapsed if elapsed else 0.0
+        return {
+            "done": self.done,
+            "total": self.total,
+            "errors": self.errors,
+            "per_second": round(rate, 2),
+            "eta_seconds": round((self.total - self.done) / rate) if rate else None,
+        }
+
+
+def _fetch_rating(source, limiter, imdb_id):
+    limiter.acquire()
     try:
-        movie = ia.get_movie(imdb_id[2:])  # Removing 'tt' prefix
-        rating = movie.get("rating", "No Rating Found")
-        return rating
-    except Exception as e:
-        print(f"Error fetching data for IMDb ID {imdb_id}: {e}")
-        return "Error", "Error"
+        rating = source.fetch(imdb_id)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning("Error fetching data for IMDb ID %s: %s", imdb_id, e)
+        return ERROR
+    return NO_RATING if rating is None else rating
 
 
-def update_csv_with_rating(file_path):
-    # Load the CSV file
+def update_csv_with_rating(
+    file_path,
+    source,
+    column=RATING_COLUMN,
+    workers=4,
+    rate=None,
+    checkpoint_every=100,
+    progress_interval=10.0,
+):
+    """
+    Fills the missing ratings of a movies CSV and returns the progress
+    metrics. Results are checkpointed every `checkpoint_every` ratings.
+    """
     df = pd.read_csv(file_path)
 
     # Ensure 'imdb_id' column exists
     if "imdb_id" not in df.columns:
-        print("Error: 'imdb_id' column not found in the CSV file.")
-        return
+        raise ValueError(f"'imdb_id' column not found in {file_path}")
 
     df = df.drop_duplicates(subset="title", keep="first")
+    if column not in df.columns:
+        df[column] = None
+    # Keep ratings and error markers side by side
+    df[column] = df[column].astype(object)
 
-    # Check if 'rating' column exist; if not, add it
-    if "rating" not in df.columns:
-        df["rating"] = None
+    sidecar = checkpoint_path(file_path)
+    results = load_checkpoint(sidecar)
+    missing = df[column].isnull()
+    todo = [
+        imdb_id
+        for imdb_id in dict.fromkeys(df.loc[missing, "imdb_id"].dropna())
+        if imdb_id not in results
+    ]
+    if results:
+        logger.info("Resuming: %d ratings from the checkpoint, %d to fetch", len(results), len(todo))
 
-    # Filter rows where rating or awards are still missing
-    imdb_ids_to_fetch = df[df["rating"].isnull()]["imdb_id"].tolist()
+    progress = Progress(len(todo), progress_interval)
+    # No burst: spread requests evenly instead of front-loading them
+    limiter = TokenBucket(rate, burst=1)
+    pending_lines = []
+    with open(sidecar, "a", encoding="utf8") as checkpoint, ThreadPoolExecutor(
+        max_workers=workers
+    ) as executor:
 
-    # Fetch rating and awards details concurrently for missing entries
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = list(executor.map(get_imdb_rating, imdb_ids_to_fetch))
+        def flush():
+            checkpoint.writelines(pending_lines)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            pending_lines.clear()
 
-    df.loc[df["rating"].isnull(), "rating"] = results
+        # Keep a bounded number of requests in flight
+        ids = iter(todo)
+        running = {}
+        try:
+            while True:
+                while len(running) < workers * 2:
+                    imdb_id = next(ids, None)
+                    if imdb_id is None:
+                        break
+                    running[executor.submit(_fetch_rating, source, limiter, imdb_id)] = imdb_id
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                failed = None
+                for future in finished:
+                    imdb_id = running.pop(future)
+                    if future.exception() is not None:
+                        # Record the other finished results before raising
+                        failed = future
+                        continue
+                    rating = future.result()
+                    results[imdb_id] = rating
+                    pending_lines.append(
+                        json.dumps({"imdb_id": imdb_id, "rating": rating}) + "\n"
+                    )
+                    progress.update(error=rating == ERROR)
+                    if len(pending_lines) >= checkpoint_every:
+                        flush()
+                if failed is not None:
+                    failed.result()
+        finally:
+            # Keep what was fetched even if the run is interrupted
+            flush()
+
+    df.loc[missing, column] = df.loc[missing, "imdb_id"].map(results)
 
     # Save the updated DataFrame back to the CSV
-    df.to_csv(file_path, index=False)
-    print(f"Updated CSV saved with IMDb ratings in '{file_path}'.")
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+    os.remove(sidecar)
+    logger.info("Updated CSV saved with IMDb ratings in '%s'", file_path)
+    return progress.summary()
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("csv", nargs="?", default=MOVIES_CSV_PATH, help="movies CSV to update")
+    parser.add_argument("--source", choices=("imdbpy", "omdb"), default="imdbpy")
+    parser.add_argument("--url", default=OMDB_URL, help="OMDb-compatible API (--source omdb)")
+    parser.add_argument("--api-key", default=os.getenv("OMDB_API_KEY"))
+    parser.add_argument("--column", default=RATING_COLUMN)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=None, help="requests per second")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_logging(fmt="text")
+    if args.source == "omdb":
+        source = OmdbSource(args.url, args.api_key)
+    else:
+        source = ImdbPySource()
+    summary = update_csv_with_rating(
+        args.csv,
+        source,
+        column=args.column,
+        workers=args.workers,
+        rate=args.rate,
+        checkpoint_every=args.checkpoint_every,
+    )
+    print(json.dumps(summary))
 
 
-# Usage example
-csv_file_path = r".\data\movies.csv"  # Replace with your file path
-update_csv_with_rating(csv_file_path)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Personalized weekly digest.
+
+Every user gets the trending movies plus recommendations computed from
+their own Ratings and WatchedHistory. Histories are read with one query
+per table and scored in chunks: each chunk is scored in one batch by the
+recommender, and chunks run in parallel worker processes. The DigestState
+table stores a fingerprint of what each user's last digest was built
+from, so users whose history (and the trending list) did not change are
+skipped.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.recommenderapp.email_render import render_digest_email
+from src.recommenderapp.outbox import enqueue_email
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SUBJECT = "Newly Released Movies for You"
+
+# Watched movies without a rating count as liked, like the movies picked
+# on the recommendation page
+WATCHED_RATING = 5.0
+
+# Recommender weights, as used for the "all" prediction endpoint
+DIGEST_WEIGHTS = (0.5, 0.3, 0.3)
+
+
+def create_digest_state_table(cursor):
+    """
+    Creates the DigestState table if it does not exist yet
+    """
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS DigestState (
+        user_id INTEGER PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        sent_at REAL NOT NULL
+    )
+    """
+    )
+
+
+def load_user_histories(db):
+    """
+    Returns {user_id: (email, {title: rating})} for every user with an email.
+    Explicit ratings take precedence over watched-history entries.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT idUsers, email FROM Users WHERE email IS NOT NULL")
+    histories = {row[0]: (row[1], {}) for row in cursor.fetchall()}
+
+    cursor.execute(
+        "SELECT w.user_id, m.name FROM WatchedHistory AS w "
+        "JOIN Movies AS m ON w.movie_id = m.idMovies"
+    )
+    for user_id, title in cursor.fetchall():
+        if user_id in histories:
+            histories[user_id][1][title] = WATCHED_RATING
+
+    cursor.execute(
+        "SELECT r.user_id, m.name, r.score FROM Ratings AS r "
+        "JOIN Movies AS m ON r.movie_id = m.idMovies ORDER BY r.time"
+    )
+    for user_id, title, score in cursor.fetchall():
+        if user_id in histories:
+            histories[user_id][1][title] = float(score)
+    return histories
+
+
+def digest_fingerprint(ratings, trending):
+    """
+    Identifies the inputs of one user's digest
+    """
+    digest = hashlib.sha256()
+    for title, rating in sorted(ratings.items()):
+        digest.update(f"{title}\x1f{rating}\x1e".encode("utf-8"))
+    digest.update(b"\x1d")
+    for movie in trending:
+        digest.update(f"{movie['imdb_id']}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_digest_state(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT user_id, fingerprint FROM DigestState")
+    return dict(cursor.fetchall())
+
+
+def _save_digest_state(db, user_id, fingerprint, sent_at):
+    cursor = db.cursor()
+    cursor.execute(
+        "UPDATE DigestState SET fingerprint = ?, sent_at = ? WHERE user_id = ?",
+        (fingerprint, sent_at, user_id),
+    )
+    if cursor.rowcount == 0:
+        cursor.execute(
+            "INSERT INTO DigestState (user_id, fingerprint, sent_at) VALUES (?, ?, ?)",
+            (user_id, fingerprint, sent_at),
+        )
+
+
+def _warm_recommender():
+    # pylint: disable=import-outside-toplevel
+    from src.prediction_scripts import item_based
+
+    item_based._get_batch_index()  # pylint: disable=protected-access
+
+
+def _score_chunk(args):
+    # pylint: disable=import-outside-toplevel
+    from src.prediction_scripts.item_based import recommend_for_users
+
+    users_ratings, top_k = args
+    return recommend_for_users(users_ratings, *DIGEST_WEIGHTS, top_k=top_k)
+
+
+def score_histories(ratings_by_user, top_k=10, chunk_size=256, workers=1):
+    """
+    Scores a list of {title: rating} histories and returns, for each, a list
+    of (title, genres, imdb_id) recommendations
+    """
+    users_ratings = [
+        [{"title": title, "rating": rating} for title, rating in ratings.items()]
+        for ratings in ratings_by_user
+    ]
+    chunks = [
+        (users_ratings[start : start + chunk_size], top_k)
+        for start in range(0, len(users_ratings), chunk_size)
+    ]
+    # Load the catalogue once here so forked workers inherit it
+    _warm_recommender()
+    if workers <= 1 or len(chunks) <= 1:
+        scored = map(_score_chunk, chunks)
+        return [list(zip(*result)) for chunk in scored for result in chunk]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)), initializer=_warm_recommender
+    ) as executor:
+        return [
+            list(zip(*result)) for chunk in executor.map(_score_chunk, chunks) for result in chunk
+        ]
+
+
+def queue_weekly_digests(db, trending, period, top_k=10, chunk_size=None, workers=None):
+    """
+    Builds and queues the digest of every user whose history or the trending
+    list changed since their last digest. `period` (e.g. "2024-W05") keeps
+    re-runs within the same period idempotent. Returns the number of emails
+    queued and of users skipped.
+    """
+    chunk_size = chunk_size or int(os.getenv("DIGEST_CHUNK_SIZE", "256"))
+    workers = workers or int(os.getenv("DIGEST_WORKERS", str(os.cpu_count() or 1)))
+
+    histories = load_user_histories(db)
+    last_state = _load_digest_state(db)
+
+    changed = []
+    for user_id, (email, ratings) in histories.items():
+        fingerprint = digest_fingerprint(ratings, trending)
+        if last_state.get(user_id) != fingerprint:
+            changed.append((user_id, email, ratings, fingerprint))
+
+    with_history = [entry for entry in changed if entry[2]]
+    scored = (
+        score_histories(
+            [entry[2] for entry in with_history],
+            top_k=top_k,
+            chunk_size=chunk_size,
+            workers=workers,
+        )
+        if with_history
+        else []
+    )
+    picks = {entry[0]: recs for entry, recs in zip(with_history, scored)}
+
+    queued = 0
+    now = time.time()
+    for user_id, email, _, fingerprint in changed:
+        queued += enqueue_email(
+            db,
+            email,
+            DIGEST_SUBJECT,
+            render_digest_email(trending, picks.get(user_id, ())),
+            idempotency_key=f"{email}:weekly:{period}",
+        )
+        _save_digest_state(db, user_id, fingerprint, now)
+        db.commit()
+    logger.info("Queued %d digests, %d users unchanged", queued, len(histories) - len(changed))
+    return {"queued": queued, "skipped": len(histories) - len(changed)}
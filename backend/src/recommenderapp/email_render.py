@@ -0,0 +1,212 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Rendering of the recommendation emails.
+
+The title -> genres map is built once per process from movies.csv and the
+email templates are compiled once at import, so rendering a digest is a
+dictionary lookup plus one template render. Genre tags are rendered once
+per title and reused across recipients.
+"""
+
+import csv
+import functools
+import os
+import threading
+
+from jinja2 import Environment
+from markupsafe import Markup
+
+MOVIES_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "movies.csv",
+)
+
+# Colors for specific genres
+GENRE_COLORS = {
+    "Musical": "#FF1493",  # DeepPink
+    "Sci-Fi": "#00CED1",  # DarkTurquoise
+    "Mystery": "#8A2BE2",  # BlueViolet
+    "Thriller": "#FF6347",  # Tomato
+    "Horror": "#FF4500",  # OrangeRed
+    "Documentary": "#228B22",  # ForestGreen
+    "Fantasy": "#FFA500",  # Orange
+    "Adventure": "#FFD700",  # Gold
+    "Children": "#32CD32",  # LimeGreen
+    "Film-Noir": "#2F4F4F",  # DarkSlateGray
+    "Comedy": "#FFB500",  # VividYellow
+    "Crime": "#8B0000",  # DarkRed
+    "Drama": "#8B008B",  # DarkMagenta
+    "Western": "#FF8C00",  # DarkOrange
+    "IMAX": "#20B2AA",  # LightSeaGreen
+    "Action": "#FF0000",  # Red
+    "War": "#B22222",  # FireBrick
+    "(no genres listed)": "#A9A9A9",  # DarkGray
+    "Romance": "#FF69B4",  # HotPink
+    "Animation": "#4B0082",  # Indigo
+}
+DEFAULT_GENRE_COLOR = "#CCCCCC"
+UNKNOWN_GENRES = ("Unknown Genre",)
+
+_ENV = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+
+_TAG_TEMPLATE = _ENV.from_string(
+    '<span style="background-color: {{ color }}; color: #FFFFFF; '
+    'padding: 5px; border-radius: 5px;">{{ genre }}</span>'
+)
+
+FEEDBACK_TEMPLATE = _ENV.from_string(
+    """<html>
+<head></head>
+<body>
+    <h1 style="color: #333333;">Movie Recommendations from BingeSuggest</h1>
+    <p style="color: #555555;">Dear Movie Enthusiast,</p>
+    <p style="color: #555555;">We hope you're having a fantastic day!</p>
+    <div style="padding: 10px; border: 1px solid #cccccc; border-radius: 5px; background-color: #f9f9f9;">
+    <h2>Your Movie Recommendations:</h2>
+    {% for heading, movies in sections %}
+    <h3>Movies {{ heading }}:</h3>
+    <ul style="color: #555555;">
+        {% for movie in movies %}
+        <li>{{ movie }} {{ genre_tags(movie) }}</li><br>
+        {% endfor %}
+    </ul>
+    {% endfor %}
+    </div>
+    <p style="color: #555555;">Enjoy your movie time with BingeSuggest!</p>
+    <p style="color: #555555;">Best regards,<br>BingeSuggest Team 🍿</p>
+</body>
+</html>
+"""
+)
+
+DIGEST_TEMPLATE = _ENV.from_string(
+    """<html>
+<body>
+    <h1>Top 10 Trending Movies This Week</h1>
+    <table border="1" cellpadding="5" cellspacing="0" width="100%">
+        <thead>
+            <tr>
+                <th>Title</th>
+                <th>IMDb</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for movie in trending %}
+            <tr>
+                <td>{{ movie.title }}</td>
+                <td><a href="https://www.imdb.com/title/{{ movie.imdb_id }}/">View on IMDb</a></td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    {% if picks %}
+    <h2>Picked for You</h2>
+    <p>Based on the movies you rated and watched:</p>
+    <ul>
+        {% for title, genres, imdb_id in picks %}
+        <li><a href="https://www.imdb.com/title/{{ imdb_id }}/">{{ title }}</a> {{ genre_tags(genres) }}</li>
+        {% endfor %}
+    </ul>
+    {% endif %}
+    <p><em>This is an automated email. Please do not reply directly to this message.</em></p>
+</body>
+</html>
+"""
+)
+
+# Keys of the categorized feedback data, in the order they are shown
+FEEDBACK_SECTIONS = ("Liked", "Disliked", "Yet to Watch")
+
+_MOVIE_GENRES = None
+_MOVIE_GENRES_LOCK = threading.Lock()
+
+
+def load_movie_genres(path=None):
+    """
+    Reads the title -> genres map from movies.csv
+    """
+    path = path or os.getenv("MOVIES_CSV_PATH", MOVIES_CSV_PATH)
+    movie_to_genres = {}
+    with open(path, "r", encoding="utf8", newline="") as csv_file:
+        for row in csv.DictReader(csv_file):
+            genres = row.get("genres")
+            movie_to_genres[row["title"]] = tuple(genres.split("|")) if genres else ()
+    return movie_to_genres
+
+
+def get_movie_genres():
+    """
+    Returns the process-wide title -> genres map, building it on first use
+    """
+    global _MOVIE_GENRES  # pylint: disable=global-statement
+    if _MOVIE_GENRES is None:
+        with _MOVIE_GENRES_LOCK:
+            if _MOVIE_GENRES is None:
+                _MOVIE_GENRES = load_movie_genres()
+    return _MOVIE_GENRES
+
+
+def set_movie_genres(movie_to_genres):
+    """
+    Replaces the process-wide title -> genres map (e.g. after a catalogue reload)
+    """
+    global _MOVIE_GENRES  # pylint: disable=global-statement
+    with _MOVIE_GENRES_LOCK:
+        _MOVIE_GENRES = movie_to_genres
+    _genre_tags_for_title.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def genre_tag(genre):
+    """
+    Returns the colored HTML tag for one genre
+    """
+    return _TAG_TEMPLATE.render(color=GENRE_COLORS.get(genre, DEFAULT_GENRE_COLOR), genre=genre)
+
+
+@functools.lru_cache(maxsize=4096)
+def _genre_tags(genres):
+    return Markup(" ".join(genre_tag(genre) for genre in genres or UNKNOWN_GENRES))
+
+
+@functools.lru_cache(maxsize=65536)
+def _genre_tags_for_title(title):
+    return _genre_tags(get_movie_genres().get(title))
+
+
+def _genre_tags_for_field(genres):
+    # "Action|Comedy" as stored in movies.csv; NaN for missing values
+    return _genre_tags(tuple(genres.split("|")) if isinstance(genres, str) and genres else None)
+
+
+def render_feedback_email(categorized_data):
+    """
+    Renders the recommendations email for one user's categorized feedback
+    """
+    return FEEDBACK_TEMPLATE.render(
+        sections=[(key, categorized_data.get(key, ())) for key in FEEDBACK_SECTIONS],
+        genre_tags=_genre_tags_for_title,
+    )
+
+
+def render_digest_email(trending, picks=()):
+    """
+    Renders the weekly digest: the trending movies shared by every user plus
+    the user's own (title, genres, imdb_id) recommendations
+    """
+    return DIGEST_TEMPLATE.render(
+        trending=trending, picks=picks, genre_tags=_genre_tags_for_field
+    )
+
+
+def render_feedback_emails(batch):
+    """
+    Renders the recommendations email for many users at once
+    """
+    get_movie_genres()
+    return [render_feedback_email(categorized_data) for categorized_data in batch]
@@ -0,0 +1,71 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Gunicorn settings for serving the app on every core.
+
+    cd backend/src/recommenderapp && gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master process and warmed up there (see
+prefork.py), then forked into WEB_CONCURRENCY workers (one per core by
+default) that share the loaded data copy-on-write. Each worker serves
+GUNICORN_THREADS requests at a time.
+"""
+
+# pylint: disable=invalid-name
+import os
+import tempfile
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Native thread pools are sized per process: with one worker per core,
+# one BLAS thread and one hashing thread per worker already fill the machine
+for _name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BCRYPT_WORKERS"):
+    os.environ.setdefault(_name, "1")
+
+# Workers share their metrics through this directory, one per server run
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"bingesuggest-metrics-{os.getpid()}")
+)
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 2)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Relative paths (movies.db, thumbnails, caches) resolve as with `python app.py`
+chdir = _HERE
+preload_app = True
+
+
+def when_ready(server):
+    """
+    Loads the shared data in the master, before any worker is forked
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.recommenderapp.log_config import setup_logging
+    from src.recommenderapp.prefork import warm_up
+
+    # Forked workers restart the log writer themselves (see log_config.py)
+    setup_logging()
+    server.log.info("Warmed up in %.1fs", warm_up())
+
+
+def post_fork(_server, _worker):
+    """
+    Drops the pools and clients the worker inherited from the master
+    """
+    from src.recommenderapp.prefork import reset_after_fork  # pylint: disable=import-outside-toplevel
+
+    reset_after_fork()
+
+
+def worker_exit(_server, _worker):
+    """
+    Saves the final metrics of a stopping worker
+    """
+    from src.recommenderapp.metrics import REGISTRY  # pylint: disable=import-outside-toplevel
+
+    REGISTRY.flush()
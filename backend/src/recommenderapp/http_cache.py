@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+HTTP caching for the poster thumbnails.
+
+Posters never change once downloaded: a file name is an IMDb id, and a
+resized variant is derived from it. They are served with a strong ETag
+(a hash of the content) and a one year "immutable" Cache-Control, so
+browsers stop revalidating them. A request whose If-None-Match matches
+gets a 304 without the file being opened. File metadata and ETags are
+kept in an in-memory stat cache, so existence checks and 304 replies do
+not touch the filesystem.
+"""
+
+import hashlib
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request, send_file
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class StatCache:
+    """
+    Bounded cache of path -> (size, mtime, etag), including misses
+    """
+
+    def __init__(self, ttl=300.0, missing_ttl=5.0, max_entries=65536):
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _etag_of(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup(self, path):
+        """
+        Returns (size, mtime, etag) for a regular file, or None if it does not exist
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] > now:
+                self._entries.move_to_end(path)
+                return cached[1]
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            entry, expires = None, now + self.missing_ttl
+        else:
+            previous = cached[1] if cached else None
+            if previous and previous[:2] == (st.st_size, st.st_mtime):
+                etag = previous[2]
+            else:
+                etag = self._etag_of(path)
+            entry, expires = (st.st_size, st.st_mtime, etag), now + self.ttl
+        with self._lock:
+            self._entries[path] = (expires, entry)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def forget(self, path):
+        """
+        Drops a path, e.g. after the file was created
+        """
+        with self._lock:
+            self._entries.pop(path, None)
+
+
+_STAT_CACHE = StatCache()
+
+
+def get_stat_cache():
+    """
+    Returns the process-wide stat cache
+    """
+    return _STAT_CACHE
+
+
+def _cache_headers(response, etag, max_age, immutable):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def send_cached_file(
+    directory, filename, mimetype=None, max_age=IMMUTABLE_MAX_AGE, immutable=True, stat_cache=None
+):
+    """
+    Sends directory/filename with a strong ETag and long-lived caching
+    headers, answering matching If-None-Match requests with a 304.
+    Returns None if the file does not exist.
+    """
+    stat_cache = stat_cache or _STAT_CACHE
+    path = safe_join(directory, filename)
+    entry = path and stat_cache.lookup(path)
+    if not entry:
+        return None
+    _, mtime, etag = entry
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = send_file(
+            path, mimetype=mimetype, etag=False, conditional=True, last_modified=mtime
+        )
+    return _cache_headers(response, etag, max_age, immutable)
+
+
+def send_cached_bytes(data, etag, mimetype, max_age=IMMUTABLE_MAX_AGE, immutable=True):
+    """
+    Like send_cached_file, for content already in memory (e.g. a slice of
+    the poster pack)
+    """
+    if request.if_none_match.contains_weak(etag):
+        return _cache_headers(
+            current_app.response_class(status=304), etag, max_age, immutable
+        )
+    # WSGI servers expect bytes, so the slice is copied once here
+    response = current_app.response_class(bytes(data), mimetype=mimetype)
+    _cache_headers(response, etag, max_age, immutable)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
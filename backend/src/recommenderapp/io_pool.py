@@ -0,0 +1,142 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Bounded thread pools for blocking calls to remote services.
+
+Each upstream (OMDB, OpenAI, ...) gets its own small pool with a
+cap on queued work and a timeout. A slow upstream therefore only ties up
+its own threads: once its pool and queue are full further callers fail
+fast with UpstreamBusy instead of piling up on request threads, and the
+recommendation and search routes keep being served.
+"""
+
+import concurrent.futures
+import os
+import threading
+
+from src.recommenderapp.metrics import UPSTREAM_REJECTED, span
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised when an upstream pool has no room for more work
+    """
+
+
+class UpstreamTimeout(Exception):
+    """
+    Raised when an upstream call does not finish within its timeout
+    """
+
+
+class Bulkhead:
+    """
+    Thread pool for one upstream with a concurrency limit, a bounded
+    backlog and a default timeout
+    """
+
+    def __init__(self, name, max_workers, max_pending=None, timeout=10.0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_workers * 2 if max_pending is None else max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"io-{self.name}",
+                    )
+        return self._executor
+
+    def _timed(self, fn, *args, **kwargs):
+        with span(f"pool.{self.name}"):
+            return fn(*args, **kwargs)
+
+    def _done(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def pending(self):
+        """
+        Number of calls running or queued on this pool
+        """
+        return self._pending
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedules fn on the pool and returns its future.
+        Raises UpstreamBusy when the pool and its backlog are full.
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_pending:
+                UPSTREAM_REJECTED.inc(self.name, "busy")
+                raise UpstreamBusy(f"{self.name} is saturated")
+            self._pending += 1
+        try:
+            future = executor.submit(self._timed, fn, *args, **kwargs)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, wait_timeout=None, **kwargs):
+        """
+        Runs fn on the pool and waits at most `wait_timeout` seconds
+        (the pool's timeout by default) for it.
+        The call keeps counting against the pool until it really returns,
+        so a hung upstream cannot make the pool grow without bound.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(
+                timeout=self.timeout if wait_timeout is None else wait_timeout
+            )
+        except concurrent.futures.TimeoutError as exc:
+            future.cancel()
+            UPSTREAM_REJECTED.inc(self.name, "timeout")
+            raise UpstreamTimeout(f"{self.name} timed out") from exc
+
+    def shutdown(self, wait=True):
+        """
+        Stops the pool; a new one is created on next use
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def reset(self):
+        """
+        Forgets the pool inherited from a parent process.
+        Only the forking thread survives a fork: the inherited workers are
+        gone and the lock may be held, so a forked worker starts afresh.
+        """
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+
+def _from_env(name, max_workers, timeout):
+    prefix = f"IO_{name.upper()}_"
+    return Bulkhead(
+        name,
+        max_workers=int(os.getenv(prefix + "CONCURRENCY", str(max_workers))),
+        max_pending=int(os.getenv(prefix + "BACKLOG", str(max_workers * 2))),
+        timeout=float(os.getenv(prefix + "TIMEOUT", str(timeout))),
+    )
+
+
+OMDB = _from_env("omdb", max_workers=8, timeout=5.0)
+OPENAI = _from_env("openai", max_workers=4, timeout=20.0)
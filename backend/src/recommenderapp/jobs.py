@@ -0,0 +1,80 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Scheduled jobs run by the worker (see worker.py). They use the storage
+backend directly and never need the Flask app.
+"""
+
+import contextlib
+import logging
+from datetime import datetime
+
+from src.recommenderapp.digest import queue_weekly_digests
+from src.recommenderapp.mailer import get_mail_dispatcher
+from src.recommenderapp.outbox import drain_outbox
+from src.recommenderapp.storage import get_storage
+from src.recommenderapp.trakt import get_trending_store, refresh_trending
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def _connection():
+    storage = get_storage()
+    db = storage.connect()
+    try:
+        yield db
+    finally:
+        storage.release(db)
+
+
+def get_recent_movies_from_trakt():
+    """Returns the top 10 trending movies from the cached Trakt store (no network)"""
+    store = get_trending_store()
+    movies = store.movies()
+    if not movies:
+        # Nothing cached yet, e.g. the refresh job has not run on this host
+        refresh_trending()
+        movies = store.movies()
+    return movies
+
+
+def send_weekly_recommendations():
+    """Sends weekly recommendations to all users"""
+    try:
+        recent_movies = get_recent_movies_from_trakt()
+        if not recent_movies:
+            logger.error("No movies found from Trakt API")
+            return
+
+        # Queue one digest per user whose history changed; the period
+        # makes re-runs of the same week's digest idempotent
+        year, week, _ = datetime.now().isocalendar()
+        with _connection() as db:
+            counts = queue_weekly_digests(db, recent_movies, f"{year}-W{week:02d}")
+        logger.info(
+            "Queued recommendations for %d users, %d unchanged",
+            counts["queued"],
+            counts["skipped"],
+        )
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("Error in weekly recommendations: %s", str(e))
+        return
+
+    process_outbox()
+
+
+def process_outbox():
+    """Delivers queued emails, retrying failures with backoff"""
+    try:
+        with _connection() as db:
+            counts = drain_outbox(db, get_mail_dispatcher())
+        if any(counts.values()):
+            logger.info("Outbox drained: %s", counts)
+
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("Error draining the email outbox: %s", str(e))
@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Leader election through a lock row in the database.
+
+Each named lock is one SchedulerLock row holding the current owner and
+the time its lease expires. Acquiring or renewing is a single conditional
+UPDATE, so exactly one process holds the lease at a time, whichever
+storage backend is used. A holder that stops renewing (crashed or
+partitioned) loses the lease once it expires.
+"""
+
+import os
+import socket
+import time
+import uuid
+
+
+def create_leader_lock_table(cursor):
+    """
+    Creates the SchedulerLock table if it does not exist yet
+    """
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS SchedulerLock (
+        name VARCHAR(64) PRIMARY KEY,
+        owner VARCHAR(255) NOT NULL,
+        expires_at DOUBLE NOT NULL
+    )
+    """
+    )
+
+
+class LeaderLock:
+    """
+    A lease on a named lock row, renewed by calling acquire() periodically
+    """
+
+    def __init__(self, storage, name="scheduler", lease=60.0, owner=None):
+        self.storage = storage
+        self.name = name
+        self.lease = lease
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held_until = 0.0
+
+    def _execute(self, query, params):
+        db = self.storage.connect()
+        try:
+            cursor = db.cursor()
+            cursor.execute(query, params)
+            db.commit()
+            return cursor.rowcount
+        finally:
+            self.storage.release(db)
+
+    def initialize(self):
+        """
+        Creates the table and the lock row
+        """
+        db = self.storage.connect()
+        try:
+            create_leader_lock_table(db.cursor())
+            db.commit()
+        finally:
+            self.storage.release(db)
+        # Ignored if another process created the row first; any other error propagates
+        self._execute(
+            "INSERT OR IGNORE INTO SchedulerLock (name, owner, expires_at) VALUES (?, '', 0)",
+            (self.name,),
+        )
+
+    def acquire(self):
+        """
+        Takes the lease if it is free or expired, or renews it if already
+        held. Returns True if this process is the leader.
+        """
+        now = time.time()
+        acquired = self._execute(
+            "UPDATE SchedulerLock SET owner = ?, expires_at = ? "
+            "WHERE name = ? AND (owner = ? OR expires_at < ?)",
+            (self.owner, now + self.lease, self.name, self.owner, now),
+        )
+        self._held_until = now + self.lease if acquired == 1 else 0.0
+        return acquired == 1
+
+    def held(self):
+        """
+        True while the last successful acquire() has not expired
+        """
+        return time.time() < self._held_until
+
+    def release(self):
+        """
+        Gives the lease up so another process can take over immediately
+        """
+        self._held_until = 0.0
+        self._execute(
+            "UPDATE SchedulerLock SET expires_at = 0 WHERE name = ? AND owner = ?",
+            (self.name, self.owner),
+        )
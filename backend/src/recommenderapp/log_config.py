@@ -0,0 +1,216 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Logging setup shared by the app, the worker and the scripts.
+
+Modules log through logging.getLogger(__name__); setup_logging() wires the
+root logger once. Records are put on a bounded in-memory queue by a
+QueueHandler and written to stderr by a QueueListener thread, so request
+threads never block on console or pipe I/O. When the queue is full,
+records are dropped and counted (log_records_dropped_total at /metrics)
+instead of stalling the caller.
+
+LOG_LEVEL sets the level (INFO by default) and LOG_FORMAT the output:
+"json" writes one JSON object per line with the request id, method and
+route of the request that logged it; "text" is for the console. Debug
+records inside requests are sampled per request (LOG_DEBUG_SAMPLE, 0.01
+by default), so a sampled request keeps all of its debug lines.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+from src.recommenderapp.metrics import REGISTRY
+
+DEFAULT_QUEUE_SIZE = 10000
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+_LISTENER = None
+
+
+def _request_fields():
+    """
+    Returns (request id, method, route) of the current request, or None
+    """
+    # pylint: disable=import-outside-toplevel
+    from flask import g, has_request_context, request
+
+    if not has_request_context():
+        return None
+    if "request_id" not in g:
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    route = request.url_rule.rule if request.url_rule else request.path
+    return g.request_id, request.method, route
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds request_id, method and route to records logged during a request
+    """
+
+    def filter(self, record):
+        fields = _request_fields()
+        if fields:
+            record.request_id, record.method, record.route = fields
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps debug records of a sampled fraction of the requests.
+    Outside requests every debug record is sampled on its own.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO or self.rate >= 1:
+            return True
+        # pylint: disable=import-outside-toplevel
+        from flask import g, has_request_context
+
+        if not has_request_context():
+            return random.random() < self.rate
+        if "log_sampled" not in g:
+            g.log_sampled = random.random() < self.rate
+        return g.log_sampled
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line
+    """
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when the queue is full
+    """
+
+    def prepare(self, record):
+        # Render the message and traceback here, in the logging thread, but
+        # leave the formatting of the line to the writer's formatter
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+def _start_listener(handler, output):
+    global _LISTENER  # pylint: disable=global-statement
+    _LISTENER = logging.handlers.QueueListener(handler.queue, output)
+    _LISTENER.start()
+
+
+def _stop_listener():
+    global _LISTENER  # pylint: disable=global-statement
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+def _restart_in_child():
+    """
+    The writer thread does not survive a fork (gunicorn workers): give the
+    child a fresh queue, as the old one may be locked, and its own writer
+    """
+    if _LISTENER is not None:
+        handler = next(
+            h for h in logging.getLogger().handlers if isinstance(h, DroppingQueueHandler)
+        )
+        handler.queue = queue.Queue(handler.queue.maxsize)
+        _start_listener(handler, _LISTENER.handlers[0])
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """
+    Sends every log record through a queue to a background writer.
+    Calling it again replaces the previous setup.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler = DroppingQueueHandler(
+        queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))))
+    )
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(DebugSampler(float(os.getenv("LOG_DEBUG_SAMPLE", "0.01"))))
+
+    root = logging.getLogger()
+    _stop_listener()
+    for old in [h for h in root.handlers if isinstance(h, DroppingQueueHandler)]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _start_listener(handler, output)
+    return handler
+
+
+def flush_logs():
+    """
+    Waits until every queued record has been written
+    """
+    if _LISTENER is not None:
+        _LISTENER.queue.join()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Pooled SMTP delivery for bulk mail such as the weekly recommendations.
+
+MailDispatcher runs several sender workers. Each worker keeps one
+authenticated SMTP connection open for many messages and reconnects when
+the server drops it. Failed connection attempts are retried with
+exponential backoff and jitter, so an outage does not turn into a tight
+reconnect loop. All workers share a token bucket so the provider's rate
+limit is respected.
+"""
+
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+
+from src.recommenderapp.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the connection is discarded and the message retried
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class MailDispatcher:
+    """
+    Sends batches of messages over a small pool of reused SMTP connections
+    """
+
+    def __init__(
+        self,
+        host,
+        port=587,
+        sender=None,
+        username=None,
+        password=None,
+        use_tls=True,
+        workers=4,
+        rate=None,
+        messages_per_connection=100,
+        timeout=30.0,
+        max_retries=2,
+        connect_backoff=1.0,
+        max_connect_backoff=30.0,
+    ):
+        self.host = host
+        self.port = int(port)
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.workers = max(1, int(workers))
+        self.limiter = TokenBucket(rate)
+        self.messages_per_connection = messages_per_connection
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.connect_backoff = connect_backoff
+        self.max_connect_backoff = max_connect_backoff
+
+    def _connect_delay(self, failures):
+        """
+        Seconds to wait after `failures` failed connection attempts in a row:
+        doubling up to max_connect_backoff, then jittered so the workers spread out
+        """
+        delay = min(self.max_connect_backoff, self.connect_backoff * 2 ** (failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    def _disconnect(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _should_reconnect(self, error):
+        if isinstance(error, _RECONNECT_ERRORS):
+            return True
+        # 421: service not available, closing transmission channel
+        return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+    def _worker(self, jobs, results):
+        server = None
+        sent_on_connection = 0
+        connect_failures = 0
+        while True:
+            try:
+                index, recipient, message = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if message["From"] is None and self.sender:
+                message["From"] = self.sender
+            error = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if server is not None and sent_on_connection >= self.messages_per_connection:
+                        self._disconnect(server)
+                        server = None
+                    if server is None:
+                        if connect_failures:
+                            time.sleep(self._connect_delay(connect_failures))
+                        try:
+                            server = self._connect()
+                        except (smtplib.SMTPException, OSError):
+                            connect_failures += 1
+                            raise
+                        connect_failures = 0
+                        sent_on_connection = 0
+                    self.limiter.acquire()
+                    server.sendmail(self.sender, recipient, message.as_string())
+                    sent_on_connection += 1
+                    error = None
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    error = e
+                    if server is not None and self._should_reconnect(e):
+                        server.close()
+                        server = None
+                    if server is not None or attempt == self.max_retries:
+                        # Not a connection problem (e.g. recipient refused)
+                        break
+                    logger.warning("SMTP connection lost, reconnecting: %s", str(e))
+            if error is not None:
+                logger.error("SMTP error while sending email to %s: %s", recipient, str(error))
+            results[index] = error
+        if server is not None:
+            self._disconnect(server)
+
+    def send_many(self, messages):
+        """
+        Sends (recipient, MIMEMultipart) pairs and returns a list with, for
+        each message, None on success or the exception that stopped it
+        """
+        jobs = queue.Queue()
+        count = 0
+        for count, (recipient, message) in enumerate(messages, start=1):
+            jobs.put((count - 1, recipient, message))
+        results = [None] * count
+        threads = [
+            threading.Thread(target=self._worker, args=(jobs, results), daemon=True)
+            for _ in range(min(self.workers, count))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+def get_mail_dispatcher():
+    """
+    Builds a dispatcher from the SMTP settings in the environment
+    """
+    rate = os.getenv("SMTP_RATE")
+    return MailDispatcher(
+        host=os.getenv("SMTP_SERVER"),
+        port=os.getenv("SMTP_PORT", "587"),
+        sender=os.getenv("SENDER_EMAIL"),
+        username=os.getenv("SENDER_EMAIL"),
+        password=os.getenv("SENDER_EMAIL_PASSWORD"),
+        use_tls=os.getenv("SMTP_USE_TLS", "1") != "0",
+        workers=os.getenv("SMTP_WORKERS", "4"),
+        rate=float(rate) if rate else None,
+        messages_per_connection=int(os.getenv("SMTP_MESSAGES_PER_CONNECTION", "100")),
+    )
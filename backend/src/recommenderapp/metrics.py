@@ -0,0 +1,360 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+In-process metrics exposed at /metrics in the Prometheus text format.
+
+Recording is cheap: a counter increment or a histogram observation is a
+bisect and a few additions under a per-series lock, and nothing is
+formatted until /metrics is scraped. Request latency is recorded by the
+app's request hooks; span() times the finer stages (recommender steps,
+DB queries, upstream calls).
+
+Under gunicorn every worker keeps its own registry. When METRICS_DIR is
+set (gunicorn.conf.py sets it), each worker writes a snapshot of its
+registry there every few seconds, and a scrape adds up the snapshots of
+all the workers, including those that have exited, so counters never
+go backwards.
+"""
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Seconds; covers cache hits through slow upstream calls
+DEFAULT_BUCKETS = (
+    0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with one series per label combination
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        """
+        Adds `amount` to the series of the given label values
+        """
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def clear(self):
+        """
+        Drops every series
+        """
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def collect(self):
+        """
+        Returns {label values: value}
+        """
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total, value):
+        """
+        Adds one process's value of a series to the running total
+        """
+        return value if total is None else total + value
+
+    def render(self, series):
+        """
+        Formats collected series as exposition lines
+        """
+        for labelvalues, value in sorted(series.items()):
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets and one series per label combination
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get(self, labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(
+                    labelvalues, [threading.Lock(), [0] * (len(self.buckets) + 1), 0.0]
+                )
+        return series
+
+    def observe(self, value, *labelvalues):
+        """
+        Records one observation in the series of the given label values
+        """
+        series = self._get(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with series[0]:
+            series[1][index] += 1
+            series[2] += value
+
+    def clear(self):
+        """
+        Drops every series
+        """
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def collect(self):
+        """
+        Returns {label values: (per-bucket counts, sum)}
+        """
+        with self._lock:
+            items = list(self._series.items())
+        collected = {}
+        for labelvalues, (lock, counts, total) in items:
+            with lock:
+                collected[labelvalues] = (list(counts), total)
+        return collected
+
+    @staticmethod
+    def merge(total, value):
+        """
+        Adds one process's value of a series to the running total
+        """
+        if total is None:
+            return list(value[0]), value[1]
+        return [a + b for a, b in zip(total[0], value[0])], total[1] + value[1]
+
+    def render(self, series):
+        """
+        Formats collected series as exposition lines
+        """
+        bounds = self.buckets + (float("inf"),)
+        for labelvalues, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _labels(self.labelnames, labelvalues, [("le", _number(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """
+    The metrics of one process, plus the snapshots of its sibling workers
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._snapshots = None
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Returns the counter called `name`, creating it on first use
+        """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Returns the histogram called `name`, creating it on first use
+        """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def clear(self):
+        """
+        Drops the values recorded so far, e.g. those a worker inherited from its parent
+        """
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def collect(self):
+        """
+        Returns {metric name: collected series} for this process
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.collect() for metric in metrics}
+
+    def write_snapshot(self, directory):
+        """
+        Atomically writes this process's metrics to directory/<pid>.json
+        """
+        data = {
+            name: [[list(labelvalues), value] for labelvalues, value in series.items()]
+            for name, series in self.collect().items()
+        }
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def start_snapshots(self, directory, interval=5.0):
+        """
+        Writes a snapshot every `interval` seconds from a daemon thread
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._snapshots = directory
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.flush()
+
+        threading.Thread(target=loop, name="metrics-snapshots", daemon=True).start()
+
+    def flush(self):
+        """
+        Writes a snapshot now, if snapshots are enabled
+        """
+        if self._snapshots:
+            try:
+                self.write_snapshot(self._snapshots)
+            except OSError:
+                pass  # Retried on the next tick
+
+    def _sibling_snapshots(self):
+        own = f"{os.getpid()}.json"
+        try:
+            names = sorted(os.listdir(self._snapshots))
+        except OSError:
+            return
+        for name in names:
+            if name == own or not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._snapshots, name), encoding="utf-8") as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        collected = [self.collect()]
+        if self._snapshots:
+            for snapshot in self._sibling_snapshots():
+                collected.append(
+                    {
+                        name: {tuple(labels): value for labels, value in series}
+                        for name, series in snapshot.items()
+                    }
+                )
+        lines = []
+        for metric in metrics:
+            series = {}
+            for process in collected:
+                for labelvalues, value in process.get(metric.name, {}).items():
+                    series[labelvalues] = metric.merge(series.get(labelvalues), value)
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(series))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+SPAN_SECONDS = REGISTRY.histogram(
+    "span_duration_seconds",
+    "Time spent in instrumented stages (recommender steps, DB queries, upstream calls)",
+    ("span",),
+)
+UPSTREAM_REJECTED = REGISTRY.counter(
+    "upstream_rejected_total", "Calls refused by a saturated or timed out pool", ("pool", "reason")
+)
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Times the enclosed block as the stage `name`
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - started, name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as the stage `name`
+    """
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                SPAN_SECONDS.observe(time.perf_counter() - started, name)
+
+        return wrapper
+
+    return decorate
+
+
+def enable_snapshots():
+    """
+    Starts sharing this process's metrics through METRICS_DIR, if it is set
+    """
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        REGISTRY.start_snapshots(
+            directory, float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5"))
+        )
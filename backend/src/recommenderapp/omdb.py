@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Cached OMDB lookups for the movie page.
+
+Responses are kept in an SQLite table keyed by imdb_id with an in-memory
+LRU in front. Entries older than the TTL are still served while a
+background refresh runs, and concurrent misses for the same id share a
+single upstream request.
+"""
+
+import concurrent.futures
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src.recommenderapp import io_pool
+
+OMDB_URL = "http://www.omdbapi.com/"
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class OmdbCache:
+    """
+    Two-level (memory LRU + SQLite) cache of OMDB responses
+    """
+
+    def __init__(
+        self,
+        path="omdb_cache.db",
+        ttl=DEFAULT_TTL,
+        max_memory=2048,
+        url=OMDB_URL,
+        api_key=None,
+        pool=None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.url = url
+        self.api_key = api_key
+        self.pool = pool or io_pool.OMDB
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._write(
+            """
+            CREATE TABLE IF NOT EXISTS OmdbCache (
+                imdb_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _write(self, query, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(query, params)
+        finally:
+            conn.close()
+
+    def _remember(self, imdb_id, entry):
+        with self._lock:
+            self._memory[imdb_id] = entry
+            self._memory.move_to_end(imdb_id)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, imdb_id):
+        with self._lock:
+            entry = self._memory.get(imdb_id)
+            if entry is not None:
+                self._memory.move_to_end(imdb_id)
+                return entry
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT payload, fetched_at FROM OmdbCache WHERE imdb_id = ?", (imdb_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1])
+        self._remember(imdb_id, entry)
+        return entry
+
+    def _store(self, imdb_id, payload):
+        fetched_at = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO OmdbCache (imdb_id, payload, fetched_at) VALUES (?, ?, ?)",
+            (imdb_id, json.dumps(payload), fetched_at),
+        )
+        self._remember(imdb_id, (payload, fetched_at))
+
+    def _fetch(self, imdb_id):
+        import requests  # pylint: disable=import-outside-toplevel
+
+        response = requests.get(
+            self.url,
+            params={"i": imdb_id, "apikey": self.api_key},
+            timeout=self.pool.timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        # Only successful lookups are cached; errors are retried next time
+        if payload.get("Response") != "False":
+            self._store(imdb_id, payload)
+        return payload
+
+    def _claim(self, imdb_id):
+        """
+        Returns (future, is_leader) for the in-flight fetch of imdb_id
+        """
+        with self._lock:
+            future = self._inflight.get(imdb_id)
+            if future is not None:
+                return future, False
+            future = self._inflight[imdb_id] = concurrent.futures.Future()
+            return future, True
+
+    def _settle(self, imdb_id, future, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(imdb_id, None)
+
+    def _revalidate(self, imdb_id):
+        future, leader = self._claim(imdb_id)
+        if not leader:
+            return
+        try:
+            self.pool.submit(self._settle, imdb_id, future, lambda: self._fetch(imdb_id))
+        except io_pool.UpstreamBusy as e:
+            # Keep serving stale data; the next request will try again
+            with self._lock:
+                self._inflight.pop(imdb_id, None)
+            future.set_exception(e)
+
+    def get(self, imdb_id):
+        """
+        Returns the OMDB payload for imdb_id, fetching it on a miss
+        """
+        entry = self._lookup(imdb_id)
+        if entry is not None:
+            payload, fetched_at = entry
+            if time.time() - fetched_at > self.ttl:
+                self._revalidate(imdb_id)
+            return payload
+
+        future, leader = self._claim(imdb_id)
+        if not leader:
+            try:
+                return future.result(timeout=self.pool.timeout)
+            except concurrent.futures.TimeoutError as e:
+                raise io_pool.UpstreamTimeout("omdb timed out") from e
+        return self._settle(
+            imdb_id, future, lambda: self.pool.run(self._fetch, imdb_id)
+        )
+
+
+_OMDB_CACHE = None
+_OMDB_CACHE_LOCK = threading.Lock()
+
+
+def get_omdb_cache():
+    """
+    Returns the process-wide OMDB cache
+    """
+    global _OMDB_CACHE  # pylint: disable=global-statement
+    if _OMDB_CACHE is None:
+        with _OMDB_CACHE_LOCK:
+            if _OMDB_CACHE is None:
+                _OMDB_CACHE = OmdbCache(
+                    path=os.getenv("OMDB_CACHE_PATH", "omdb_cache.db"),
+                    ttl=float(os.getenv("OMDB_CACHE_TTL", str(DEFAULT_TTL))),
+                    url=os.getenv("OMDB_URL", OMDB_URL),
+                    api_key=os.getenv("OMDB_API_KEY"),
+                )
+    return _OMDB_CACHE
@@ -0,0 +1,183 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Durable outbound email queue.
+
+Routes and jobs only insert rows into the EmailOutbox table; a worker
+drains it in batches through the MailDispatcher. Failed deliveries are
+retried with exponential backoff and moved to the "dead" state after
+max_attempts. Every row carries an idempotency key so the same email to
+the same recipient is only ever queued once.
+"""
+
+import hashlib
+import logging
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+# How long a claimed batch may stay in "sending" before another worker
+# assumes the claiming worker died and takes it over
+CLAIM_LEASE = 300.0
+
+
+def create_outbox_table(cursor):
+    """
+    Creates the EmailOutbox table if it does not exist yet
+    """
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS EmailOutbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT UNIQUE NOT NULL,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body_html TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        sent_at REAL
+    )
+    """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_due ON EmailOutbox (status, next_attempt_at)"
+    )
+
+
+def make_idempotency_key(recipient, *parts):
+    """
+    Builds a per-recipient idempotency key from the identifying parts of a message
+    """
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8"))
+    return f"{recipient}:{digest.hexdigest()}"
+
+
+def enqueue_email(db, recipient, subject, body_html, idempotency_key=None):
+    """
+    Queues an email for delivery. Returns False if a message with the same
+    idempotency key was already queued.
+    """
+    if idempotency_key is None:
+        idempotency_key = make_idempotency_key(recipient, subject, body_html)
+    now = time.time()
+    cursor = db.cursor()
+    # A single statement, so concurrent enqueues of one key cannot both insert
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO EmailOutbox
+            (idempotency_key, recipient, subject, body_html, status, attempts,
+             next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        """,
+        (idempotency_key, recipient, subject, body_html, PENDING, now, now),
+    )
+    db.commit()
+    return cursor.rowcount == 1
+
+
+def _claim_batch(db, batch_size, now, max_attempts):
+    """
+    Marks up to batch_size due messages as being sent by this worker.
+    Taking over an expired claim counts as an attempt, so a message that
+    crashes its sender is dead-lettered instead of reclaimed forever.
+    Returns the claimed messages and the number dead-lettered.
+    """
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        SELECT id, recipient, subject, body_html, attempts, status FROM EmailOutbox
+        WHERE status IN (?, ?) AND next_attempt_at <= ?
+        ORDER BY next_attempt_at, id LIMIT ?
+        """,
+        (PENDING, SENDING, now, batch_size),
+    )
+    claimed = []
+    dead = 0
+    for message_id, recipient, subject, body_html, attempts, status in cursor.fetchall():
+        if status == SENDING:
+            # The worker that claimed it died or hung while sending
+            attempts += 1
+            if attempts >= max_attempts:
+                cursor.execute(
+                    "UPDATE EmailOutbox SET status = ?, attempts = ?, last_error = ? "
+                    "WHERE id = ? AND status = ? AND next_attempt_at <= ?",
+                    (DEAD, attempts, "Claim lease expired", message_id, SENDING, now),
+                )
+                if cursor.rowcount == 1:
+                    dead += 1
+                    logger.error("Giving up on email %s to %s: claim expired", message_id, recipient)
+                continue
+        cursor.execute(
+            "UPDATE EmailOutbox SET status = ?, attempts = ?, next_attempt_at = ? "
+            "WHERE id = ? AND status = ? AND next_attempt_at <= ?",
+            (SENDING, attempts, now + CLAIM_LEASE, message_id, status, now),
+        )
+        if cursor.rowcount == 1:
+            claimed.append((message_id, recipient, subject, body_html, attempts))
+    db.commit()
+    return claimed, dead
+
+
+def drain_outbox(db, dispatcher, batch_size=100, max_attempts=5, base_delay=60.0):
+    """
+    Sends every due message in batches and records the outcome of each.
+    Returns a dict with the number of messages sent, retried and dead-lettered.
+    """
+    counts = {SENT: 0, "retried": 0, DEAD: 0}
+    while True:
+        now = time.time()
+        batch, dead = _claim_batch(db, batch_size, now, max_attempts)
+        counts[DEAD] += dead
+        if not batch:
+            if dead:
+                continue
+            return counts
+        messages = []
+        for _, recipient, subject, body_html, _ in batch:
+            message = MIMEMultipart("alternative")
+            message["To"] = recipient
+            message["Subject"] = subject
+            message.attach(MIMEText(body_html, "html"))
+            messages.append((recipient, message))
+
+        results = dispatcher.send_many(messages)
+
+        cursor = db.cursor()
+        finished = time.time()
+        for (message_id, recipient, _, _, attempts), error in zip(batch, results):
+            if error is None:
+                cursor.execute(
+                    "UPDATE EmailOutbox SET status = ?, sent_at = ?, last_error = NULL "
+                    "WHERE id = ?",
+                    (SENT, finished, message_id),
+                )
+                counts[SENT] += 1
+                continue
+            attempts += 1
+            if attempts >= max_attempts:
+                status, next_attempt_at = DEAD, finished
+                counts[DEAD] += 1
+                logger.error("Giving up on email %s to %s: %s", message_id, recipient, error)
+            else:
+                status = PENDING
+                next_attempt_at = finished + base_delay * 2 ** (attempts - 1)
+                counts["retried"] += 1
+            cursor.execute(
+                "UPDATE EmailOutbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt_at, str(error), message_id),
+            )
+        db.commit()
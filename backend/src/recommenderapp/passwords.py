@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Password hashing off the request threads.
+
+bcrypt costs hundreds of milliseconds of CPU per hash by design. Hashes
+and checks run on a bounded pool (see io_pool.Bulkhead) sized to the CPU
+count; bcrypt releases the GIL, so the pool hashes in parallel while
+request threads keep serving other routes. When the pool and its backlog
+are full, callers get UpstreamBusy right away instead of queueing behind
+a login storm. The work factor is BCRYPT_ROUNDS; hashes made with another
+cost are upgraded the next time their owner logs in.
+"""
+
+import os
+
+import bcrypt
+
+from src.recommenderapp.io_pool import Bulkhead
+
+DEFAULT_ROUNDS = 12
+
+
+def _from_env():
+    workers = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+    return Bulkhead(
+        "bcrypt",
+        max_workers=workers,
+        max_pending=int(os.getenv("BCRYPT_BACKLOG", str(workers * 8))),
+        timeout=float(os.getenv("BCRYPT_TIMEOUT", "10.0")),
+    )
+
+
+BCRYPT = _from_env()
+
+
+def bcrypt_rounds():
+    """
+    Returns the configured bcrypt work factor
+    """
+    return int(os.getenv("BCRYPT_ROUNDS", str(DEFAULT_ROUNDS)))
+
+
+def _as_bytes(value):
+    """
+    Stored hashes come back as bytes, bytearray or str depending on the driver
+    """
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return bytes(value)
+
+
+def hash_cost(hashed):
+    """
+    Returns the work factor a bcrypt hash was made with
+    """
+    return int(_as_bytes(hashed).split(b"$")[2])
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed)
+
+
+def hash_password(password, rounds=None, pool=None):
+    """
+    Hashes a password on the bcrypt pool.
+    Raises UpstreamBusy when the pool is saturated.
+    """
+    pool = pool or BCRYPT
+    return pool.run(_hash, password, rounds or bcrypt_rounds())
+
+
+def check_password(password, hashed, rounds=None, pool=None):
+    """
+    Checks a password against its stored hash on the bcrypt pool.
+    Returns (matches, new_hash): new_hash is a rehash at the configured
+    cost when the password matches a hash made with another cost, else None.
+    """
+    pool = pool or BCRYPT
+    rounds = rounds or bcrypt_rounds()
+    hashed = _as_bytes(hashed)
+    if not pool.run(_check, password, hashed):
+        return False, None
+    if hash_cost(hashed) == rounds:
+        return True, None
+    return True, pool.run(_hash, password, rounds)
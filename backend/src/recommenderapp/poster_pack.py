@@ -0,0 +1,137 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Packed poster store: every thumbnail concatenated into one blob file,
+with a JSON index of imdb_id -> [offset, length, etag] next to it.
+
+A single file is much faster than tens of thousands of small ones to
+copy, back up and read cold. The server maps the blob with mmap and
+slices posters out of the page cache, with no open/stat/read syscalls.
+Build the pack from the thumbnails directory with:
+
+    cd backend/src/recommenderapp && python poster_pack.py
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+POSTER_PACK = os.path.join(os.path.dirname(__file__), "posters.pack")
+THUMBNAILS_DIR = os.path.join(os.path.dirname(__file__), "thumbnails")
+
+
+def index_path(pack_path):
+    """
+    Returns the path of the index belonging to a pack
+    """
+    return f"{pack_path}.idx"
+
+
+def build_pack(source_dir=THUMBNAILS_DIR, pack_path=POSTER_PACK):
+    """
+    Packs every .jpg in source_dir, keyed by file name without extension.
+    Both files are written under temporary names and renamed into place.
+    Returns the number of posters packed.
+    """
+    names = sorted(name for name in os.listdir(source_dir) if name.lower().endswith(".jpg"))
+    index = {}
+    tmp_pack = f"{pack_path}.{os.getpid()}.tmp"
+    tmp_index = f"{index_path(pack_path)}.{os.getpid()}.tmp"
+    offset = 0
+    with open(tmp_pack, "wb") as pack:
+        for name in names:
+            with open(os.path.join(source_dir, name), "rb") as f:
+                data = f.read()
+            pack.write(data)
+            # Same hash as http_cache.StatCache, so ETags survive the switch
+            etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+            index[os.path.splitext(name)[0]] = [offset, len(data), etag]
+            offset += len(data)
+    with open(tmp_index, "w", encoding="utf8") as f:
+        json.dump({"size": offset, "posters": index}, f, separators=(",", ":"))
+    os.replace(tmp_pack, pack_path)
+    os.replace(tmp_index, index_path(pack_path))
+    return len(index)
+
+
+class PosterPack:
+    """
+    Read-only, memory-mapped view of a packed poster store
+    """
+
+    def __init__(self, pack_path=POSTER_PACK):
+        with open(index_path(pack_path), "r", encoding="utf8") as f:
+            index = json.load(f)
+        self._index = index["posters"]
+        with open(pack_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != index["size"]:
+                raise ValueError(f"{pack_path} does not match its index")
+            # An empty pack cannot be mapped
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if index["size"] else b""
+        self._view = memoryview(self._map)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, imdb_id):
+        return imdb_id in self._index
+
+    def lookup(self, imdb_id):
+        """
+        Returns (memoryview, etag) of a poster without copying it, or None
+        """
+        entry = self._index.get(imdb_id)
+        if entry is None:
+            return None
+        offset, length, etag = entry
+        return self._view[offset : offset + length], etag
+
+    def close(self):
+        """
+        Unmaps the pack
+        """
+        self._view.release()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+
+_POSTER_PACK = None
+_POSTER_PACK_LOADED = False
+_POSTER_PACK_LOCK = threading.Lock()
+
+
+def get_poster_pack():
+    """
+    Returns the process-wide pack, or None if no pack has been built
+    """
+    global _POSTER_PACK, _POSTER_PACK_LOADED  # pylint: disable=global-statement
+    if not _POSTER_PACK_LOADED:
+        with _POSTER_PACK_LOCK:
+            if not _POSTER_PACK_LOADED:
+                pack_path = os.getenv("POSTER_PACK", POSTER_PACK)
+                if os.path.exists(index_path(pack_path)):
+                    _POSTER_PACK = PosterPack(pack_path)
+                _POSTER_PACK_LOADED = True
+    return _POSTER_PACK
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--source", default=THUMBNAILS_DIR, help="thumbnails directory")
+    parser.add_argument("--out", default=POSTER_PACK, help="pack file to write")
+    args = parser.parse_args()
+    count = build_pack(args.source, args.out)
+    print(f"Packed {count} posters into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Process setup for pre-forking servers (see gunicorn.conf.py).
+
+warm_up() runs once in the server's master process, before the workers
+are forked: it creates the database, then loads the read-only data (recommender
+matrices, the text and title indexes, the search table, the poster pack)
+so every worker shares those pages copy-on-write instead of loading its
+own copy.
+
+reset_after_fork() runs in each worker right after the fork. Threads do
+not survive a fork and sockets must not be shared between processes, so
+the thread pools, connection pools and HTTP clients inherited from the
+master are dropped and rebuilt lazily by the worker, and the metrics
+recorded by the master are cleared.
+"""
+
+# pylint: disable=protected-access
+import gc
+import time
+
+from src.prediction_scripts import item_based, text_based
+from src.recommenderapp import (
+    ai_recommender,
+    io_pool,
+    metrics,
+    omdb,
+    passwords,
+    poster_pack,
+    storage,
+    thumbnail_variants,
+    trakt,
+)
+from src.recommenderapp.search import get_search_table
+
+
+def warm_up():
+    """
+    Loads the shared read-only data and returns the time it took in seconds
+    """
+    started = time.perf_counter()
+    # The AI recommender imports openai on first use; import it here once for all workers
+    import openai  # pylint: disable=import-outside-toplevel,unused-import
+
+    # Build the database once here, not in every worker on its first request
+    storage.get_storage().initialize()
+    item_based._get_batch_index()
+    text_based.get_text_index()
+    ai_recommender._get_seed_index()
+    get_search_table()
+    poster_pack.get_poster_pack()
+    # Move everything loaded so far out of the collector's reach: collections
+    # in the workers would otherwise write to these objects and copy their pages
+    gc.collect()
+    gc.freeze()
+    return time.perf_counter() - started
+
+
+def reset_after_fork():
+    """
+    Drops the per-process state inherited from the master process
+    """
+    for pool in (io_pool.OMDB, io_pool.OPENAI, passwords.BCRYPT, ai_recommender.FALLBACK_POOL):
+        pool.reset()
+    storage._STORAGE = None
+    omdb._OMDB_CACHE = None
+    trakt._TRENDING_STORE = None
+    ai_recommender._AI_RECOMMENDER = None
+    thumbnail_variants._VARIANT_CACHE = None
+    metrics.REGISTRY.clear()
+    metrics.enable_snapshots()
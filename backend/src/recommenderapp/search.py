@@ -6,23 +6,48 @@ This code is licensed under MIT license (see LICENSE for details)
 """
 
 import os
+import threading
+
 import pandas as pd
 
 app_dir = os.path.dirname(os.path.abspath(__file__))
 code_dir = os.path.dirname(app_dir)
 project_dir = os.path.dirname(code_dir)
+MOVIES_CSV_PATH = os.path.join(project_dir, "data", "movies.csv")
+
+_MOVIES = None
+_MOVIES_LOCK = threading.Lock()
+
+
+def get_search_table():
+    """
+    Returns the movies table searched by Search, read from movies.csv on first use
+    """
+    global _MOVIES  # pylint: disable=global-statement
+    if _MOVIES is None:
+        with _MOVIES_LOCK:
+            if _MOVIES is None:
+                df = pd.read_csv(MOVIES_CSV_PATH)
+                df['title_lower'] = df['title'].str.lower()
+                _MOVIES = df
+    return _MOVIES
+
 
 class Search:
     """
     Search feature for landing page
     """
 
-    df = pd.read_csv(project_dir + "/data/movies.csv")
-    df['title_lower'] = df['title'].str.lower()
-
     def __init__(self):
         pass
 
+    @property
+    def df(self):
+        """
+        The movies table, shared by all instances
+        """
+        return get_search_table()
+
     def search_movies(self, word):
         """
         Search for movies containing the given word
@@ -0,0 +1,316 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Storage backends for the utils.py data functions.
+
+Every backend hands out DB-API connections that accept the qmark ("?")
+queries used throughout utils.py, so the data functions stay backend
+agnostic. Queries are written for SQLite; the MySQL backend also rewrites
+INSERT OR IGNORE to MySQL's INSERT IGNORE. The backend is chosen with the DB_BACKEND environment variable
+("sqlite" by default, or "mysql").
+"""
+
+import functools
+import os
+import re
+import sqlite3
+import threading
+
+from src.recommenderapp.digest import create_digest_state_table
+from src.recommenderapp.metrics import span
+from src.recommenderapp.outbox import create_outbox_table
+from src.recommenderapp.titles import create_title_table, ensure_title_index
+from src.recommenderapp.utils import DB_NAME, init_db
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """
+    Cursor recording the time of every query (see metrics.py)
+    """
+
+    def execute(self, *args):
+        with span("db.query"):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with span("db.query"):
+            return super().executemany(*args)
+
+
+class _TimedConnection(sqlite3.Connection):
+    """
+    Connection whose queries are timed, including the execute() shortcuts
+    """
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+
+class SQLiteStorage:
+    """
+    SQLite backend. Connections use WAL journaling so readers never block
+    the single writer, and a busy timeout instead of failing on lock.
+    """
+
+    def __init__(self, path=DB_NAME, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def initialize(self):
+        """
+        Creates the database on first use
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                init_db(db_name=self.path)
+                conn = sqlite3.connect(self.path, timeout=self.timeout)
+                conn.execute("PRAGMA journal_mode = WAL")
+                # Databases created before the outbox, digest state and
+                # title index existed
+                with conn:
+                    create_outbox_table(conn.cursor())
+                    create_digest_state_table(conn.cursor())
+                    create_title_table(conn.cursor())
+                ensure_title_index(conn)
+                conn.close()
+                self._initialized = True
+
+    def connect(self):
+        """
+        Opens a connection; SQLite connections are cheap so none are pooled
+        """
+        self.initialize()
+        with span("db.connect"):
+            conn = sqlite3.connect(self.path, timeout=self.timeout, factory=_TimedConnection)
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        return conn
+
+    def release(self, conn):
+        """
+        Closes a connection obtained from connect()
+        """
+        conn.close()
+
+
+@functools.lru_cache(maxsize=512)
+def to_format_paramstyle(query):
+    """
+    Rewrites a qmark ("?") query to the format ("%s") style used by MySQL
+    drivers. Question marks inside string literals are left alone and
+    literal percent signs are escaped.
+    """
+    out = []
+    quote = None
+    for char in query:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "?":
+            out.append("%s")
+            continue
+        out.append("%%" if char == "%" else char)
+    return "".join(out)
+
+
+_INSERT_OR_IGNORE_RE = re.compile(r"^(\s*INSERT)\s+OR\s+IGNORE\b", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def to_mysql_dialect(query):
+    """
+    Rewrites the SQLite-only statements used by the data functions to MySQL
+    """
+    return _INSERT_OR_IGNORE_RE.sub(r"\1 IGNORE", query)
+
+
+class _MySQLCursor:
+    """
+    Cursor wrapper translating qmark queries for the MySQL driver
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        """
+        Executes a qmark style query
+        """
+        query = to_mysql_dialect(query)
+        with span("db.query"):
+            if params:
+                return self._cursor.execute(to_format_paramstyle(query), tuple(params))
+            return self._cursor.execute(query)
+
+    def executemany(self, query, seq_of_params):
+        """
+        Executes a qmark style query for every parameter tuple
+        """
+        with span("db.query"):
+            return self._cursor.executemany(
+                to_format_paramstyle(to_mysql_dialect(query)), [tuple(p) for p in seq_of_params]
+            )
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _MySQLConnection:
+    """
+    Pooled MySQL connection exposing the subset of the sqlite3 API
+    used by utils.py
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        """
+        Returns a qmark-compatible cursor
+        """
+        return _MySQLCursor(self._conn.cursor(buffered=True))
+
+    def execute(self, query, params=()):
+        """
+        sqlite3-style shortcut returning the cursor
+        """
+        cursor = self.cursor()
+        cursor.execute(query, params)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class MySQLStorage:
+    """
+    MySQL backend backed by a mysql-connector connection pool. Callers
+    block (up to pool_timeout seconds) when every pooled connection is in
+    use instead of failing immediately.
+    """
+
+    # mysql-connector refuses pools larger than this
+    MAX_POOL_SIZE = 32
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=3306,
+        user="root",
+        password="",
+        database="testDB",
+        pool_size=8,
+        pool_timeout=30.0,
+    ):
+        self.config = {
+            "host": host,
+            "port": int(port),
+            "user": user,
+            "password": password,
+            "database": database,
+        }
+        self.pool_size = min(int(pool_size), self.MAX_POOL_SIZE)
+        self.pool_timeout = pool_timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def initialize(self):
+        """
+        Creates the connection pool and fills the title index if it is
+        empty; the schema is managed by init.sql
+        """
+        if self._pool is not None:
+            return
+        with self._pool_lock:
+            if self._pool is None:
+                # pylint: disable=import-outside-toplevel
+                from mysql.connector import pooling
+
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"bingesuggest-{os.getpid()}-{id(self)}",
+                    pool_size=self.pool_size,
+                    pool_reset_session=True,
+                    autocommit=False,
+                    **self.config,
+                )
+                # No caller holds a connection until the pool is published
+                conn = _MySQLConnection(pool.get_connection())
+                try:
+                    ensure_title_index(conn)
+                finally:
+                    conn.close()
+                self._pool = pool
+
+    def connect(self):
+        """
+        Checks a connection out of the pool
+        """
+        self.initialize()
+        with span("db.connect"):
+            if not self._slots.acquire(timeout=self.pool_timeout):
+                raise TimeoutError("Timed out waiting for a pooled MySQL connection")
+        try:
+            return _MySQLConnection(self._pool.get_connection())
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool
+        """
+        try:
+            conn.close()
+        finally:
+            self._slots.release()
+
+
+_STORAGE = None
+_STORAGE_LOCK = threading.Lock()
+
+
+def create_storage(backend=None):
+    """
+    Builds a storage backend from the environment
+    """
+    backend = (backend or os.getenv("DB_BACKEND", "sqlite")).lower()
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("SQLITE_PATH", DB_NAME))
+    if backend == "mysql":
+        return MySQLStorage(
+            host=os.getenv("DB_HOST", "127.0.0.1"),
+            port=os.getenv("DB_PORT", "3306"),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASSWORD", ""),
+            database=os.getenv("DB_DATABASE", "testDB"),
+            pool_size=os.getenv("DB_POOL_SIZE", "8"),
+        )
+    raise ValueError(f"Unknown DB_BACKEND: {backend}")
+
+
+def get_storage():
+    """
+    Returns the process-wide storage backend
+    """
+    global _STORAGE  # pylint: disable=global-statement
+    if _STORAGE is None:
+        with _STORAGE_LOCK:
+            if _STORAGE is None:
+                _STORAGE = create_storage()
+    return _STORAGE
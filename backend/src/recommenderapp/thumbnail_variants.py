@@ -0,0 +1,180 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Resized variants of the poster thumbnails.
+
+/thumbnails/<file>?w=92 serves a copy of the poster scaled to one of a
+few fixed widths. The copy is encoded as WebP, or as progressive JPEG for
+clients that do not accept WebP. Each variant is rendered once, written
+atomically to a cache directory and served from disk afterwards.
+Concurrent requests for the same variant wait on a per-variant lock
+instead of all rendering it. Posters are read from the thumbnails
+directory, or from the poster pack when they are not there. Pillow is
+optional: without it the original poster is served.
+"""
+
+import io
+import logging
+import os
+import threading
+
+from src.recommenderapp.http_cache import StatCache, get_stat_cache
+from src.recommenderapp.poster_pack import get_poster_pack
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = os.path.join(os.path.dirname(__file__), "thumbnails")
+VARIANTS_DIR = os.path.join(os.path.dirname(__file__), "thumbnail_variants")
+
+# Requested widths are rounded up to one of these so that the number of
+# cached variants per poster stays bounded
+WIDTHS = (92, 154, 185, 342, 500)
+
+FORMATS = {
+    "webp": ("webp", "image/webp"),
+    "jpeg": ("jpg", "image/jpeg"),
+}
+
+
+def snap_width(width):
+    """
+    Returns the smallest supported width >= width (or the largest one)
+    """
+    for candidate in WIDTHS:
+        if width <= candidate:
+            return candidate
+    return WIDTHS[-1]
+
+
+def negotiate_format(accept_header, requested=None):
+    """
+    Picks "webp" or "jpeg" from an explicit ?fmt= value or the Accept header
+    """
+    if requested in FORMATS:
+        return requested
+    return "webp" if "image/webp" in (accept_header or "") else "jpeg"
+
+
+class VariantCache:
+    """
+    Disk cache of resized posters
+    """
+
+    def __init__(
+        self,
+        source_dir=THUMBNAILS_DIR,
+        cache_dir=VARIANTS_DIR,
+        quality=80,
+        stat_cache=None,
+        pack=None,
+    ):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.stat_cache = stat_cache or StatCache()
+        self.pack = pack
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry
+
+    def _unlock(self, key, entry):
+        with self._locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def _render(self, source, dest_path, width, fmt):
+        # pylint: disable=import-outside-toplevel
+        from PIL import Image
+
+        # source is a file path, or the bytes of a packed poster
+        with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+            image.draft("RGB", (width, width * 3))  # let libjpeg decode at a reduced scale
+            image = image.convert("RGB")
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if fmt == "webp":
+                    image.save(tmp_path, "WEBP", quality=self.quality, method=4)
+                else:
+                    image.save(
+                        tmp_path, "JPEG", quality=self.quality, progressive=True, optimize=True
+                    )
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, dest_path)
+
+    def get(self, filename, width, fmt="jpeg"):
+        """
+        Returns (directory, filename, mimetype) of the poster at the given
+        width, rendering it on first use. Falls back to the original poster
+        when Pillow is missing or the image cannot be decoded. Raises
+        FileNotFoundError if there is no such poster.
+        """
+        filename = os.path.basename(filename)
+        source = os.path.join(self.source_dir, filename)
+        if self.stat_cache.lookup(source) is None:
+            packed = self.pack.lookup(os.path.splitext(filename)[0]) if self.pack else None
+            if packed is None:
+                raise FileNotFoundError(filename)
+            source = packed[0]
+        width = snap_width(width)
+        extension, mimetype = FORMATS[fmt]
+        stem = os.path.splitext(filename)[0]
+        variant = f"{stem}-w{width}.{extension}"
+        directory = os.path.join(self.cache_dir, str(width))
+        dest_path = os.path.join(directory, variant)
+        if self.stat_cache.lookup(dest_path) is not None:
+            return directory, variant, mimetype
+
+        entry = self._lock_for(dest_path)
+        try:
+            with entry[0]:
+                # Another request may have rendered it while we waited
+                if not os.path.exists(dest_path):
+                    os.makedirs(directory, exist_ok=True)
+                    self._render(source, dest_path, width, fmt)
+                self.stat_cache.forget(dest_path)
+        except ImportError:
+            logger.warning("Pillow is not installed, serving original thumbnails")
+            return self.source_dir, filename, "image/jpeg"
+        except OSError as e:
+            logger.error("Could not resize %s: %s", filename, str(e))
+            return self.source_dir, filename, "image/jpeg"
+        finally:
+            self._unlock(dest_path, entry)
+        return directory, variant, mimetype
+
+
+_VARIANT_CACHE = None
+_VARIANT_CACHE_LOCK = threading.Lock()
+
+
+def get_variant_cache():
+    """
+    Returns the process-wide variant cache
+    """
+    global _VARIANT_CACHE  # pylint: disable=global-statement
+    if _VARIANT_CACHE is None:
+        with _VARIANT_CACHE_LOCK:
+            if _VARIANT_CACHE is None:
+                _VARIANT_CACHE = VariantCache(
+                    cache_dir=os.getenv("THUMBNAIL_VARIANTS_DIR", VARIANTS_DIR),
+                    stat_cache=get_stat_cache(),
+                    pack=get_poster_pack(),
+                )
+    return _VARIANT_CACHE
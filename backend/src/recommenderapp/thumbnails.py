@@ -0,0 +1,195 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Download and extraction of the movie poster thumbnails.
+
+The ~600MB archive is streamed to a ".part" file in chunks. An
+interrupted download resumes with an HTTP Range request. Once complete,
+its size (and SHA-256, if one is configured) is checked before the file
+is renamed into place. Only the .jpg members are extracted, straight
+into the thumbnails directory, by several threads in parallel.
+"""
+
+import hashlib
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.exceptions import ChunkedEncodingError
+
+THUMBNAILS_URL = (
+    "https://www.kaggle.com/api/v1/datasets/download/rezaunderfit/48k-imdb-movies-with-posters"
+)
+THUMBNAILS_DIR = os.path.join(os.path.dirname(__file__), "thumbnails")
+THUMBNAILS_ZIP = os.path.join(os.path.dirname(__file__), "48k-imdb-movies-with-posters.zip")
+# Written once every thumbnail has been extracted
+COMPLETE_MARKER = ".complete"
+
+CHUNK_SIZE = 1 << 20
+# Bytes received but not yet written are lost when a connection drops
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailDownloadError(Exception):
+    """
+    The archive could not be downloaded or failed verification
+    """
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _content_range(response):
+    """
+    Returns (start, total) from a "bytes start-end/total" Content-Range
+    header. start is None for the "bytes */total" form sent with a 416.
+    """
+    unit_range, _, total = response.headers.get("Content-Range", "").partition("/")
+    start = unit_range.replace("bytes", "").strip().split("-")[0]
+    total = int(total) if total.strip().isdigit() else None
+    if start == "*":
+        return None, total
+    return int(start or 0), total
+
+
+def _fetch(session, url, part_path, timeout, chunk_size):
+    """
+    Appends the rest of the file to part_path and returns its expected total
+    size (None if the server did not say)
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # Nothing left to fetch: the part file is already complete
+            return _content_range(response)[1] or offset
+        response.raise_for_status()
+        if response.status_code == 206:
+            start, total = _content_range(response)
+            if start != offset:
+                raise ThumbnailDownloadError(f"Server resumed at byte {start}, not {offset}")
+            mode = "ab"
+        else:
+            # The server ignored the Range header and sent the whole file
+            length = response.headers.get("Content-Length")
+            total = int(length) if length else None
+            mode = "wb"
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+    return total
+
+
+def download_file(
+    url,
+    dest,
+    sha256=None,
+    session=None,
+    timeout=60.0,
+    retries=5,
+    backoff=1.0,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+):
+    """
+    Streams url to dest, resuming from dest + ".part" after interruptions.
+    The size and optional SHA-256 are verified before dest is created.
+    """
+    if os.path.exists(dest):
+        return dest
+    session = session or requests.Session()
+    part_path = f"{dest}.part"
+    for attempt in range(retries + 1):
+        try:
+            total = _fetch(session, url, part_path, timeout, chunk_size)
+            size = os.path.getsize(part_path)
+            if total is None or size >= total:
+                break
+            error = f"stream ended at byte {size} of {total}"
+        except (requests.ConnectionError, requests.Timeout, ChunkedEncodingError) as e:
+            error = e
+        if attempt == retries:
+            raise ThumbnailDownloadError(f"Download failed after retries: {error}")
+        delay = backoff * 2**attempt
+        logger.warning("Thumbnail download interrupted (%s), resuming in %.1fs", error, delay)
+        time.sleep(delay)
+
+    if total is not None and size != total:
+        os.remove(part_path)
+        raise ThumbnailDownloadError(f"Downloaded {size} bytes, expected {total}")
+    if sha256 and _sha256_of(part_path).hexdigest() != sha256.lower():
+        os.remove(part_path)
+        raise ThumbnailDownloadError("Checksum mismatch, the partial download was discarded")
+    os.replace(part_path, dest)
+    return dest
+
+
+def _extract_members(zip_path, members, target):
+    # Every thread reads through its own handle on the archive
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in members:
+            dst_path = os.path.join(target, os.path.basename(member.filename))
+            if os.path.exists(dst_path) and os.path.getsize(dst_path) == member.file_size:
+                continue
+            tmp_path = f"{dst_path}.tmp"
+            with archive.open(member) as src, open(tmp_path, "wb") as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dst.write(chunk)
+            os.replace(tmp_path, dst_path)
+    return len(members)
+
+
+def extract_jpgs(zip_path, target, workers=8):
+    """
+    Extracts every .jpg member of the archive flat into target. Files left
+    by an earlier, interrupted run are kept. Returns the number of images.
+    """
+    os.makedirs(target, exist_ok=True)
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [
+            m
+            for m in archive.infolist()
+            if not m.is_dir() and m.filename.lower().endswith(".jpg")
+        ]
+    workers = max(1, min(workers, len(members)))
+    slices = [members[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda part: _extract_members(zip_path, part, target), slices))
+    return len(members)
+
+
+def download_thumbnails(
+    path=THUMBNAILS_DIR, url=THUMBNAILS_URL, zip_path=THUMBNAILS_ZIP, sha256=None, workers=8
+):
+    """
+    Downloads the thumbnails archive and extracts its images into path,
+    picking up where an interrupted run stopped
+    """
+    marker = os.path.join(path, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        return
+    if os.path.isdir(path) and os.listdir(path) and not (
+        os.path.exists(zip_path) or os.path.exists(f"{zip_path}.part")
+    ):
+        # Extracted by an older version that did not write the marker
+        return
+
+    sha256 = sha256 or os.getenv("THUMBNAILS_SHA256")
+    download_file(url, zip_path, sha256=sha256)
+    count = extract_jpgs(zip_path, path, workers=workers)
+    with open(marker, "w", encoding="utf8"):
+        pass
+    os.remove(zip_path)
+    logger.info("Extracted %d thumbnails to %s", count, path)
@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Batched movie title resolution.
+
+Titles suggested by the LLM ("the matrix", "Amélie (2001)") rarely match
+catalogue names ("The Matrix (1999)") exactly. Both sides are reduced to
+a normalized form, and the MovieTitles table keeps the normalized name
+and release year of every movie under an index, so a whole batch of
+titles resolves with one indexed IN query. Titles the table cannot
+resolve fall back to the in-memory search index, and every result is
+kept in an LRU so repeated suggestions never reach the database.
+"""
+
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_YEAR_RE = re.compile(r"\s*\((\d{4})\)\s*$")
+_TRAILING_ARTICLE_RE = re.compile(r"^(.*), (the|a|an)$")
+_NON_WORD_RE = re.compile(r"[^0-9a-z]+")
+
+
+def create_title_table(cursor):
+    """
+    Creates the MovieTitles table and its name index if they do not exist yet
+    """
+    cursor.execute(
+        """
+    CREATE TABLE IF NOT EXISTS MovieTitles (
+        movie_id INTEGER PRIMARY KEY,
+        name_norm TEXT NOT NULL,
+        year INTEGER
+    )
+    """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movietitles_name ON MovieTitles (name_norm)")
+
+
+def split_title(title):
+    """
+    Returns (normalized name, year or None) of a movie title.
+    Case, accents, punctuation, "&" and a trailing ", The" are ignored.
+    """
+    match = _YEAR_RE.search(title)
+    year = int(match.group(1)) if match else None
+    if match:
+        title = title[: match.start()]
+    title = unicodedata.normalize("NFKD", title.casefold())
+    title = "".join(char for char in title if not unicodedata.combining(char))
+    title = title.replace("&", " and ").strip()
+    article = _TRAILING_ARTICLE_RE.match(title)
+    if article:
+        title = f"{article.group(2)} {article.group(1)}"
+    return _NON_WORD_RE.sub(" ", title).strip(), year
+
+
+def index_movie_titles(cursor, movies):
+    """
+    Adds (idMovies, name, ...) rows to MovieTitles, skipping indexed movies
+    """
+    rows = []
+    for movie in movies:
+        name_norm, year = split_title(movie[1])
+        rows.append((movie[0], name_norm, year))
+    cursor.executemany(
+        "INSERT OR IGNORE INTO MovieTitles (movie_id, name_norm, year) VALUES (?, ?, ?)", rows
+    )
+    return len(rows)
+
+
+def ensure_title_index(db):
+    """
+    Fills MovieTitles from Movies on databases created before it existed.
+    Run by the storage backends once per database (see storage.py).
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT 1 FROM MovieTitles LIMIT 1")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute("SELECT idMovies, name FROM Movies")
+    count = index_movie_titles(cursor, cursor.fetchall())
+    db.commit()
+    logger.info("Indexed %d movie titles", count)
+
+
+def search_fallback(title):
+    """
+    Resolves a title with the in-memory search index (see search.py).
+    Only a movie whose normalized name starts with the title is accepted.
+    """
+    # pylint: disable=import-outside-toplevel
+    from src.recommenderapp.search import Search
+
+    name_norm, _ = split_title(title)
+    if not name_norm:
+        return None
+    for result in Search().search_movies(title):
+        if split_title(result["title"])[0].startswith(name_norm):
+            return result["imdb_id"]
+    return None
+
+
+class TitleResolver:
+    """
+    Resolves batches of titles to imdb_ids through MovieTitles, with an LRU
+    of (normalized name, year) -> imdb_id in front of it. Misses are cached
+    too: the catalogue does not change while the app runs.
+    """
+
+    def __init__(self, max_entries=4096, fallback=search_fallback):
+        self.max_entries = max_entries
+        self.fallback = fallback
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def _store(self, key, imdb_id):
+        with self._lock:
+            self._entries[key] = imdb_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _query(self, db, names):
+        """
+        Returns {name_norm: [(year, imdb_id), ...]} ordered by idMovies
+        """
+        placeholders = ", ".join("?" * len(names))
+        cursor = db.cursor()
+        cursor.execute(
+            f"""
+            SELECT t.name_norm, t.year, m.imdb_id
+            FROM MovieTitles AS t JOIN Movies AS m ON m.idMovies = t.movie_id
+            WHERE t.name_norm IN ({placeholders})
+            ORDER BY m.idMovies
+            """,
+            list(names),
+        )
+        candidates = {}
+        for name_norm, year, imdb_id in cursor.fetchall():
+            candidates.setdefault(name_norm, []).append((year, imdb_id))
+        return candidates
+
+    def resolve(self, db, titles):
+        """
+        Returns the imdb_id of every title (None if unknown), in order.
+        When several movies share a name, the one released in the year
+        given with the title wins, otherwise the first catalogued one.
+        """
+        keys = [split_title(title) for title in titles]
+        resolved = {}
+        misses = {}
+        for title, key in zip(titles, keys):
+            hit, imdb_id = self._cached(key)
+            if hit:
+                resolved[key] = imdb_id
+            elif key[0]:
+                misses.setdefault(key, title)
+            else:
+                resolved[key] = None
+
+        if misses:
+            candidates = self._query(db, {name for name, _ in misses})
+            for key, title in misses.items():
+                name_norm, year = key
+                matches = candidates.get(name_norm, [])
+                imdb_id = next((i for y, i in matches if y == year), None)
+                if imdb_id is None and matches:
+                    imdb_id = matches[0][1]
+                if imdb_id is None and self.fallback is not None:
+                    imdb_id = self.fallback(title)
+                self._store(key, imdb_id)
+                resolved[key] = imdb_id
+        return [resolved[key] for key in keys]
+
+
+_TITLE_RESOLVER = TitleResolver()
+
+
+def get_title_resolver():
+    """
+    Returns the process-wide title resolver
+    """
+    return _TITLE_RESOLVER
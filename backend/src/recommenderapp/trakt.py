@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Cached store of trending movies from the Trakt API.
+
+A scheduled job calls TrendingStore.refresh(), which does a conditional
+(ETag / If-Modified-Since) fetch with a timeout and retries with
+exponential backoff, then saves the result to a JSON file. Routes and
+jobs read the titles with TrendingStore.movies() without any network
+round trip; the file is shared by every process on the host.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+TRAKT_URL = "https://api.trakt.tv/movies/trending"
+
+logger = logging.getLogger(__name__)
+
+
+class TrendingStore:
+    """
+    Trending movies cached on disk and in memory
+    """
+
+    # Responses worth retrying; anything else is reported straight away
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        path="trakt_trending.json",
+        url=TRAKT_URL,
+        client_id=None,
+        client_secret=None,
+        limit=10,
+        timeout=10.0,
+        retries=3,
+        backoff=1.0,
+    ):
+        self.path = path
+        self.url = url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.limit = limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._state = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        Returns the stored state, re-reading the file if another process
+        has refreshed it
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._state or {"movies": [], "etag": None, "last_modified": None}
+        if mtime != self._mtime:
+            with self._lock:
+                with open(self.path, "r", encoding="utf8") as f:
+                    self._state = json.load(f)
+                self._mtime = mtime
+        return self._state
+
+    def _save(self, state):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._state = state
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def movies(self):
+        """
+        Returns the cached trending movies as [{"title", "imdb_id"}, ...]
+        """
+        return list(self._load()["movies"])
+
+    def _request(self, headers):
+        """
+        GETs the trending list, retrying transient failures with
+        exponential backoff
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = requests.get(self.url, headers=headers, timeout=self.timeout)
+                if response.status_code not in self.RETRY_STATUSES:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt < self.retries:
+                delay = self.backoff * 2**attempt
+                logger.warning("Trakt fetch failed (%s), retrying in %.1fs", error, delay)
+                time.sleep(delay)
+        raise requests.RequestException(f"Trakt fetch failed after retries: {error}")
+
+    def refresh(self):
+        """
+        Fetches the trending list if it changed upstream.
+        Returns True when new data was stored.
+        """
+        state = self._load()
+        headers = {
+            "Content-Type": "application/json",
+            "trakt-api-version": "2",
+            "trakt-api-key": self.client_id or "",
+        }
+        if self.client_secret:
+            headers["trakt-api-secret"] = self.client_secret
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        response = self._request(headers)
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        movies = [
+            {"title": movie["movie"]["title"], "imdb_id": movie["movie"]["ids"]["imdb"]}
+            for movie in response.json()[: self.limit]
+        ]
+        self._save(
+            {
+                "movies": movies,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            }
+        )
+        return True
+
+
+_TRENDING_STORE = None
+_TRENDING_STORE_LOCK = threading.Lock()
+
+
+def get_trending_store():
+    """
+    Returns the process-wide trending store
+    """
+    global _TRENDING_STORE  # pylint: disable=global-statement
+    if _TRENDING_STORE is None:
+        with _TRENDING_STORE_LOCK:
+            if _TRENDING_STORE is None:
+                _TRENDING_STORE = TrendingStore(
+                    path=os.getenv("TRAKT_CACHE_PATH", "trakt_trending.json"),
+                    client_id=os.getenv("TRAKT_CLIENT_ID"),
+                    client_secret=os.getenv("TRAKT_CLIENT_SECRET"),
+                )
+    return _TRENDING_STORE
+
+
+def refresh_trending():
+    """
+    Scheduled job: refreshes the trending store, logging failures
+    """
+    try:
+        if get_trending_store().refresh():
+            logger.info("Trending movies updated from Trakt")
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logger.error("Error fetching movies from Trakt: %s", str(e))
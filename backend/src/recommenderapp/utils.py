@@ -2,34 +2,106 @@
 from datetime import datetime
 import logging
 import smtplib
-import bcrypt
 from smtplib import SMTPException
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from flask import jsonify
+import csv
 import json
+import re
 import shutil
-import tempfile
-import zipfile
-import pandas as pd
 import os
 import sqlite3
 
-def init_db(override=False):
+from src.recommenderapp.email_render import (
+    DEFAULT_GENRE_COLOR,
+    GENRE_COLORS,
+    render_feedback_email,
+)
+from src.recommenderapp.digest import create_digest_state_table
+from src.recommenderapp.outbox import create_outbox_table
+from src.recommenderapp.passwords import check_password, hash_password
+from src.recommenderapp.titles import create_title_table, index_movie_titles
+
+DB_NAME = "movies.db"
+MOVIES_SQL_PATH = os.path.join(os.path.dirname(__file__), "movies.sql")
+MOVIES_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "movies.csv",
+)
+# Prebuilt database shipped next to the app; copied into place on first boot.
+MOVIES_DB_TEMPLATE = os.path.join(os.path.dirname(__file__), "movies.template.db")
+
+logger = logging.getLogger(__name__)
+
+# Matches one (idMovies, 'name', 'imdb_id') tuple of an INSERT statement.
+# Quoted strings may contain commas, parentheses and '' or \' escapes.
+_SQL_STRING = r"'((?:[^'\\]|\\.|'')*)'"
+_MOVIE_TUPLE_RE = re.compile(
+    r"\(\s*(\d+)\s*,\s*" + _SQL_STRING + r"\s*,\s*" + _SQL_STRING + r"\s*\)"
+)
+_SQL_ESCAPE_RE = re.compile(r"\\(.)|''")
+_SQL_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "0": "\0"}
+
+
+def _unescape_sql_string(value):
+    """
+    Undo MySQL/SQLite string escaping ('' and backslash escapes)
+    """
+    if "'" not in value and "\\" not in value:
+        return value
+    return _SQL_ESCAPE_RE.sub(
+        lambda m: "'" if m.group(1) is None else _SQL_ESCAPES.get(m.group(1), m.group(1)),
+        value,
+    )
+
+
+def parse_movie_inserts(lines):
     """
-    Initialize the database
+    Parses INSERT INTO Movies statements into (idMovies, name, imdb_id) tuples.
+    Handles multi-row VALUES lists and titles containing commas or quotes.
+    Rows with an already seen imdb_id are skipped.
     """
+    movies = []
+    seen_imdb_ids = set()
+    for line in lines:
+        if not line.startswith("INSERT"):
+            continue
+        values_at = line.find("VALUES")
+        tuples = _MOVIE_TUPLE_RE.findall(line, values_at) if values_at != -1 else []
+        if not tuples:
+            logger.warning("Failed to process line: %s", line.strip())
+            continue
+        for movie_id, name, imdb_id in tuples:
+            imdb_id = _unescape_sql_string(imdb_id)
+            if imdb_id in seen_imdb_ids:
+                continue
+            seen_imdb_ids.add(imdb_id)
+            movies.append((int(movie_id), _unescape_sql_string(name), imdb_id))
+    return movies
 
-    DB_NAME = 'movies.db'
 
-    # Only initialize if database doesn't exist
-    if os.path.exists(DB_NAME) and not override:
-        return
-    
-    # Create new database
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
+def read_movies_csv(path):
+    """
+    Reads (idMovies, name, imdb_id) tuples straight from the movies.csv catalogue
+    """
+    movies = []
+    seen_imdb_ids = set()
+    with open(path, "r", encoding="utf8", newline="") as csv_file:
+        for row in csv.DictReader(csv_file):
+            imdb_id = row.get("imdb_id")
+            if not imdb_id or imdb_id in seen_imdb_ids:
+                continue
+            seen_imdb_ids.add(imdb_id)
+            movies.append((int(row["movieId"]), row["title"], imdb_id))
+    return movies
+
+
+def _create_schema(cursor):
+    """
+    Creates the application tables on a fresh database
+    """
     # Create Users table
     cursor.execute('''
     CREATE TABLE Users (
@@ -107,95 +179,101 @@ def init_db(override=False):
     )
     ''')
 
-    # Add sample movies
-    def extract_values(line):
-        line = line.strip().split("VALUES")[1].strip().strip('();\n').split(',')
-        movie_id = int(line[0])
-        name = line[1].strip().strip("'")
-        imdb_id = line[2].strip().strip("'")
-        return (movie_id, name, imdb_id)
-
-    with open(os.path.join(os.path.dirname(__file__), 'movies.sql'), 'r') as sql_file:
-        sample_movies = []
-        seen_imdb_ids = set()
-        for line in sql_file:
-            if line.strip() and not line.startswith('--') and line.startswith('INSERT'):
-                try:
-                    movie_data = extract_values(line)
-                    if movie_data[2] not in seen_imdb_ids:  # Check for duplicate IMDB IDs
-                        sample_movies.append(movie_data)
-                        seen_imdb_ids.add(movie_data[2])
-                except Exception as e:
-                    logging.warning(f"Failed to process line: {line}. Error: {str(e)}")
-                    continue
-    
-    if sample_movies:
-        cursor.executemany(
-            "INSERT INTO Movies (idMovies, name, imdb_id) VALUES (?, ?, ?)",
-            sample_movies
-        )
+    # Create EmailOutbox table
+    create_outbox_table(cursor)
+
+    # Create DigestState table
+    create_digest_state_table(cursor)
 
-    # Commit changes and close connection
-    conn.commit()
+    # Create MovieTitles table
+    create_title_table(cursor)
+
+
+def _load_sample_movies():
+    """
+    Loads the movie catalogue from movies.sql, falling back to movies.csv
+    """
+    sql_path = os.getenv("MOVIES_SQL_PATH", MOVIES_SQL_PATH)
+    if os.path.exists(sql_path):
+        with open(sql_path, "r", encoding="utf8") as sql_file:
+            return parse_movie_inserts(sql_file)
+    csv_path = os.getenv("MOVIES_CSV_PATH", MOVIES_CSV_PATH)
+    if os.path.exists(csv_path):
+        return read_movies_csv(csv_path)
+    logger.warning("No movie catalogue found at %s or %s", sql_path, csv_path)
+    return []
+
+
+def init_db(override=False, db_name=DB_NAME, template_path=None, use_template=True):
+    """
+    Initialize the database.
+
+    If a prebuilt template database exists (MOVIES_DB_TEMPLATE) it is copied
+    into place, otherwise the schema and catalogue are built in a temporary
+    file inside a single transaction and renamed over db_name.
+    """
+
+    # Only initialize if database doesn't exist
+    if os.path.exists(db_name) and not override:
+        return
+
+    template_path = template_path or os.getenv("MOVIES_DB_TEMPLATE", MOVIES_DB_TEMPLATE)
+    tmp_name = f"{db_name}.{os.getpid()}.tmp"
+    if use_template and os.path.exists(template_path):
+        shutil.copyfile(template_path, tmp_name)
+        os.replace(tmp_name, db_name)
+        return
+
+    # Create new database
+    conn = sqlite3.connect(tmp_name)
+    try:
+        # The file is renamed into place only once complete, so skip fsyncs
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        with conn:
+            cursor = conn.cursor()
+            _create_schema(cursor)
+            sample_movies = _load_sample_movies()
+            if sample_movies:
+                cursor.executemany(
+                    "INSERT INTO Movies (idMovies, name, imdb_id) VALUES (?, ?, ?)",
+                    sample_movies,
+                )
+                index_movie_titles(cursor, sample_movies)
+    except BaseException:
+        conn.close()
+        os.remove(tmp_name)
+        raise
     conn.close()
+    os.replace(tmp_name, db_name)
+
+
+def build_db_template(template_path=MOVIES_DB_TEMPLATE):
+    """
+    Builds the prebuilt movies database that init_db copies on first boot
+    """
+    init_db(override=True, db_name=template_path, use_template=False)
+
 
 def download_thumbnails():
-    PATH = os.path.join(os.path.dirname(__file__), "thumbnails")
-    if(os.path.exists(PATH)):
-        return
-    os.makedirs(PATH, exist_ok=True)
-
-    import requests
-    zip_data = requests.get("https://www.kaggle.com/api/v1/datasets/download/rezaunderfit/48k-imdb-movies-with-posters")
-    with open("48k-imdb-movies-with-posters.zip", "wb") as f:
-        f.write(zip_data.content)
-
-    temppath = tempfile.mkdtemp()
-    with zipfile.ZipFile("48k-imdb-movies-with-posters.zip", "r") as zip_ref:
-        zip_ref.extractall(temppath)
-
-    for root, dirs, files in os.walk(temppath):
-        for file in files:
-            if file.endswith('.jpg'):
-                src_path = os.path.join(root, file)
-                dst_path = os.path.join(PATH, file)
-                print(f"Moving {src_path} to {dst_path}")
-                shutil.move(src_path, dst_path)
-    
-    print("Thumbnails downloaded")
-    
+    """
+    Utility function to download and extract the movie thumbnails (see thumbnails.py)
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from src.recommenderapp.thumbnails import download_thumbnails as fetch_thumbnails
+
+    fetch_thumbnails()
+    logger.info("Thumbnails downloaded")
+
 
 def create_colored_tags(genres):
     """
     Utitilty function to create colored tags for different
     movie genres
     """
-    # Define colors for specific genres
-    genre_colors = {
-        "Musical": "#FF1493",  # DeepPink
-        "Sci-Fi": "#00CED1",  # DarkTurquoise
-        "Mystery": "#8A2BE2",  # BlueViolet
-        "Thriller": "#FF6347",  # Tomato
-        "Horror": "#FF4500",  # OrangeRed
-        "Documentary": "#228B22",  # ForestGreen
-        "Fantasy": "#FFA500",  # Orange
-        "Adventure": "#FFD700",  # Gold
-        "Children": "#32CD32",  # LimeGreen
-        "Film-Noir": "#2F4F4F",  # DarkSlateGray
-        "Comedy": "#FFB500",  # VividYellow
-        "Crime": "#8B0000",  # DarkRed
-        "Drama": "#8B008B",  # DarkMagenta
-        "Western": "#FF8C00",  # DarkOrange
-        "IMAX": "#20B2AA",  # LightSeaGreen
-        "Action": "#FF0000",  # Red
-        "War": "#B22222",  # FireBrick
-        "(no genres listed)": "#A9A9A9",  # DarkGray
-        "Romance": "#FF69B4",  # HotPink
-        "Animation": "#4B0082",  # Indigo
-    }
     tags = []
     for genre in genres:
-        color = genre_colors.get(genre, "#CCCCCC")  # Default color if not found
+        color = GENRE_COLORS.get(genre, DEFAULT_GENRE_COLOR)  # Default color if not found
         tag = f'<span style="background-color: {color}; color: #FFFFFF; \
             padding: 5px; border-radius: 5px;">{genre}</span>'
         tags.append(tag)
@@ -245,70 +323,27 @@ def create_movie_genres(movie_genre_df):
     return movie_to_genres
 
 
-def send_email_to_user(recipient_email, categorized_data):
+FEEDBACK_EMAIL_SUBJECT = "Your movie recommendation from BingeSuggest"
+
+
+def build_feedback_email_html(categorized_data):
     """
-    Utility function to send movie recommendations to user over email
+    Utility function to render the movie recommendations email body
     """
+    return render_feedback_email(categorized_data)
 
-    email_html_content = """
-                        <html>
-                        <head></head>
-                        <body>
-                            <h1 style="color: #333333;">Movie Recommendations from BingeSuggest</h1>
-                            <p style="color: #555555;">Dear Movie Enthusiast,</p>
-                            <p style="color: #555555;">We hope you're having a fantastic day!</p>
-                            <div style="padding: 10px; border: 1px solid #cccccc; border-radius: 5px; background-color: #f9f9f9;">
-                            <h2>Your Movie Recommendations:</h2>
-                            <h3>Movies Liked:</h3>
-                            <ul style="color: #555555;">
-                                {}
-                            </ul>
-                            <h3>Movies Disliked:</h3>
-                            <ul style="color: #555555;">
-                                {}
-                            </ul>
-                            <h3>Movies Yet to Watch:</h3>
-                            <ul style="color: #555555;">
-                                {}
-                            </ul>
-                            </div>
-                            <p style="color: #555555;">Enjoy your movie time with BingeSuggest!</p>
-                            <p style="color: #555555;">Best regards,<br>BingeSuggest Team 🍿</p>
-                        </body>
-                        </html>
-                        """
-
-    subject = "Your movie recommendation from BingeSuggest"
 
+def send_email_to_user(recipient_email, categorized_data):
+    """
+    Utility function to send movie recommendations to user over email
+    """
     # Create the email message
     message = MIMEMultipart("alternative")
     message["To"] = recipient_email
-    message["Subject"] = subject
-    # Load the CSV file into a DataFrame
-    movie_genre_df = pd.read_csv("../../data/movies.csv")
-    # Creating movie-genres map
-    movie_to_genres = create_movie_genres(movie_genre_df)
-    # Create the email message with HTML content
-    html_content = email_html_content.format(
-        "\n".join(
-            f"<li>{movie} \
-            {create_colored_tags(movie_to_genres.get(movie, ['Unknown Genre']))}</li><br>"
-            for movie in categorized_data["Liked"]
-        ),
-        "\n".join(
-            f"<li>{movie} \
-            {create_colored_tags(movie_to_genres.get(movie, ['Unknown Genre']))}</li><br>"
-            for movie in categorized_data["Disliked"]
-        ),
-        "\n".join(
-            f"<li>{movie} \
-            {create_colored_tags(movie_to_genres.get(movie, ['Unknown Genre']))}</li><br>"
-            for movie in categorized_data["Yet to Watch"]
-        ),
-    )
+    message["Subject"] = FEEDBACK_EMAIL_SUBJECT
 
     # Attach the HTML email body
-    message.attach(MIMEText(html_content, "html"))
+    message.attach(MIMEText(build_feedback_email_html(categorized_data), "html"))
     send_email(message, recipient_email)
 
 
@@ -373,6 +408,7 @@ def send_email(email: MIMEMultipart, recipient_email):
     email["From"] = sender_email
 
     # Connect to the SMTP server
+    server = None
     try:
         server = smtplib.SMTP(smtp_server, smtp_port)
         # Start TLS encryption
@@ -384,10 +420,11 @@ def send_email(email: MIMEMultipart, recipient_email):
 
     except SMTPException as e:
         # Handle SMTP-related exceptions
-        logging.error("SMTP error while sending email: %s", str(e))
+        logger.error("SMTP error while sending email: %s", str(e))
 
     finally:
-        server.quit()
+        if server is not None:
+            server.quit()
 
 
 def create_account(db, email, username, password):
@@ -395,8 +432,7 @@ def create_account(db, email, username, password):
     Utility function for creating an account
     """
     cursor = db.cursor()
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    hashed = hash_password(password)
     cursor.execute(
         "INSERT INTO Users(username, email, password) VALUES (?, ?, ?);",
         (username, email, hashed),
@@ -434,13 +470,17 @@ def login_to_account(db, username, password):
     result = executor.fetchall()
     if len(result) == 0:
         return None
-    
-    encoded_pass = password.encode("utf-8")
-    stored_hash = result[0][2]
-    
-    if not bcrypt.checkpw(encoded_pass, stored_hash):
+
+    matches, new_hash = check_password(password, result[0][2])
+    if not matches:
         return None
-        
+    if new_hash is not None:
+        # Upgrade hashes made with an older BCRYPT_ROUNDS
+        executor.execute(
+            "UPDATE Users SET password = ? WHERE idUsers = ?;", (new_hash, result[0][0])
+        )
+        db.commit()
+
     return result[0][0]
 
 
@@ -593,7 +633,7 @@ def get_imdb_id_by_name(db, movie_name):
     Fetches the imdb_id for a movie based on its name.
     """
     cursor = db.cursor()
-    cursor.execute("SELECT imdb_id FROM Movies WHERE name LIKE ? || '%' LIMIT 1", (movie_name,))
+    cursor.execute("SELECT imdb_id FROM Movies WHERE name LIKE ? LIMIT 1", (movie_name + "%",))
     result = cursor.fetchone()
     return result[0] if result else None
 
@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+Worker process that owns the scheduled jobs (weekly digest, trending
+refresh, email outbox). Run it next to the web server, from the same
+directory so both use the same movies.db:
+
+    cd backend/src/recommenderapp && python3 worker.py
+
+Several workers may run for redundancy: they elect a leader through a
+lock row in the database (see leader.py) and only the leader schedules
+jobs. If the leader dies, another worker takes over once its lease
+expires.
+"""
+
+# pylint: disable=wrong-import-position
+import argparse
+import logging
+import signal
+import sys
+import threading
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from dotenv import load_dotenv
+
+sys.path.append("../../")
+from src.recommenderapp import jobs
+from src.recommenderapp.leader import LeaderLock
+from src.recommenderapp.log_config import setup_logging
+from src.recommenderapp.storage import get_storage
+from src.recommenderapp.trakt import refresh_trending
+
+logger = logging.getLogger(__name__)
+
+
+def _leader_only(lock, job):
+    """
+    Wraps a job so it is skipped if the lease was lost since it was scheduled
+    """
+
+    def run():
+        if lock.held():
+            job()
+        else:
+            logger.warning("Skipping %s: not the leader", job.__name__)
+
+    run.__name__ = job.__name__
+    return run
+
+
+def build_scheduler(lock):
+    """
+    Creates the scheduler with every job; nothing runs until it is started
+    """
+    scheduler = BackgroundScheduler(daemon=True)
+    # Run every Monday at 9 AM
+    scheduler.add_job(
+        _leader_only(lock, jobs.send_weekly_recommendations),
+        trigger=CronTrigger(
+            day_of_week="mon",
+            hour=9,
+            minute=0,
+            timezone="UTC",
+            week="*/4"  # Send updates once a month
+        ),
+        id="weekly-recommendations",
+        name="Weekly Recommendations"
+    )
+    # Keep the trending store warm; runs once at startup, then hourly
+    scheduler.add_job(
+        _leader_only(lock, refresh_trending),
+        trigger=IntervalTrigger(hours=1),
+        next_run_time=datetime.now(),
+        id="refresh-trending",
+        name="Refresh Trending Movies"
+    )
+    # Deliver queued emails every minute
+    scheduler.add_job(
+        _leader_only(lock, jobs.process_outbox),
+        trigger=IntervalTrigger(minutes=1),
+        id="process-outbox",
+        name="Process Email Outbox"
+    )
+    return scheduler
+
+
+def run(lock, stop, interval=None):
+    """
+    Renews (or waits for) the leader lease every `interval` seconds and
+    runs the scheduler only while this worker is the leader, until `stop`
+    is set
+    """
+    interval = interval or lock.lease / 3
+    lock.initialize()
+    scheduler = None
+    try:
+        while not stop.is_set():
+            try:
+                leader = lock.acquire()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("Could not renew the scheduler lease: %s", str(e))
+                leader = False
+            if leader and scheduler is None:
+                logger.info("Became the scheduler leader (%s)", lock.owner)
+                scheduler = build_scheduler(lock)
+                scheduler.start()
+            elif not leader and scheduler is not None:
+                logger.warning("Lost the scheduler lease, stopping jobs")
+                scheduler.shutdown(wait=False)
+                scheduler = None
+            stop.wait(interval)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown()
+            lock.release()
+
+
+def main():
+    """
+    Entry point
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[2])
+    parser.add_argument("--lease", type=float, default=60.0, help="leader lease in seconds")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_logging()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        run(LeaderLock(get_storage(), lease=args.lease), stop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
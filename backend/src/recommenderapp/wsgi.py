@@ -0,0 +1,20 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+WSGI entry point for production servers.
+
+    cd backend/src/recommenderapp && gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module only builds the application (app.app, see
+app.create_app); data is loaded by the server hooks in gunicorn.conf.py.
+"""
+
+# pylint: disable=wrong-import-position,unused-import
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from src.recommenderapp.app import app
@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+
+A MySQL stand-in for tests that cannot reach a MySQL server.
+
+install() replaces mysql.connector.pooling with a pool of SQLite
+connections that behaves like the real driver where MySQLStorage relies on
+it: queries take format ("%s") parameters and qmark placeholders or
+SQLite-only statements are rejected, INSERT IGNORE is understood, and the
+pool raises PoolError instead of waiting when every connection is checked
+out.
+"""
+
+import queue
+import re
+import sqlite3
+import sys
+import types
+from unittest.mock import patch
+
+_SQLITE_ONLY_RE = re.compile(r"^\s*(INSERT\s+OR\s+\w+|PRAGMA)\b", re.IGNORECASE)
+_INSERT_IGNORE_RE = re.compile(r"^(\s*INSERT)\s+IGNORE\b", re.IGNORECASE)
+
+
+class Error(Exception):
+    """
+    Base class of the stand-in driver errors
+    """
+
+
+class ProgrammingError(Error):
+    """
+    Invalid SQL or parameters
+    """
+
+
+class IntegrityError(Error):
+    """
+    Constraint violation, e.g. a duplicate key
+    """
+
+
+class PoolError(Error):
+    """
+    Every pooled connection is checked out
+    """
+
+
+def to_sqlite(query, params):
+    """
+    Checks a query as MySQL would and rewrites it for SQLite
+    """
+    if _SQLITE_ONLY_RE.match(query):
+        raise ProgrammingError(f"SQLite-only statement sent to MySQL: {query.strip()[:60]}")
+    out = []
+    quote = None
+    chars = iter(query)
+    for char in chars:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "?":
+            raise ProgrammingError("qmark placeholder sent to MySQL")
+        elif char == "%" and params is not None:
+            following = next(chars, "")
+            if following not in ("s", "%"):
+                raise ProgrammingError(f"Bad format placeholder %{following}")
+            out.append("?" if following == "s" else "%")
+            continue
+        out.append(char)
+    return _INSERT_IGNORE_RE.sub(r"\1 OR IGNORE", "".join(out))
+
+
+class StandInCursor:
+    """
+    Format-paramstyle cursor over a SQLite cursor
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        """
+        Runs one query
+        """
+        try:
+            self._cursor.execute(to_sqlite(query, params), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        except sqlite3.Error as e:
+            raise ProgrammingError(str(e)) from e
+
+    def executemany(self, query, seq_of_params):
+        """
+        Runs one query per parameter tuple
+        """
+        try:
+            self._cursor.executemany(to_sqlite(query, ()), [tuple(p) for p in seq_of_params])
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        except sqlite3.Error as e:
+            raise ProgrammingError(str(e)) from e
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class StandInConnection:
+    """
+    Pooled connection; close() hands it back to its pool
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self, buffered=False):  # pylint: disable=unused-argument
+        """
+        Returns a format-paramstyle cursor
+        """
+        return StandInCursor(self._conn.cursor())
+
+    def commit(self):
+        """
+        Commits the current transaction
+        """
+        self._conn.commit()
+
+    def rollback(self):
+        """
+        Rolls back the current transaction
+        """
+        self._conn.rollback()
+
+    def close(self):
+        """
+        Rolls back anything uncommitted and returns the connection to the pool
+        """
+        self._conn.rollback()
+        self._pool.idle.put(self._conn)
+
+
+class MySQLConnectionPool:
+    """
+    Fixed-size pool of connections to the SQLite file named by `database`
+    """
+
+    def __init__(self, pool_name, pool_size, database, **_config):
+        self.pool_name = pool_name
+        self.idle = queue.Queue()
+        for _ in range(pool_size):
+            self.idle.put(sqlite3.connect(database, timeout=30, check_same_thread=False))
+
+    def get_connection(self):
+        """
+        Checks out an idle connection
+        """
+        try:
+            return StandInConnection(self, self.idle.get_nowait())
+        except queue.Empty:
+            raise PoolError("Failed getting connection; pool exhausted") from None
+
+
+def install():
+    """
+    Returns a patch making `from mysql.connector import pooling` load the stand-in
+    """
+    pooling = types.ModuleType("mysql.connector.pooling")
+    pooling.MySQLConnectionPool = MySQLConnectionPool
+    connector = types.ModuleType("mysql.connector")
+    connector.pooling = pooling
+    for error in (Error, ProgrammingError, IntegrityError, PoolError):
+        setattr(connector, error.__name__, error)
+    mysql = types.ModuleType("mysql")
+    mysql.connector = connector
+    return patch.dict(
+        sys.modules,
+        {"mysql": mysql, "mysql.connector": connector, "mysql.connector.pooling": pooling},
+    )
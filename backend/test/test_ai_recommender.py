@@ -0,0 +1,247 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import json
+import sys
+import threading
+import time
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import openai
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.ai_recommender import (
+    AiRecommender,
+    ResponseCache,
+    find_seed_titles,
+    normalize_query,
+)
+from src.recommenderapp.io_pool import Bulkhead
+from src.recommenderapp.titles import split_title
+
+warnings.filterwarnings("ignore")
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the chat completions API
+    """
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    content = json.dumps({"movies": ["Alien", "Aliens", "The Thing"]})
+    requests = []
+    peers = set()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Answers a chat completion after `delay` seconds
+        """
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubOpenAI.requests.append(body["messages"][-1]["content"])
+        StubOpenAI.peers.add(self.client_address)
+        time.sleep(StubOpenAI.delay)
+        payload = json.dumps(
+            {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": StubOpenAI.content},
+                    }
+                ],
+            }
+        ).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except OSError:
+            pass  # The client gave up
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestAiRecommender(unittest.TestCase):
+    """
+    Test cases for the cached, time-bounded AI recommendations
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+        cls.server.daemon_threads = True
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubOpenAI.delay = 0.0
+        StubOpenAI.content = json.dumps({"movies": ["Alien", "Aliens", "The Thing"]})
+        StubOpenAI.requests = []
+        StubOpenAI.peers = set()
+        self.fallback_calls = []
+        self.bulkhead = Bulkhead("openai-test", max_workers=2, timeout=5.0)
+        self.recommender = self.make_recommender(budget=0.5)
+
+    def tearDown(self):
+        self.bulkhead.shutdown(wait=False)
+
+    def make_recommender(self, budget):
+        """
+        Builds a recommender talking to the stub server
+        """
+        return AiRecommender(
+            client_factory=lambda: openai.OpenAI(
+                api_key="test", base_url=self.base_url, timeout=budget, max_retries=0
+            ),
+            cache=ResponseCache(ttl=60),
+            budget=budget,
+            fallback=self.fallback,
+            bulkhead=self.bulkhead,
+        )
+
+    def fallback(self, query):
+        """
+        Stand-in for the local content recommender
+        """
+        self.fallback_calls.append(query)
+        return ["Local Pick"]
+
+    def test_normalize_query(self):
+        """
+        Rephrasings of the same request share a cache key
+        """
+        self.assertEqual(normalize_query("Movies like Alien!"), "alien")
+        self.assertEqual(normalize_query("  films LIKE alien "), "alien")
+        self.assertEqual(
+            normalize_query("funny space movies"), normalize_query("Space movies, funny")
+        )
+        self.assertNotEqual(normalize_query("scary movies"), normalize_query("funny movies"))
+
+    def test_answer_is_cached_and_client_reused(self):
+        """
+        Repeated queries are served from the cache over one kept-alive connection
+        """
+        self.assertEqual(
+            self.recommender.recommend("movies like Alien"),
+            (["Alien", "Aliens", "The Thing"], "openai"),
+        )
+        self.assertEqual(self.recommender.recommend("Films like alien!")[1], "cache")
+        self.assertEqual(self.recommender.recommend("space horror")[1], "openai")
+        self.assertEqual(len(StubOpenAI.requests), 2)
+        self.assertEqual(len(StubOpenAI.peers), 1)
+        self.assertEqual(self.fallback_calls, [])
+
+    def test_latency_budget(self):
+        """
+        A slow upstream is abandoned once the budget runs out
+        """
+        StubOpenAI.delay = 2.0
+        started = time.monotonic()
+        titles, source = self.recommender.recommend("movies like Alien")
+        elapsed = time.monotonic() - started
+        self.assertEqual((titles, source), (["Local Pick"], "fallback"))
+        self.assertLess(elapsed, 0.5 + 0.4)
+        # Fallback answers are not cached, the next request tries again
+        StubOpenAI.delay = 0.0
+        self.assertEqual(self.recommender.recommend("movies like Alien")[1], "openai")
+
+    def test_fallback_bounded_by_budget(self):
+        """
+        A slow (cold) fallback after an upstream timeout still ends within the budget
+        """
+        StubOpenAI.delay = 2.0
+        loaded = threading.Event()
+
+        def cold_fallback(query):
+            time.sleep(0.6)  # e.g. loading the catalogue on the first request
+            loaded.set()
+            return self.fallback(query)
+
+        pool = Bulkhead("fallback-test", max_workers=1, timeout=5.0)
+        recommender = AiRecommender(
+            client_factory=lambda: openai.OpenAI(
+                api_key="test", base_url=self.base_url, max_retries=0
+            ),
+            budget=0.5,
+            fallback=cold_fallback,
+            bulkhead=self.bulkhead,
+            fallback_pool=pool,
+        )
+        started = time.monotonic()
+        self.assertEqual(recommender.recommend("movies like Alien"), ([], "fallback"))
+        self.assertLess(time.monotonic() - started, 0.5 + 0.2)
+        # The abandoned fallback finishes in the background
+        self.assertTrue(loaded.wait(2))
+        pool.shutdown()
+
+    def test_malformed_answer_and_unreachable_upstream(self):
+        """
+        Garbage from the model or a dead upstream fall back immediately
+        """
+        StubOpenAI.content = "Sure! Here are some movies: Alien, Aliens"
+        self.assertEqual(self.recommender.recommend("movies like Alien")[1], "fallback")
+
+        dead = AiRecommender(
+            client_factory=lambda: openai.OpenAI(
+                api_key="test", base_url="http://127.0.0.1:9/v1", max_retries=0
+            ),
+            budget=0.5,
+            fallback=self.fallback,
+            bulkhead=self.bulkhead,
+        )
+        started = time.monotonic()
+        self.assertEqual(dead.recommend("space horror"), (["Local Pick"], "fallback"))
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_local_mode(self):
+        """
+        In local mode OpenAI is never contacted
+        """
+        recommender = AiRecommender(
+            client_factory=self.fail, fallback=self.fallback, bulkhead=self.bulkhead, mode="local"
+        )
+        self.assertEqual(recommender.recommend("dark sci-fi heist"), (["Local Pick"], "local"))
+        self.assertEqual(StubOpenAI.requests, [])
+
+    def fail(self):
+        """
+        Client factory that must not be called
+        """
+        raise AssertionError("OpenAI client created in local mode")
+
+    def test_find_seed_titles(self):
+        """
+        The fallback is seeded with the catalogue titles named in the query
+        """
+        catalogue = ["Alien (1979)", "Aliens (1986)", "It (2017)", "The Thing (1982)"]
+        seeds = {split_title(title)[0]: title for title in catalogue}
+        self.assertEqual(
+            find_seed_titles("something like Alien or the thing, it's for tonight", seeds),
+            ["Alien (1979)", "The Thing (1982)"],
+        )
+        self.assertEqual(find_seed_titles("funny space movies", seeds), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
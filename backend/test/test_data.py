@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.data import (
+    ERROR,
+    NO_RATING,
+    OmdbSource,
+    checkpoint_path,
+    update_csv_with_rating,
+)
+
+warnings.filterwarnings("ignore")
+
+
+class FakeOmdb(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the OMDb API: tt...0 has no rating, tt...7 fails
+    """
+
+    requested = []
+    lock = threading.Lock()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers ?i=<imdb_id> with a rating derived from the id
+        """
+        imdb_id = parse_qs(urlparse(self.path).query)["i"][0]
+        with FakeOmdb.lock:
+            FakeOmdb.requested.append(imdb_id)
+        number = int(imdb_id[2:])
+        if number % 10 == 7:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        rating = "N/A" if number % 10 == 0 else f"{number % 10}.5"
+        body = json.dumps({"imdbID": imdb_id, "imdbRating": rating}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class Interrupt(BaseException):
+    """
+    Simulates the process being killed part way through
+    """
+
+
+class FailingSource:
+    """
+    Source that stops the whole run after `limit` ratings
+    """
+
+    def __init__(self, source, limit):
+        self.source = source
+        self.limit = limit
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, imdb_id):
+        """
+        Delegates to the real source until the limit is reached
+        """
+        with self.lock:
+            self.calls += 1
+            if self.calls > self.limit:
+                raise Interrupt()
+        return self.source.fetch(imdb_id)
+
+
+class TestRatingsEnrichment(unittest.TestCase):
+    """
+    Test cases for the IMDb ratings enrichment pipeline
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOmdb)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeOmdb.requested = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "movies.csv")
+        rows = [(i, f"Movie {i}", f"tt{i:07d}", None) for i in range(1, 41)]
+        rows[2] = (3, "Movie 3", "tt0000003", 8.1)  # already enriched
+        rows.append((99, "Movie 1", "tt0000099", None))  # duplicate title
+        pd.DataFrame(rows, columns=["movieId", "title", "imdb_id", "imdb_ratings"]).to_csv(
+            self.csv_path, index=False
+        )
+        self.source = OmdbSource(self.url, api_key="test")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def ratings(self):
+        """
+        Returns {imdb_id: rating} from the CSV
+        """
+        df = pd.read_csv(self.csv_path, dtype={"imdb_ratings": str})
+        return dict(zip(df["imdb_id"], df["imdb_ratings"]))
+
+    def test_enrich(self):
+        """
+        Missing ratings are filled, with markers for missing and failed ones
+        """
+        summary = update_csv_with_rating(self.csv_path, self.source, workers=4, checkpoint_every=5)
+        self.assertEqual(summary["done"], 39)
+        self.assertEqual(summary["errors"], 4)
+        ratings = self.ratings()
+        self.assertEqual(len(ratings), 40)
+        self.assertEqual(ratings["tt0000003"], "8.1")
+        self.assertEqual(ratings["tt0000012"], "2.5")
+        self.assertEqual(ratings["tt0000010"], NO_RATING)
+        self.assertEqual(ratings["tt0000017"], ERROR)
+        self.assertNotIn("tt0000003", FakeOmdb.requested)
+        self.assertNotIn("tt0000099", ratings)
+        self.assertFalse(os.path.exists(checkpoint_path(self.csv_path)))
+
+    def test_resume_after_interruption(self):
+        """
+        A killed run keeps its progress; the next run only fetches the rest
+        """
+        with self.assertRaises(Interrupt):
+            update_csv_with_rating(
+                self.csv_path, FailingSource(self.source, 20), workers=1, checkpoint_every=3
+            )
+        # The CSV is untouched, the results so far are in the sidecar
+        self.assertTrue(pd.isna(self.ratings()["tt0000001"]))
+        with open(checkpoint_path(self.csv_path), encoding="utf8") as f:
+            saved = [json.loads(line)["imdb_id"] for line in f]
+        self.assertEqual(len(saved), 20)
+
+        FakeOmdb.requested = []
+        summary = update_csv_with_rating(self.csv_path, self.source, workers=4)
+        self.assertEqual(summary["done"], 19)
+        self.assertFalse(set(saved) & set(FakeOmdb.requested))
+        ratings = self.ratings()
+        self.assertEqual(ratings["tt0000001"], "1.5")
+        self.assertEqual(ratings["tt0000039"], "9.5")
+
+    def test_rate_limit(self):
+        """
+        The token bucket spaces requests across all workers
+        """
+        summary = update_csv_with_rating(
+            self.csv_path, self.source, workers=8, rate=50, checkpoint_every=100
+        )
+        self.assertEqual(summary["done"], 39)
+        self.assertLessEqual(summary["per_second"], 55)
+
+
+if __name__ == "__main__":
+    unittest.main()
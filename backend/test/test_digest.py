@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position,protected-access
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.prediction_scripts import item_based
+from src.recommenderapp.digest import (
+    create_digest_state_table,
+    queue_weekly_digests,
+    score_histories,
+)
+from src.recommenderapp.outbox import create_outbox_table
+
+warnings.filterwarnings("ignore")
+
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Romance", "Sci-Fi"]
+DIRECTORS = [f"Director {i}" for i in range(8)]
+ACTORS = [f"Actor {i}" for i in range(20)]
+TRENDING = [{"title": "Trending (2024)", "imdb_id": "tt9999999"}]
+
+
+def write_catalogue(path, movies, rng):
+    """
+    Writes a synthetic movies.csv in the recommender's format
+    """
+    with open(path, "w", encoding="utf8") as f:
+        f.write("movieId,title,genres,imdb_id,director,actors,imdb_ratings\n")
+        for i in range(movies):
+            genres = "|".join(rng.sample(GENRES, rng.randint(1, 3)))
+            director = rng.choice(DIRECTORS)
+            actors = ", ".join(rng.sample(ACTORS, 3))
+            rating = "No Rating Found" if i % 17 == 0 else f"{rng.uniform(3, 9):.1f}"
+            f.write(f'{i},Movie {i},{genres},tt{i:07d},{director},"{actors}",{rating}\n')
+
+
+class TestDigest(unittest.TestCase):
+    """
+    Test cases for the personalized weekly digest
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.csv_path = os.path.join(cls.tmp.name, "movies.csv")
+        write_catalogue(cls.csv_path, 300, random.Random(510))
+        cls.saved_path = item_based.MOVIES_CSV_PATH
+        item_based.MOVIES_CSV_PATH = cls.csv_path
+        item_based._MOVIES_DF = item_based._MOVIES_GENRE_MATRIX = None
+        item_based._BATCH_INDEX = None
+
+    @classmethod
+    def tearDownClass(cls):
+        item_based.MOVIES_CSV_PATH = cls.saved_path
+        item_based._MOVIES_DF = item_based._MOVIES_GENRE_MATRIX = None
+        item_based._BATCH_INDEX = None
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript(
+            """
+            CREATE TABLE Users (idUsers INTEGER PRIMARY KEY, email TEXT);
+            CREATE TABLE Movies (idMovies INTEGER PRIMARY KEY, name TEXT, imdb_id TEXT);
+            CREATE TABLE Ratings (user_id INTEGER, movie_id INTEGER, score INTEGER,
+                                  time DATETIME);
+            CREATE TABLE WatchedHistory (user_id INTEGER, movie_id INTEGER,
+                                         watched_date DATETIME);
+            """
+        )
+        create_outbox_table(self.db.cursor())
+        create_digest_state_table(self.db.cursor())
+        self.db.executemany(
+            "INSERT INTO Movies VALUES (?, ?, ?)",
+            [(i, f"Movie {i}", f"tt{i:07d}") for i in range(300)],
+        )
+        self.db.executemany(
+            "INSERT INTO Users VALUES (?, ?)",
+            [(1, "a@test.com"), (2, "b@test.com"), (3, "c@test.com")],
+        )
+        self.db.executemany(
+            "INSERT INTO Ratings VALUES (?, ?, ?, '2024-01-01')",
+            [(1, 3, 5), (1, 10, 2), (2, 42, 4)],
+        )
+        self.db.execute("INSERT INTO WatchedHistory VALUES (2, 7, '2024-01-02')")
+        self.db.commit()
+
+    def outbox(self):
+        """
+        Returns {recipient: body} for every queued email
+        """
+        return dict(self.db.execute("SELECT recipient, body_html FROM EmailOutbox"))
+
+    def test_batch_matches_single_user_scoring(self):
+        """
+        Batch scoring ranks movies like recommend_for_new_user
+        """
+        rng = random.Random(7)
+        users = [
+            [
+                {"title": f"Movie {i}", "rating": float(rng.randint(1, 5))}
+                for i in rng.sample(range(300), rng.randint(1, 12))
+            ]
+            for _ in range(20)
+        ]
+        batch = item_based.recommend_for_users(users, 0.5, 0.3, 0.3, top_k=15)
+        for user, (titles, genres, imdb_ids) in zip(users, batch):
+            expected = item_based.recommend_for_new_user(user, 0.5, 0.3, 0.3)
+            self.assertEqual(titles, expected[0][:15])
+            self.assertEqual(genres, expected[1][:15])
+            self.assertEqual(imdb_ids, expected[2][:15])
+
+    def test_unknown_titles_get_no_recommendations(self):
+        """
+        Users whose history matches nothing in the catalogue get empty picks
+        """
+        batch = item_based.recommend_for_users([[{"title": "Nope", "rating": 5.0}]], 1, 0, 0)
+        self.assertEqual(batch, [([], [], [])])
+
+    def test_parallel_scoring_matches_serial(self):
+        """
+        Chunked scoring across worker processes gives the same results
+        """
+        histories = [{f"Movie {i}": 5.0, f"Movie {i + 1}": 3.0} for i in range(0, 40, 4)]
+        serial = score_histories(histories, top_k=5, chunk_size=100, workers=1)
+        parallel = score_histories(histories, top_k=5, chunk_size=3, workers=2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(serial), len(histories))
+        self.assertTrue(all(len(picks) == 5 for picks in serial))
+
+    def test_digests_are_personalized(self):
+        """
+        Users with history get their own picks, others only the trending list
+        """
+        counts = queue_weekly_digests(self.db, TRENDING, "2024-W01", workers=1)
+        self.assertEqual(counts, {"queued": 3, "skipped": 0})
+        outbox = self.outbox()
+        a_picks = score_histories([{"Movie 3": 5.0, "Movie 10": 2.0}], workers=1)[0]
+        self.assertIn("Picked for You", outbox["a@test.com"])
+        self.assertIn(a_picks[0][0] + "</a>", outbox["a@test.com"])
+        self.assertIn("Picked for You", outbox["b@test.com"])
+        self.assertNotIn("Picked for You", outbox["c@test.com"])
+        for body in outbox.values():
+            self.assertIn("tt9999999", body)
+            self.assertNotIn("Movie 3</a>", body)
+
+    def test_unchanged_users_are_skipped(self):
+        """
+        Only users whose history or the trending list changed get a new digest
+        """
+        queue_weekly_digests(self.db, TRENDING, "2024-W01", workers=1)
+        counts = queue_weekly_digests(self.db, TRENDING, "2024-W02", workers=1)
+        self.assertEqual(counts, {"queued": 0, "skipped": 3})
+
+        self.db.execute("INSERT INTO Ratings VALUES (3, 99, 4, '2024-01-09')")
+        self.db.commit()
+        counts = queue_weekly_digests(self.db, TRENDING, "2024-W02", workers=1)
+        self.assertEqual(counts, {"queued": 1, "skipped": 2})
+
+        trending = TRENDING + [{"title": "New (2024)", "imdb_id": "tt8888888"}]
+        counts = queue_weekly_digests(self.db, trending, "2024-W03", workers=1)
+        self.assertEqual(counts, {"queued": 3, "skipped": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
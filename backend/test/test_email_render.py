@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp import email_render
+from src.recommenderapp.email_render import (
+    genre_tag,
+    load_movie_genres,
+    render_feedback_email,
+    render_feedback_emails,
+    set_movie_genres,
+)
+
+warnings.filterwarnings("ignore")
+
+
+class TestEmailRender(unittest.TestCase):
+    """
+    Test cases for the compiled email templates
+    """
+
+    def setUp(self):
+        self.previous = email_render._MOVIE_GENRES  # pylint: disable=protected-access
+        set_movie_genres(
+            {
+                "Toy Story (1995)": ("Animation", "Comedy"),
+                "Heat (1995)": ("Crime",),
+                "Tom & Jerry (2021)": ("Children",),
+            }
+        )
+
+    def tearDown(self):
+        set_movie_genres(self.previous)
+
+    def test_load_movie_genres(self):
+        """
+        The genre map is read from the catalogue CSV
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "movies.csv")
+            with open(path, "w", encoding="utf8") as f:
+                f.write("movieId,title,genres,imdb_id\n")
+                f.write('862,"Toy Story (1995)",Animation|Comedy|Family,tt0114709\n')
+            self.assertEqual(
+                load_movie_genres(path), {"Toy Story (1995)": ("Animation", "Comedy", "Family")}
+            )
+
+    def test_genre_tag(self):
+        """
+        Known genres get their color, others the default
+        """
+        self.assertIn("#FF1493", genre_tag("Musical"))
+        self.assertIn("#CCCCCC", genre_tag("Space Opera"))
+
+    def test_render_sections(self):
+        """
+        Each section lists its movies with their genre tags
+        """
+        html = render_feedback_email(
+            {"Liked": ["Toy Story (1995)"], "Disliked": ["Heat (1995)"], "Yet to Watch": ["Nope"]}
+        )
+        liked = html.index("Movies Liked:")
+        disliked = html.index("Movies Disliked:")
+        yet = html.index("Movies Yet to Watch:")
+        self.assertLess(liked, html.index("Toy Story (1995)"))
+        self.assertLess(html.index("Toy Story (1995)"), disliked)
+        self.assertIn(">Animation</span> <span", html)
+        self.assertLess(disliked, html.index("Heat (1995)"))
+        self.assertGreater(html.index("Unknown Genre"), yet)
+
+    def test_titles_are_escaped(self):
+        """
+        Titles are HTML-escaped but the tags are not
+        """
+        html = render_feedback_email({"Liked": ["Tom & Jerry (2021)"]})
+        self.assertIn("Tom &amp; Jerry (2021)", html)
+        self.assertIn("#32CD32", html)
+
+    def test_batch(self):
+        """
+        Batch rendering personalizes each email
+        """
+        batch = [{"Liked": ["Heat (1995)"]}, {"Liked": ["Toy Story (1995)"]}]
+        first, second = render_feedback_emails(batch)
+        self.assertIn("Heat (1995)", first)
+        self.assertNotIn("Heat (1995)", second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Flask, jsonify
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp import http_cache
+from src.recommenderapp.http_cache import StatCache, send_cached_file
+
+warnings.filterwarnings("ignore")
+
+
+class TestSendCachedFile(unittest.TestCase):
+    """
+    Test cases for the cached poster responses
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("tt0000001.jpg", b"\xff\xd8poster-one" * 100)
+        self.stat_cache = StatCache(ttl=60, missing_ttl=60)
+        app = Flask(__name__)
+
+        @app.route("/thumbnails/<path:filename>")
+        def thumbnail(filename):
+            response = send_cached_file(self.tmp.name, filename, stat_cache=self.stat_cache)
+            if response is None:
+                return jsonify({"error": "Thumbnail not found"}), 404
+            return response
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        """
+        Writes a poster into the thumbnails directory
+        """
+        with open(os.path.join(self.tmp.name, name), "wb") as f:
+            f.write(data)
+
+    def test_strong_etag_and_immutable(self):
+        """
+        Posters carry a strong ETag and a one year immutable Cache-Control
+        """
+        response = self.client.get("/thumbnails/tt0000001.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"\xff\xd8poster-one" * 100)
+        self.assertEqual(response.mimetype, "image/jpeg")
+        etag, weak = response.get_etag()
+        self.assertTrue(etag)
+        self.assertFalse(weak)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertTrue(response.cache_control.public)
+        self.assertEqual(response.cache_control.max_age, 365 * 24 * 3600)
+
+    def test_if_none_match_without_filesystem_access(self):
+        """
+        A matching If-None-Match gets a 304 served from the stat cache
+        """
+        etag = self.client.get("/thumbnails/tt0000001.jpg").get_etag()[0]
+        with patch.object(http_cache.os, "stat", side_effect=AssertionError("stat")):
+            response = self.client.get(
+                "/thumbnails/tt0000001.jpg", headers={"If-None-Match": f'"{etag}"'}
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.get_etag()[0], etag)
+        self.assertTrue(response.cache_control.immutable)
+
+        response = self.client.get(
+            "/thumbnails/tt0000001.jpg", headers={"If-None-Match": '"something-else"'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_content(self):
+        """
+        Different content gets a different ETag once the cache entry expires
+        """
+        self.write("tt0000002.jpg", b"poster-two")
+        first = self.client.get("/thumbnails/tt0000001.jpg").get_etag()[0]
+        second = self.client.get("/thumbnails/tt0000002.jpg").get_etag()[0]
+        self.assertNotEqual(first, second)
+
+        self.write("tt0000002.jpg", b"poster-two, re-encoded")
+        self.stat_cache.forget(os.path.join(self.tmp.name, "tt0000002.jpg"))
+        self.assertNotEqual(self.client.get("/thumbnails/tt0000002.jpg").get_etag()[0], second)
+
+    def test_missing_files(self):
+        """
+        Missing posters are 404s, cached until forgotten
+        """
+        self.assertEqual(self.client.get("/thumbnails/tt0000003.jpg").status_code, 404)
+        self.write("tt0000003.jpg", b"late poster")
+        self.assertEqual(self.client.get("/thumbnails/tt0000003.jpg").status_code, 404)
+        self.stat_cache.forget(os.path.join(self.tmp.name, "tt0000003.jpg"))
+        self.assertEqual(self.client.get("/thumbnails/tt0000003.jpg").status_code, 200)
+        self.assertEqual(self.client.get("/thumbnails/../secret.jpg").status_code, 404)
+
+    def test_range_requests(self):
+        """
+        Range requests are still answered with partial content
+        """
+        response = self.client.get("/thumbnails/tt0000001.jpg", headers={"Range": "bytes=0-3"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b"\xff\xd8po")
+
+
+if __name__ == "__main__":
+    unittest.main()
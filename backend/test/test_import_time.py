@@ -0,0 +1,68 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+warnings.filterwarnings("ignore")
+
+APP_DIR = Path(__file__).resolve().parents[1] / "src" / "recommenderapp"
+
+# Importing the app must stay well below what openai or pandas alone cost
+IMPORT_BUDGET_MS = float(os.getenv("APP_IMPORT_BUDGET_MS", "500"))
+
+# Loaded on first use only (see app.py, ai_recommender.py, search.py and omdb.py)
+LAZY_MODULES = ("openai", "pandas", "numpy", "requests", "PIL", "apscheduler")
+
+
+def import_app(code="import app"):
+    """
+    Imports the app in a fresh interpreter and returns (import time in ms, stdout)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR,
+        env={**os.environ, "SECRET_KEY": "test secret key"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].rstrip() == " app":
+            return int(fields[1]) / 1000, result.stdout
+    raise AssertionError(f"no import time reported for app:\n{result.stderr[-2000:]}")
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    Test cases for the app's cold start
+    """
+
+    def test_heavy_modules_are_lazy(self):
+        """
+        Importing the app loads none of the heavy dependencies
+        """
+        _, out = import_app(f"import app, sys; print([m for m in {LAZY_MODULES!r} if m in sys.modules])")
+        self.assertEqual(out.strip(), "[]")
+
+    def test_import_time_budget(self):
+        """
+        Importing the app stays within the budget (best of three runs)
+        """
+        elapsed = min(import_app()[0] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_BUDGET_MS, f"app import took {elapsed:.0f}ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -114,3 +114,35 @@ INSERT INTO Movies (idMovies, name, imdb_id) VALUES (13, 'Forrest Gump (1994)',
 INSERT INTO Movies (idMovies, name, imdb_id) VALUES (14, 'American Beauty (1999)', 'tt0169547');
 INSERT INTO Movies (idMovies, name, imdb_id) VALUES (15, 'Citizen Kane (1941)', 'tt0033467');
 INSERT INTO Movies (idMovies, name, imdb_id) VALUES (16, 'Dancer in the Dark (2000)', 'tt0168629');
+
+CREATE TABLE IF NOT EXISTS EmailOutbox (
+  id INT NOT NULL AUTO_INCREMENT,
+  idempotency_key VARCHAR(191) NOT NULL,
+  recipient VARCHAR(255) NOT NULL,
+  subject VARCHAR(255) NOT NULL,
+  body_html MEDIUMTEXT NOT NULL,
+  status VARCHAR(16) NOT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  next_attempt_at DOUBLE NOT NULL,
+  last_error TEXT NULL,
+  created_at DOUBLE NOT NULL,
+  sent_at DOUBLE NULL,
+  PRIMARY KEY (id),
+  UNIQUE INDEX idempotency_key_UNIQUE (idempotency_key ASC),
+  INDEX idx_outbox_due (status ASC, next_attempt_at ASC)
+);
+
+CREATE TABLE IF NOT EXISTS DigestState (
+  user_id INT NOT NULL,
+  fingerprint CHAR(64) NOT NULL,
+  sent_at DOUBLE NOT NULL,
+  PRIMARY KEY (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS MovieTitles (
+  movie_id INT NOT NULL,
+  name_norm VARCHAR(128) NOT NULL,
+  year INT NULL,
+  PRIMARY KEY (movie_id),
+  INDEX idx_movietitles_name (name_norm)
+);
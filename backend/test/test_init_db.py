@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.utils import (
+    build_db_template,
+    init_db,
+    parse_movie_inserts,
+    read_movies_csv,
+)
+
+warnings.filterwarnings("ignore")
+
+SAMPLE_SQL = [
+    "-- Movies catalogue\n",
+    "INSERT INTO Movies (idMovies, name, imdb_id) VALUES (2, 'Ariel (1988)', 'tt0094675');\n",
+    "INSERT INTO Movies (idMovies, name, imdb_id) VALUES "
+    "(5, 'Crouching Tiger, Hidden Dragon (2000)', 'tt0190332');\n",
+    "INSERT INTO Movies (idMovies, name, imdb_id) VALUES "
+    "(6, 'Schindler''s List (1993)', 'tt0108052'), "
+    "(7, 'Ocean\\'s Eleven (2001)', 'tt0240772');\n",
+    "INSERT INTO Movies (idMovies, name, imdb_id) VALUES (8, 'Duplicate', 'tt0094675');\n",
+]
+
+
+class TestInitDb(unittest.TestCase):
+    """
+    Test cases for bootstrapping movies.db
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sql_path = os.path.join(self.tmp.name, "movies.sql")
+        with open(self.sql_path, "w", encoding="utf8") as sql_file:
+            sql_file.writelines(SAMPLE_SQL)
+        self.env = patch.dict(
+            os.environ,
+            {
+                "MOVIES_SQL_PATH": self.sql_path,
+                "MOVIES_DB_TEMPLATE": os.path.join(self.tmp.name, "none.db"),
+            },
+        )
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_parse_titles_with_commas_and_quotes(self):
+        """
+        Titles containing commas and escaped quotes are parsed intact
+        """
+        movies = parse_movie_inserts(SAMPLE_SQL)
+        self.assertEqual(
+            movies,
+            [
+                (2, "Ariel (1988)", "tt0094675"),
+                (5, "Crouching Tiger, Hidden Dragon (2000)", "tt0190332"),
+                (6, "Schindler's List (1993)", "tt0108052"),
+                (7, "Ocean's Eleven (2001)", "tt0240772"),
+            ],
+        )
+
+    def test_parse_skips_malformed_lines(self):
+        """
+        Lines that are not movie tuples are ignored
+        """
+        self.assertEqual(parse_movie_inserts(["INSERT INTO Movies VALUES (oops);"]), [])
+
+    def test_read_movies_csv(self):
+        """
+        The CSV catalogue loader keeps quoted commas in titles
+        """
+        csv_path = os.path.join(self.tmp.name, "movies.csv")
+        with open(csv_path, "w", encoding="utf8") as csv_file:
+            csv_file.write("movieId,title,genres,imdb_id\n")
+            csv_file.write('1,"Good, Bad and Ugly",Western,tt0060196\n')
+            csv_file.write("2,Heat,Crime,tt0113277\n")
+        self.assertEqual(
+            read_movies_csv(csv_path),
+            [(1, "Good, Bad and Ugly", "tt0060196"), (2, "Heat", "tt0113277")],
+        )
+
+    def test_init_db_loads_movies(self):
+        """
+        init_db creates the schema and loads the catalogue
+        """
+        db_name = os.path.join(self.tmp.name, "movies.db")
+        init_db(db_name=db_name)
+        conn = sqlite3.connect(db_name)
+        names = [r[0] for r in conn.execute("SELECT name FROM Movies ORDER BY idMovies")]
+        conn.close()
+        self.assertEqual(len(names), 4)
+        self.assertIn("Crouching Tiger, Hidden Dragon (2000)", names)
+        self.assertFalse([f for f in os.listdir(self.tmp.name) if f.endswith(".tmp")])
+
+    def test_init_db_copies_template(self):
+        """
+        A prebuilt template is copied instead of parsing movies.sql
+        """
+        template = os.path.join(self.tmp.name, "movies.template.db")
+        build_db_template(template)
+        os.remove(self.sql_path)
+        db_name = os.path.join(self.tmp.name, "movies.db")
+        init_db(db_name=db_name, template_path=template)
+        conn = sqlite3.connect(db_name)
+        count = conn.execute("SELECT COUNT(*) FROM Movies").fetchone()[0]
+        conn.close()
+        self.assertEqual(count, 4)
+
+    def test_init_db_keeps_existing_database(self):
+        """
+        An existing database is left untouched
+        """
+        db_name = os.path.join(self.tmp.name, "movies.db")
+        init_db(db_name=db_name)
+        conn = sqlite3.connect(db_name)
+        conn.execute("DELETE FROM Movies")
+        conn.commit()
+        conn.close()
+        init_db(db_name=db_name)
+        conn = sqlite3.connect(db_name)
+        count = conn.execute("SELECT COUNT(*) FROM Movies").fetchone()[0]
+        conn.close()
+        self.assertEqual(count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sys
+import threading
+import time
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.io_pool import Bulkhead, UpstreamBusy, UpstreamTimeout
+
+warnings.filterwarnings("ignore")
+
+
+class SlowUpstream(BaseHTTPRequestHandler):
+    """
+    Fake upstream that answers after `delay` seconds
+    """
+
+    delay = 1.0
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Sleeps, then returns a small JSON body
+        """
+        time.sleep(self.delay)
+        body = b'{"Title": "Heat"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestBulkhead(unittest.TestCase):
+    """
+    Load tests for the upstream pools against a simulated slow upstream
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowUpstream)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_run_returns_result(self):
+        """
+        A call that finishes in time returns its result
+        """
+        pool = Bulkhead("test", max_workers=1, timeout=5)
+        self.assertEqual(pool.run(requests.get, self.url, timeout=5).json(), {"Title": "Heat"})
+        pool.shutdown()
+
+    def test_timeout(self):
+        """
+        Callers give up after the pool timeout
+        """
+        pool = Bulkhead("test", max_workers=1, timeout=0.2)
+        start = time.perf_counter()
+        with self.assertRaises(UpstreamTimeout):
+            pool.run(requests.get, self.url, timeout=5)
+        self.assertLess(time.perf_counter() - start, 0.6)
+        pool.shutdown()
+
+    def test_slow_upstream_does_not_starve_other_work(self):
+        """
+        Under a burst against a slow upstream, excess callers fail fast and
+        work on other pools keeps its latency
+        """
+        pool = Bulkhead("test", max_workers=2, max_pending=2, timeout=5)
+        outcomes = []
+        lock = threading.Lock()
+
+        def call():
+            start = time.perf_counter()
+            try:
+                pool.run(requests.get, self.url, timeout=5)
+                outcome = "ok"
+            except UpstreamBusy:
+                outcome = "busy"
+            with lock:
+                outcomes.append((outcome, time.perf_counter() - start))
+
+        callers = [threading.Thread(target=call) for _ in range(20)]
+        for caller in callers:
+            caller.start()
+
+        # Work on other pools is unaffected while the burst is in flight
+        other = Bulkhead("other", max_workers=1, timeout=5)
+        start = time.perf_counter()
+        self.assertEqual(other.run(lambda: "search results"), "search results")
+        self.assertLess(time.perf_counter() - start, 0.1)
+        other.shutdown()
+
+        for caller in callers:
+            caller.join()
+        busy = [elapsed for outcome, elapsed in outcomes if outcome == "busy"]
+        self.assertEqual(len(outcomes), 20)
+        self.assertEqual(len(outcomes) - len(busy), 4)
+        self.assertTrue(all(elapsed < 0.1 for elapsed in busy))
+        pool.shutdown()
+        self.assertEqual(pool.pending, 0)
+
+    def test_submit_is_fire_and_forget(self):
+        """
+        submit returns immediately while the call runs in the background
+        """
+        pool = Bulkhead("test", max_workers=1, timeout=5)
+        start = time.perf_counter()
+        future = pool.submit(requests.get, self.url, timeout=5)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(future.result().status_code, 200)
+        pool.shutdown()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_reset_after_fork(self):
+        """
+        A forked worker gets a working pool even if the parent's was busy
+        """
+        pool = Bulkhead("test", max_workers=1, max_pending=0, timeout=5)
+        release = threading.Event()
+        pool.submit(release.wait)
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child process
+            code = 1
+            try:
+                pool.reset()
+                code = 0 if pool.run(lambda: 42, wait_timeout=2) == 42 else 1
+            finally:
+                os._exit(code)  # pylint: disable=protected-access
+        try:
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            with self.assertRaises(UpstreamBusy):
+                pool.submit(time.sleep, 0)
+        finally:
+            release.set()
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position,protected-access
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Flask
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp import log_config
+from src.recommenderapp.log_config import DroppingQueueHandler, flush_logs, setup_logging
+
+warnings.filterwarnings("ignore")
+
+logger = logging.getLogger("bingesuggest.test")
+
+
+class TestLogConfig(unittest.TestCase):
+    """
+    Test cases for the queued, structured logging setup
+    """
+
+    def setUp(self):
+        self.root_level = logging.getLogger().level
+        self.app = Flask(__name__)
+
+        @self.app.route("/movie/<id>")
+        def movie(id):  # pylint: disable=redefined-builtin,invalid-name
+            logger.debug("lookup %s", id)
+            logger.debug("found %s", id)
+            logger.info("served %s", id)
+            return "ok"
+
+    def tearDown(self):
+        log_config._stop_listener()
+        root = logging.getLogger()
+        for handler in [h for h in root.handlers if isinstance(h, DroppingQueueHandler)]:
+            root.removeHandler(handler)
+        root.setLevel(self.root_level)
+
+    def records(self, stream):
+        """
+        Returns the JSON lines written so far
+        """
+        flush_logs()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_json_lines_with_request_fields(self):
+        """
+        Records are JSON objects carrying the request id, route and traceback
+        """
+        stream = io.StringIO()
+        setup_logging(level="INFO", fmt="json", stream=stream)
+        with self.app.test_request_context("/movie/tt1", headers={"X-Request-ID": "abc"}):
+            self.app.preprocess_request()
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("lookup of %s failed", "tt1", extra={"imdb_id": "tt1"})
+        logger.info("outside")
+        first, second = self.records(stream)
+        self.assertEqual(first["message"], "lookup of tt1 failed")
+        self.assertEqual(first["level"], "ERROR")
+        self.assertEqual(first["logger"], "bingesuggest.test")
+        self.assertEqual(
+            (first["request_id"], first["method"], first["route"], first["imdb_id"]),
+            ("abc", "GET", "/movie/<id>", "tt1"),
+        )
+        self.assertIn("ValueError: boom", first["exc_info"])
+        self.assertEqual(second["message"], "outside")
+        self.assertNotIn("request_id", second)
+
+    def test_debug_is_sampled_per_request(self):
+        """
+        A request keeps either all or none of its debug lines
+        """
+        stream = io.StringIO()
+        with patch.dict(os.environ, {"LOG_DEBUG_SAMPLE": "0.5"}):
+            setup_logging(level="DEBUG", fmt="json", stream=stream)
+        client = self.app.test_client()
+        with patch.object(log_config.random, "random", side_effect=[0.9, 0.1]):
+            client.get("/movie/tt1")
+            client.get("/movie/tt2")
+        messages = [record["message"] for record in self.records(stream)]
+        self.assertEqual(messages, ["served tt1", "lookup tt2", "found tt2", "served tt2"])
+
+    def test_full_queue_drops_records(self):
+        """
+        Logging never blocks: records beyond the queue size are dropped and counted
+        """
+        handler = DroppingQueueHandler(queue.Queue(1))
+        before = log_config.DROPPED.collect().get((), 0)
+        for number in range(3):
+            handler.handle(logging.LogRecord("x", logging.INFO, "", 0, "n%d", (number,), None))
+        self.assertEqual(handler.queue.get_nowait().getMessage(), "n0")
+        self.assertEqual(log_config.DROPPED.collect()[()], before + 2)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_forked_child_keeps_logging(self):
+        """
+        A forked worker gets its own writer thread
+        """
+        with tempfile.TemporaryFile("w+") as out:
+            setup_logging(level="INFO", fmt="text", stream=out)
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover - child process
+                try:
+                    logger.info("from the child")
+                    flush_logs()
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            logger.info("from the parent")
+            flush_logs()
+            out.seek(0)
+            lines = out.read()
+        self.assertIn("INFO bingesuggest.test: from the child", lines)
+        self.assertIn("from the parent", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
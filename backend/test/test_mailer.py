@@ -0,0 +1,201 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import socket
+import sys
+import time
+import unittest
+import warnings
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.mailer import MailDispatcher
+from src.recommenderapp.ratelimit import TokenBucket
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # pragma: no cover
+    Controller = None
+
+warnings.filterwarnings("ignore")
+
+
+class SinkHandler:
+    """
+    aiosmtpd handler recording delivered messages and connections
+    """
+
+    def __init__(self):
+        self.delivered = []
+        self.peers = set()
+        self.flaky = {}
+
+    async def handle_DATA(self, server, session, envelope):  # pylint: disable=invalid-name
+        """
+        Accepts the message, or answers 421 for a flaky recipient
+        """
+        recipient = envelope.rcpt_tos[0]
+        if self.flaky.get(recipient):
+            self.flaky[recipient] -= 1
+            return "421 Service not available, closing transmission channel"
+        self.peers.add(session.peer)
+        self.delivered.append(recipient)
+        return "250 OK"
+
+
+def make_message(recipient):
+    """
+    Builds a small HTML message
+    """
+    message = MIMEMultipart("alternative")
+    message["To"] = recipient
+    message["Subject"] = "Newly Released Movies for You"
+    message.attach(MIMEText("<p>Heat</p>", "html"))
+    return message
+
+
+class TestTokenBucket(unittest.TestCase):
+    """
+    Test cases for the rate limiter
+    """
+
+    def test_rate(self):
+        """
+        Acquiring beyond the burst waits for refills
+        """
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.perf_counter()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+
+    def test_disabled(self):
+        """
+        No rate means no waiting
+        """
+        bucket = TokenBucket(rate=None)
+        start = time.perf_counter()
+        for _ in range(1000):
+            bucket.acquire()
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd not installed")
+class TestMailDispatcher(unittest.TestCase):
+    """
+    Test cases for pooled delivery against a local SMTP sink
+    """
+
+    def setUp(self):
+        self.handler = SinkHandler()
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def make_dispatcher(self, **kwargs):
+        """
+        Builds a plain-text (no TLS/auth) dispatcher for the sink
+        """
+        return MailDispatcher(
+            "127.0.0.1", self.port, sender="bingesuggest@test.com", use_tls=False, **kwargs
+        )
+
+    def test_connections_reused(self):
+        """
+        Many messages are delivered over one connection per worker
+        """
+        recipients = [f"user{i}@test.com" for i in range(40)]
+        results = self.make_dispatcher(workers=2).send_many(
+            (r, make_message(r)) for r in recipients
+        )
+        self.assertEqual(results, [None] * 40)
+        self.assertEqual(sorted(self.handler.delivered), sorted(recipients))
+        self.assertLessEqual(len(self.handler.peers), 2)
+
+    def test_connection_recycled(self):
+        """
+        Connections are replaced after messages_per_connection messages
+        """
+        recipients = [f"user{i}@test.com" for i in range(10)]
+        self.make_dispatcher(workers=1, messages_per_connection=5).send_many(
+            (r, make_message(r)) for r in recipients
+        )
+        self.assertEqual(len(self.handler.delivered), 10)
+        self.assertEqual(len(self.handler.peers), 2)
+
+    def test_reconnect_on_421(self):
+        """
+        A 421 from the server triggers a reconnect and retry
+        """
+        self.handler.flaky["flaky@test.com"] = 1
+        recipients = ["a@test.com", "flaky@test.com", "b@test.com"]
+        results = self.make_dispatcher(workers=1).send_many(
+            (r, make_message(r)) for r in recipients
+        )
+        self.assertEqual(results, [None, None, None])
+        self.assertEqual(len(self.handler.peers), 2)
+
+    def test_failure_reported(self):
+        """
+        Messages that cannot be delivered are reported, not raised
+        """
+        self.handler.flaky["flaky@test.com"] = 10
+        results = self.make_dispatcher(workers=1, max_retries=1).send_many(
+            [("flaky@test.com", make_message("flaky@test.com"))]
+        )
+        self.assertIsNotNone(results[0])
+
+    def test_connect_failures_back_off(self):
+        """
+        Failed connects are retried after exponentially growing, jittered delays
+        """
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            closed_port = probe.getsockname()[1]
+        delays = []
+        dispatcher = MailDispatcher(
+            "127.0.0.1",
+            closed_port,
+            use_tls=False,
+            workers=1,
+            max_retries=2,
+            max_connect_backoff=3,
+        )
+        with patch("src.recommenderapp.mailer.time.sleep", side_effect=delays.append), patch(
+            "src.recommenderapp.mailer.random.uniform", return_value=1.0
+        ):
+            results = dispatcher.send_many(
+                (r, make_message(r)) for r in ("a@test.com", "b@test.com")
+            )
+        self.assertTrue(all(isinstance(error, OSError) for error in results))
+        # One worker, two messages, three connects each: no wait before the first one
+        self.assertEqual(delays, [1, 2, 3, 3, 3])
+        self.assertTrue(0.5 <= dispatcher._connect_delay(1) <= 1.0)  # pylint: disable=protected-access
+
+    def test_rate_limited(self):
+        """
+        The shared token bucket caps throughput across workers
+        """
+        recipients = [f"user{i}@test.com" for i in range(6)]
+        start = time.perf_counter()
+        dispatcher = self.make_dispatcher(workers=3)
+        dispatcher.limiter = TokenBucket(rate=50, burst=1)
+        dispatcher.send_many((r, make_message(r)) for r in recipients)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.io_pool import Bulkhead, UpstreamBusy
+from src.recommenderapp.metrics import SPAN_SECONDS, Registry, span
+
+warnings.filterwarnings("ignore")
+
+
+def sample(text, line):
+    """
+    Returns the value of one exposition line, or None
+    """
+    for candidate in text.splitlines():
+        if candidate.startswith(line + " "):
+            return float(candidate.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test cases for the Prometheus metrics
+    """
+
+    def test_histogram_exposition(self):
+        """
+        Buckets are cumulative and label values are escaped
+        """
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value, '/a"b')
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{route="/a\\"b",le="0.1"}'), 2)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{route="/a\\"b",le="1"}'), 3)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{route="/a\\"b",le="+Inf"}'), 4)
+        self.assertEqual(sample(text, 'latency_seconds_count{route="/a\\"b"}'), 4)
+        self.assertAlmostEqual(sample(text, 'latency_seconds_sum{route="/a\\"b"}'), 3.65)
+
+    def test_concurrent_counts(self):
+        """
+        Observations from many threads are all counted
+        """
+        registry = Registry()
+        hits = registry.counter("hits_total", "Hits", ("route",))
+
+        def work():
+            for _ in range(1000):
+                hits.inc("/")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sample(registry.render(), 'hits_total{route="/"}'), 8000)
+
+    def test_worker_snapshots_are_merged(self):
+        """
+        A scrape adds up the snapshots of the other workers
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = Registry()
+            hits = registry.counter("hits_total", "Hits", ("route",))
+            latency = registry.histogram("latency_seconds", "Latency", buckets=(1,))
+            hits.inc("/")
+            latency.observe(0.5)
+            registry.write_snapshot(tmp)
+            os.rename(os.path.join(tmp, f"{os.getpid()}.json"), os.path.join(tmp, "1.json"))
+
+            registry.start_snapshots(tmp, interval=3600)
+            hits.inc("/", amount=2)
+            hits.inc("/other")
+            text = registry.render()
+            self.assertEqual(sample(text, 'hits_total{route="/"}'), 4)
+            self.assertEqual(sample(text, 'hits_total{route="/other"}'), 1)
+            self.assertEqual(sample(text, 'latency_seconds_bucket{le="1"}'), 2)
+            self.assertEqual(sample(text, "latency_seconds_count"), 2)
+
+            registry.clear()
+            self.assertEqual(sample(registry.render(), 'hits_total{route="/"}'), 1)
+
+    def test_pool_spans_and_rejections(self):
+        """
+        Upstream pools time their calls and count refused ones
+        """
+        from src.recommenderapp.metrics import REGISTRY
+
+        pool = Bulkhead("metrics-test", max_workers=1, max_pending=0, timeout=5)
+        release = threading.Event()
+        pool.submit(release.wait)
+        with self.assertRaises(UpstreamBusy):
+            pool.submit(release.wait)
+        release.set()
+        pool.shutdown()
+        with span("custom.stage"):
+            pass
+        text = REGISTRY.render()
+        self.assertEqual(sample(text, 'span_duration_seconds_count{span="pool.metrics-test"}'), 1)
+        self.assertEqual(
+            sample(text, 'upstream_rejected_total{pool="metrics-test",reason="busy"}'), 1
+        )
+        self.assertEqual(SPAN_SECONDS.collect()[("custom.stage",)][0][-1], 0)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """
+    Test cases for the request metrics of the app
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.environ["SQLITE_PATH"] = os.path.join(cls.tmp.name, "movies.db")
+        os.environ.setdefault("SECRET_KEY", "test secret key")
+        from src.recommenderapp import storage
+        from src.recommenderapp.app import create_app
+
+        storage._STORAGE = None  # pylint: disable=protected-access
+        cls.client = create_app().test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        from src.recommenderapp import storage
+
+        storage._STORAGE = None  # pylint: disable=protected-access
+        del os.environ["SQLITE_PATH"]
+        cls.tmp.cleanup()
+
+    def test_requests_are_recorded(self):
+        """
+        Every request is counted by route and status and its latency recorded
+        """
+        before = sample(
+            self.client.get("/metrics").get_data(as_text=True),
+            'http_requests_total{method="GET",route="/",status="200"}',
+        )
+        self.client.get("/")
+        self.client.get("/")
+        self.client.get("/no-such-page")
+        self.client.get("/movieDiscussion/tt0000001")
+        response = self.client.get("/metrics")
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        self.assertEqual(
+            sample(text, 'http_requests_total{method="GET",route="/",status="200"}'),
+            (before or 0) + 2,
+        )
+        self.assertEqual(
+            sample(text, 'http_requests_total{method="GET",route="unmatched",status="404"}'), 1
+        )
+        self.assertGreaterEqual(
+            sample(text, 'http_request_duration_seconds_count{method="GET",route="/"}'), 2
+        )
+        self.assertGreater(sample(text, 'span_duration_seconds_count{span="db.query"}'), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
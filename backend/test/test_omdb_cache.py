@@ -0,0 +1,167 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.io_pool import Bulkhead
+from src.recommenderapp.omdb import OmdbCache
+
+warnings.filterwarnings("ignore")
+
+
+class FakeOmdb(BaseHTTPRequestHandler):
+    """
+    Local stand-in for www.omdbapi.com that counts requests per id
+    """
+
+    hits = {}
+    delay = 0.0
+    title = "Heat"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers ?i=<imdb_id> lookups
+        """
+        imdb_id = parse_qs(urlparse(self.path).query)["i"][0]
+        FakeOmdb.hits[imdb_id] = FakeOmdb.hits.get(imdb_id, 0) + 1
+        time.sleep(FakeOmdb.delay)
+        if imdb_id.startswith("tt"):
+            payload = {"imdbID": imdb_id, "Title": FakeOmdb.title, "Response": "True"}
+        else:
+            payload = {"Response": "False", "Error": "Incorrect IMDb ID."}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestOmdbCache(unittest.TestCase):
+    """
+    Test cases for the OMDB response cache
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOmdb)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeOmdb.hits = {}
+        FakeOmdb.delay = 0.0
+        FakeOmdb.title = "Heat"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pool = Bulkhead("omdb-test", max_workers=4, timeout=5)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        self.tmp.cleanup()
+
+    def make_cache(self, **kwargs):
+        """
+        Builds a cache pointed at the fake server
+        """
+        return OmdbCache(
+            path=os.path.join(self.tmp.name, "omdb.db"), url=self.url, pool=self.pool, **kwargs
+        )
+
+    def test_miss_then_hit(self):
+        """
+        The second lookup is served without calling OMDB
+        """
+        cache = self.make_cache()
+        self.assertEqual(cache.get("tt0113277")["Title"], "Heat")
+        self.assertEqual(cache.get("tt0113277")["Title"], "Heat")
+        self.assertEqual(FakeOmdb.hits["tt0113277"], 1)
+
+    def test_persistent_across_instances(self):
+        """
+        Entries survive a restart through the SQLite table
+        """
+        self.make_cache().get("tt0113277")
+        self.assertEqual(self.make_cache().get("tt0113277")["Title"], "Heat")
+        self.assertEqual(FakeOmdb.hits["tt0113277"], 1)
+
+    def test_lru_eviction_falls_back_to_disk(self):
+        """
+        Entries evicted from memory are reloaded from disk
+        """
+        cache = self.make_cache(max_memory=1)
+        cache.get("tt0000001")
+        cache.get("tt0000002")
+        cache.get("tt0000001")
+        self.assertEqual(FakeOmdb.hits, {"tt0000001": 1, "tt0000002": 1})
+
+    def test_errors_not_cached(self):
+        """
+        Failed lookups are fetched again next time
+        """
+        cache = self.make_cache()
+        cache.get("bad")
+        cache.get("bad")
+        self.assertEqual(FakeOmdb.hits["bad"], 2)
+
+    def test_stale_while_revalidate(self):
+        """
+        Expired entries are served immediately and refreshed in the background
+        """
+        cache = self.make_cache(ttl=0.05)
+        cache.get("tt0113277")
+        time.sleep(0.1)
+        FakeOmdb.title = "Heat (Remastered)"
+        FakeOmdb.delay = 0.2
+        start = time.perf_counter()
+        self.assertEqual(cache.get("tt0113277")["Title"], "Heat")
+        self.assertLess(time.perf_counter() - start, 0.15)
+        self.pool.shutdown()
+        self.assertEqual(FakeOmdb.hits["tt0113277"], 2)
+        self.assertEqual(cache.get("tt0113277")["Title"], "Heat (Remastered)")
+
+    def test_concurrent_misses_coalesced(self):
+        """
+        Simultaneous misses for one id make a single upstream request
+        """
+        cache = self.make_cache()
+        FakeOmdb.delay = 0.3
+        results = []
+
+        def lookup():
+            results.append(cache.get("tt0113277")["Title"])
+
+        threads = [threading.Thread(target=lookup) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["Heat"] * 10)
+        self.assertEqual(FakeOmdb.hits["tt0113277"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import smtplib
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from email.mime.multipart import MIMEMultipart
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.outbox import (
+    create_outbox_table,
+    drain_outbox,
+    enqueue_email,
+)
+from src.recommenderapp.utils import send_email
+
+warnings.filterwarnings("ignore")
+
+
+class RecordingDispatcher:
+    """
+    Dispatcher double that records messages and fails chosen recipients
+    """
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.batches = []
+
+    def send_many(self, messages):
+        """
+        Records a batch, failing the configured recipients
+        """
+        messages = list(messages)
+        self.batches.append([recipient for recipient, _ in messages])
+        return [
+            smtplib.SMTPRecipientsRefused({r: (550, b"no")}) if r in self.failing else None
+            for r, _ in messages
+        ]
+
+
+class TestOutbox(unittest.TestCase):
+    """
+    Test cases for the durable email outbox
+    """
+
+    def setUp(self):
+        self.db = sqlite3.connect(":memory:")
+        create_outbox_table(self.db.cursor())
+
+    def rows(self):
+        """
+        Returns (recipient, status, attempts) for every queued email
+        """
+        return self.db.execute(
+            "SELECT recipient, status, attempts FROM EmailOutbox ORDER BY id"
+        ).fetchall()
+
+    def test_enqueue_is_idempotent(self):
+        """
+        The same message to the same recipient is only queued once
+        """
+        self.assertTrue(enqueue_email(self.db, "a@test.com", "Hi", "<p>1</p>"))
+        self.assertFalse(enqueue_email(self.db, "a@test.com", "Hi", "<p>1</p>"))
+        self.assertTrue(enqueue_email(self.db, "b@test.com", "Hi", "<p>1</p>"))
+        self.assertTrue(enqueue_email(self.db, "a@test.com", "Hi", "<p>2</p>"))
+        self.assertTrue(enqueue_email(self.db, "a@test.com", "Digest", "x", idempotency_key="k"))
+        self.assertFalse(enqueue_email(self.db, "a@test.com", "Digest", "y", idempotency_key="k"))
+        self.assertEqual(len(self.rows()), 4)
+
+    def test_drain_sends_in_batches(self):
+        """
+        Due messages are delivered in batches and marked sent
+        """
+        for i in range(5):
+            enqueue_email(self.db, f"user{i}@test.com", "Hi", "<p>Heat</p>")
+        dispatcher = RecordingDispatcher()
+        counts = drain_outbox(self.db, dispatcher, batch_size=2)
+        self.assertEqual(counts, {"sent": 5, "retried": 0, "dead": 0})
+        self.assertEqual([len(b) for b in dispatcher.batches], [2, 2, 1])
+        self.assertTrue(all(status == "sent" for _, status, _ in self.rows()))
+        self.assertEqual(drain_outbox(self.db, dispatcher)["sent"], 0)
+
+    def test_retry_with_backoff(self):
+        """
+        Failed messages are rescheduled instead of dropped
+        """
+        enqueue_email(self.db, "bad@test.com", "Hi", "<p>Heat</p>")
+        counts = drain_outbox(self.db, RecordingDispatcher(["bad@test.com"]))
+        self.assertEqual(counts["retried"], 1)
+        self.assertEqual(self.rows(), [("bad@test.com", "pending", 1)])
+        # Not due again until the backoff has elapsed
+        self.assertEqual(drain_outbox(self.db, RecordingDispatcher())["sent"], 0)
+        self.db.execute("UPDATE EmailOutbox SET next_attempt_at = 0")
+        self.assertEqual(drain_outbox(self.db, RecordingDispatcher())["sent"], 1)
+
+    def test_dead_letter(self):
+        """
+        Messages are dead-lettered after max_attempts failures
+        """
+        enqueue_email(self.db, "bad@test.com", "Hi", "<p>Heat</p>")
+        dispatcher = RecordingDispatcher(["bad@test.com"])
+        for _ in range(3):
+            self.db.execute("UPDATE EmailOutbox SET next_attempt_at = 0")
+            drain_outbox(self.db, dispatcher, max_attempts=3)
+        self.assertEqual(self.rows(), [("bad@test.com", "dead", 3)])
+        error = self.db.execute("SELECT last_error FROM EmailOutbox").fetchone()[0]
+        self.assertIn("550", error)
+
+    def test_stale_claim_is_recovered(self):
+        """
+        Messages left in "sending" by a crashed worker are retried after the lease
+        """
+        enqueue_email(self.db, "a@test.com", "Hi", "<p>Heat</p>")
+        self.db.execute("UPDATE EmailOutbox SET status = 'sending', next_attempt_at = 0")
+        self.assertEqual(drain_outbox(self.db, RecordingDispatcher())["sent"], 1)
+        self.assertEqual(self.rows(), [("a@test.com", "sent", 1)])
+
+    def test_expired_claims_count_as_attempts(self):
+        """
+        A message whose sender keeps crashing is dead-lettered, not reclaimed forever
+        """
+        enqueue_email(self.db, "a@test.com", "Hi", "<p>Heat</p>")
+        for attempts in (1, 2):
+            self.db.execute("UPDATE EmailOutbox SET status = 'sending', next_attempt_at = 0")
+            with patch.object(RecordingDispatcher, "send_many", side_effect=SystemExit):
+                with self.assertRaises(SystemExit):
+                    drain_outbox(self.db, RecordingDispatcher(), max_attempts=3)
+            self.assertEqual(self.rows(), [("a@test.com", "sending", attempts)])
+        self.db.execute("UPDATE EmailOutbox SET next_attempt_at = 0")
+        counts = drain_outbox(self.db, RecordingDispatcher(), max_attempts=3)
+        self.assertEqual((counts["dead"], counts["sent"]), (1, 0))
+        self.assertEqual(self.rows(), [("a@test.com", "dead", 3)])
+
+    def test_concurrent_enqueue_of_one_key(self):
+        """
+        Racing enqueues of the same message insert it once and never fail
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "outbox.db")
+            with sqlite3.connect(path) as db:
+                create_outbox_table(db.cursor())
+            barrier = threading.Barrier(8)
+            results = []
+
+            def enqueue():
+                db = sqlite3.connect(path, timeout=30)
+                barrier.wait()
+                results.append(enqueue_email(db, "a@test.com", "Hi", "<p>Heat</p>"))
+                db.close()
+
+            threads = [threading.Thread(target=enqueue) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with sqlite3.connect(path) as db:
+                count = db.execute("SELECT COUNT(*) FROM EmailOutbox").fetchone()[0]
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(count, 1)
+
+
+class TestSendEmail(unittest.TestCase):
+    """
+    Test cases for the single-message send_email helper
+    """
+
+    def test_connection_failure_raises_original_error(self):
+        """
+        A failed connect no longer crashes in the finally block
+        """
+        with patch("smtplib.SMTP", side_effect=ConnectionRefusedError):
+            with self.assertRaises(ConnectionRefusedError):
+                send_email(MIMEMultipart(), "a@test.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
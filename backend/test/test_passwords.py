@@ -0,0 +1,99 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sqlite3
+import sys
+import threading
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.io_pool import Bulkhead, UpstreamBusy
+from src.recommenderapp.passwords import check_password, hash_cost, hash_password
+from src.recommenderapp.utils import create_account, login_to_account
+
+warnings.filterwarnings("ignore")
+
+
+class TestPasswords(unittest.TestCase):
+    """
+    Test cases for pooled password hashing
+    """
+
+    def setUp(self):
+        # The cheapest cost bcrypt accepts keeps the tests fast
+        self.env = patch.dict(os.environ, {"BCRYPT_ROUNDS": "4"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+
+    def test_hash_and_check(self):
+        """
+        Hashes use the configured cost and only the right password matches
+        """
+        hashed = hash_password("secret")
+        self.assertEqual(hash_cost(hashed), 4)
+        self.assertEqual(check_password("secret", hashed), (True, None))
+        self.assertEqual(check_password("wrong", hashed), (False, None))
+        # Drivers may hand the hash back as text
+        self.assertEqual(check_password("secret", hashed.decode()), (True, None))
+
+    def test_rehash_when_cost_changes(self):
+        """
+        A matching password hashed at another cost gets a new hash
+        """
+        hashed = hash_password("secret", rounds=5)
+        matches, new_hash = check_password("secret", hashed)
+        self.assertTrue(matches)
+        self.assertEqual(hash_cost(new_hash), 4)
+        self.assertEqual(check_password("secret", new_hash), (True, None))
+        self.assertEqual(check_password("wrong", hashed), (False, None))
+
+    def test_backpressure(self):
+        """
+        A saturated pool rejects work instead of queueing it
+        """
+        pool = Bulkhead("bcrypt-test", max_workers=1, max_pending=0, timeout=5.0)
+        release = threading.Event()
+        pool.submit(release.wait)
+        try:
+            with self.assertRaises(UpstreamBusy):
+                hash_password("secret", pool=pool)
+        finally:
+            release.set()
+            pool.shutdown()
+
+    def test_login_upgrades_stored_hash(self):
+        """
+        Logging in rewrites a hash made with an outdated cost
+        """
+        db = sqlite3.connect(":memory:")
+        db.execute(
+            "CREATE TABLE Users (idUsers INTEGER PRIMARY KEY, username TEXT, email TEXT, "
+            "password TEXT)"
+        )
+        with patch.dict(os.environ, {"BCRYPT_ROUNDS": "5"}):
+            create_account(db, "a@test.com", "alice", "pw")
+        stored = db.execute("SELECT password FROM Users").fetchone()[0]
+        self.assertEqual(hash_cost(stored), 5)
+
+        self.assertIsNone(login_to_account(db, "alice", "wrong"))
+        self.assertEqual(db.execute("SELECT password FROM Users").fetchone()[0], stored)
+        self.assertEqual(login_to_account(db, "alice", "pw"), 1)
+        upgraded = db.execute("SELECT password FROM Users").fetchone()[0]
+        self.assertEqual(hash_cost(upgraded), 4)
+        self.assertEqual(login_to_account(db, "alice", "pw"), 1)
+        self.assertEqual(db.execute("SELECT password FROM Users").fetchone()[0], upgraded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import io
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+from flask import Flask, jsonify
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.http_cache import StatCache, send_cached_bytes
+from src.recommenderapp.poster_pack import PosterPack, build_pack, index_path
+from src.recommenderapp.thumbnail_variants import VariantCache
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+warnings.filterwarnings("ignore")
+
+
+class TestPosterPack(unittest.TestCase):
+    """
+    Test cases for the packed poster store
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "thumbnails")
+        os.makedirs(self.source)
+        self.posters = {f"tt{i:07d}": os.urandom(100 + i) for i in range(25)}
+        for imdb_id, data in self.posters.items():
+            self.write(f"{imdb_id}.jpg", data)
+        self.write("notes.txt", b"not a poster")
+        self.pack_path = os.path.join(self.tmp.name, "posters.pack")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        """
+        Writes a file into the thumbnails directory
+        """
+        with open(os.path.join(self.source, name), "wb") as f:
+            f.write(data)
+
+    def test_build_and_lookup(self):
+        """
+        Every poster is found by imdb_id with its exact bytes and ETag
+        """
+        self.assertEqual(build_pack(self.source, self.pack_path), 25)
+        pack = PosterPack(self.pack_path)
+        self.assertEqual(len(pack), 25)
+        self.assertNotIn("notes", pack)
+        self.assertIsNone(pack.lookup("tt9999999"))
+        stat_cache = StatCache()
+        for imdb_id, data in self.posters.items():
+            view, etag = pack.lookup(imdb_id)
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(view.tobytes(), data)
+            # Same ETag as when the loose file is served
+            path = os.path.join(self.source, f"{imdb_id}.jpg")
+            self.assertEqual(etag, stat_cache.lookup(path)[2])
+            view.release()
+        pack.close()
+
+    def test_empty_directory(self):
+        """
+        An empty thumbnails directory gives an empty, usable pack
+        """
+        empty = os.path.join(self.tmp.name, "empty")
+        os.makedirs(empty)
+        build_pack(empty, self.pack_path)
+        pack = PosterPack(self.pack_path)
+        self.assertEqual(len(pack), 0)
+        self.assertIsNone(pack.lookup("tt0000001"))
+        pack.close()
+
+    def test_truncated_pack_is_rejected(self):
+        """
+        A pack that does not match its index is refused
+        """
+        build_pack(self.source, self.pack_path)
+        with open(self.pack_path, "r+b") as f:
+            f.truncate(10)
+        with self.assertRaises(ValueError):
+            PosterPack(self.pack_path)
+        self.assertTrue(os.path.exists(index_path(self.pack_path)))
+
+    def test_send_cached_bytes(self):
+        """
+        Packed posters get the same caching behaviour as loose files
+        """
+        build_pack(self.source, self.pack_path)
+        pack = PosterPack(self.pack_path)
+        app = Flask(__name__)
+
+        @app.route("/thumbnails/<imdb_id>.jpg")
+        def thumbnail(imdb_id):
+            packed = pack.lookup(imdb_id)
+            if packed is None:
+                return jsonify({"error": "Thumbnail not found"}), 404
+            return send_cached_bytes(*packed, mimetype="image/jpeg")
+
+        client = app.test_client()
+        response = client.get("/thumbnails/tt0000003.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.posters["tt0000003"])
+        self.assertTrue(response.cache_control.immutable)
+        etag = response.get_etag()[0]
+
+        response = client.get("/thumbnails/tt0000003.jpg", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(response.status_code, 304)
+        response = client.get("/thumbnails/tt0000003.jpg", headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, self.posters["tt0000003"][10:20])
+        self.assertEqual(client.get("/thumbnails/tt9999999.jpg").status_code, 404)
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_variants_from_pack(self):
+        """
+        Resized variants can be rendered from packed posters alone
+        """
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 450), (0, 0, 200)).save(buffer, "JPEG")
+        self.write("tt1000000.jpg", buffer.getvalue())
+        build_pack(self.source, self.pack_path)
+        os.remove(os.path.join(self.source, "tt1000000.jpg"))
+
+        cache = VariantCache(
+            self.source, os.path.join(self.tmp.name, "variants"), pack=PosterPack(self.pack_path)
+        )
+        directory, name, mimetype = cache.get("tt1000000.jpg", 92, "webp")
+        self.assertEqual(mimetype, "image/webp")
+        with Image.open(os.path.join(directory, name)) as image:
+            self.assertEqual(image.size, (92, 138))
+        with self.assertRaises(FileNotFoundError):
+            cache.get("tt9999999.jpg", 92)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.utils import MOVIES_CSV_PATH
+
+warnings.filterwarnings("ignore")
+
+APP_DIR = Path(__file__).resolve().parents[1] / "src" / "recommenderapp"
+
+CHECK_STARTUP = """
+import os
+import threading
+import wsgi
+from src.recommenderapp import app
+from src.prediction_scripts import item_based, text_based
+from src.recommenderapp import ai_recommender, io_pool, passwords, prefork, storage
+
+def loaded():
+    return [
+        item_based._BATCH_INDEX is not None,
+        text_based._TEXT_INDEX is not None,
+        ai_recommender._SEED_INDEX is not None,
+    ]
+
+assert wsgi.app is app.app
+assert {"/", "/search", "/thumbnails/<path:filename>"} <= {
+    rule.rule for rule in wsgi.app.url_map.iter_rules()
+}
+assert loaded() == [False, False, False], loaded()
+assert threading.active_count() == 1
+assert storage._STORAGE is None
+
+prefork.warm_up()
+assert loaded() == [True, True, True], loaded()
+assert os.path.exists(os.environ["SQLITE_PATH"])
+
+storage.get_storage()
+assert passwords.BCRYPT.run(lambda: 42) == 42
+prefork.reset_after_fork()
+assert storage._STORAGE is None
+assert passwords.BCRYPT._executor is None and passwords.BCRYPT.pending == 0
+assert passwords.BCRYPT.run(lambda: 42) == 42
+print("ok")
+"""
+
+
+@unittest.skipUnless(os.path.exists(MOVIES_CSV_PATH), "movies.csv is not available")
+class TestPrefork(unittest.TestCase):
+    """
+    Test cases for the production entry point
+    """
+
+    def test_startup_and_fork_hooks(self):
+        """
+        Building the app loads nothing and starts no threads; warm_up creates
+        the database and loads the shared data, and reset_after_fork drops the
+        per-process pools
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            result = subprocess.run(
+                [sys.executable, "-c", CHECK_STARTUP],
+                cwd=APP_DIR,
+                env={
+                    "SECRET_KEY": "test secret key",
+                    **os.environ,
+                    "SQLITE_PATH": os.path.join(tmp, "movies.db"),
+                },
+                capture_output=True,
+                text=True,
+                timeout=120,
+                check=False,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+import json
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+warnings.filterwarnings("ignore")
+
+
+class TestSessions(unittest.TestCase):
+    """
+    Test cases for the per-client login sessions
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.environ["SQLITE_PATH"] = os.path.join(cls.tmp.name, "movies.db")
+        os.environ.setdefault("SECRET_KEY", "test secret key")
+        from src.recommenderapp import storage
+        from src.recommenderapp.app import app
+
+        storage._STORAGE = None  # pylint: disable=protected-access
+        cls.app = app
+        for name in ("alice", "bob"):
+            app.test_client().post(
+                "/",
+                data=json.dumps({"email": f"{name}@example.com", "username": name, "password": "pw"}),
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        from src.recommenderapp import storage
+
+        storage._STORAGE = None  # pylint: disable=protected-access
+        del os.environ["SQLITE_PATH"]
+        cls.tmp.cleanup()
+
+    def login(self, name):
+        """
+        Returns a client logged in as `name`
+        """
+        client = self.app.test_client()
+        client.post("/log", data=json.dumps({"username": name, "password": "pw"}))
+        return client
+
+    def test_clients_have_their_own_user(self):
+        """
+        Two clients logged in at the same time each see their own user
+        """
+        alice, bob = self.login("alice"), self.login("bob")
+        self.assertEqual(alice.get("/getUserName").get_json(), "alice")
+        self.assertEqual(bob.get("/getUserName").get_json(), "bob")
+        self.assertEqual(alice.get("/getUserName").get_json(), "alice")
+
+    def anonymous_page(self):
+        """
+        Returns what a client without a session gets for /profile
+        """
+        return self.app.test_client().get("/profile").data
+
+    def test_sign_out_is_per_client(self):
+        """
+        Signing out one client leaves the others logged in
+        """
+        alice, bob = self.login("alice"), self.login("bob")
+        self.assertNotEqual(alice.get("/profile").data, self.anonymous_page())
+        alice.post("/out", data="{}")
+        self.assertEqual(alice.get("/profile").data, self.anonymous_page())
+        self.assertEqual(bob.get("/getUserName").get_json(), "bob")
+
+    def test_session_cookie(self):
+        """
+        The session is a signed, HttpOnly cookie that cannot be forged
+        """
+        cookie = self.login("alice").get_cookie("session")
+        self.assertIsNotNone(cookie)
+        self.assertTrue(cookie.http_only)
+
+        for value in ('{"user_id": 1}', cookie.value[:-2] + "xx"):
+            forged = self.app.test_client()
+            forged.set_cookie("session", value)
+            self.assertEqual(forged.get("/profile").data, self.anonymous_page())
+
+    def test_guest_cannot_pick_a_user(self):
+        """
+        Entering as a guest gives the guest identity, whatever the request says
+        """
+        with self.login("alice").session_transaction() as sess:
+            user_id = sess["user_id"]
+        client = self.app.test_client()
+        for body in ("{}", json.dumps({"guest": 1}), json.dumps({"guest": user_id})):
+            client.post("/guest", data=body)
+            with client.session_transaction() as sess:
+                self.assertEqual(sess["user_id"], "guest")
+
+    def test_secret_key_required(self):
+        """
+        Only the development server may run without SECRET_KEY, on a random key
+        """
+        from src.recommenderapp.app import create_app
+
+        with patch.dict(os.environ, {"SECRET_KEY": ""}):
+            with self.assertRaises(RuntimeError):
+                create_app()
+            keys = {create_app(dev_server=True).secret_key for _ in range(2)}
+        self.assertEqual(len(keys), 2)
+        self.assertNotIn("", keys)
+
+    def test_cors_origins(self):
+        """
+        Credentialed cross-origin requests are allowed from the listed origins only
+        """
+        from src.recommenderapp.app import create_app
+
+        with patch.dict(os.environ, {"CORS_ORIGINS": "*"}):
+            with self.assertRaises(RuntimeError):
+                create_app()
+        for origins, allowed in (
+            ("", None),
+            ("http://localhost:5173, https://app.example", "https://app.example"),
+        ):
+            with patch.dict(os.environ, {"CORS_ORIGINS": origins}):
+                client = create_app().test_client()
+            for origin in ("https://app.example", "https://evil.example"):
+                headers = client.get("/", headers={"Origin": origin}).headers
+                expected = origin if origin == allowed else None
+                self.assertEqual(headers.get("Access-Control-Allow-Origin"), expected)
+
+    def test_dev_server_allows_the_frontend(self):
+        """
+        Without CORS_ORIGINS only the development server accepts the frontend's dev origin
+        """
+        from src.recommenderapp.app import create_app
+
+        with patch.dict(os.environ):
+            os.environ.pop("CORS_ORIGINS", None)
+            clients = {dev: create_app(dev_server=dev).test_client() for dev in (False, True)}
+        for dev, client in clients.items():
+            headers = client.get("/", headers={"Origin": "http://localhost:5173"}).headers
+            expected = "http://localhost:5173" if dev else None
+            self.assertEqual(headers.get("Access-Control-Allow-Origin"), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,393 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parent))
+import mysql_standin
+from src.recommenderapp.storage import (
+    MySQLStorage,
+    SQLiteStorage,
+    create_storage,
+    to_format_paramstyle,
+    to_mysql_dialect,
+)
+from src.recommenderapp.titles import index_movie_titles
+from src.recommenderapp.utils import add_to_watched_history, create_account, init_db
+
+warnings.filterwarnings("ignore")
+
+
+def create_unindexed_db(path, movies):
+    """
+    Creates a database whose Movies are not in MovieTitles yet, as on
+    databases created before the title index existed
+    """
+    init_db(db_name=path, use_template=False)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany("INSERT INTO Movies (idMovies, name, imdb_id) VALUES (?, ?, ?)", movies)
+    conn.close()
+
+
+def indexed_titles(conn):
+    """
+    Returns the (movie_id, name_norm) rows of MovieTitles
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT movie_id, name_norm FROM MovieTitles ORDER BY movie_id")
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def mysql_available():
+    """
+    True when the MySQL driver is installed and a server is listening
+    """
+    try:
+        import mysql.connector  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    try:
+        with socket.create_connection(
+            (os.getenv("DB_HOST", "127.0.0.1"), int(os.getenv("DB_PORT", "3306"))), 1
+        ):
+            return True
+    except OSError:
+        return False
+
+
+class TestParamstyle(unittest.TestCase):
+    """
+    Test cases for translating qmark queries to MySQL
+    """
+
+    def test_placeholders(self):
+        """
+        Question marks become %s
+        """
+        self.assertEqual(
+            to_format_paramstyle("SELECT 1 FROM t WHERE a = ? AND b = ?"),
+            "SELECT 1 FROM t WHERE a = %s AND b = %s",
+        )
+
+    def test_literals_untouched(self):
+        """
+        Question marks inside literals are kept and percent signs escaped
+        """
+        self.assertEqual(
+            to_format_paramstyle("SELECT '?' FROM t WHERE a LIKE '50%' AND b = ?"),
+            "SELECT '?' FROM t WHERE a LIKE '50%%' AND b = %s",
+        )
+
+    def test_insert_or_ignore(self):
+        """
+        SQLite's INSERT OR IGNORE becomes MySQL's INSERT IGNORE
+        """
+        self.assertEqual(
+            to_mysql_dialect("\n  insert or ignore INTO t (a) VALUES (?)"),
+            "\n  insert IGNORE INTO t (a) VALUES (?)",
+        )
+        self.assertEqual(
+            to_mysql_dialect("SELECT 'INSERT OR IGNORE' FROM t"), "SELECT 'INSERT OR IGNORE' FROM t"
+        )
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """
+    Test cases for the SQLite backend
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(
+            os.environ,
+            {
+                "MOVIES_SQL_PATH": os.path.join(self.tmp.name, "missing.sql"),
+                "MOVIES_CSV_PATH": os.path.join(self.tmp.name, "missing.csv"),
+            },
+        )
+        self.env.start()
+        self.storage = SQLiteStorage(os.path.join(self.tmp.name, "movies.db"))
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_connect_initializes_schema(self):
+        """
+        The first connection creates the database in WAL mode
+        """
+        conn = self.storage.connect()
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        finally:
+            self.storage.release(conn)
+        self.assertEqual(mode, "wal")
+        self.assertIn("Users", tables)
+
+    def test_utils_through_storage(self):
+        """
+        The utils data functions work on storage connections
+        """
+        conn = self.storage.connect()
+        try:
+            conn.execute("INSERT INTO Movies (idMovies, name, imdb_id) VALUES (1, 'Heat', 'tt0113277')")
+            conn.commit()
+            create_account(conn, "a@test.com", "a", "pw")
+            added, _ = add_to_watched_history(conn, 1, "tt0113277")
+        finally:
+            self.storage.release(conn)
+        self.assertTrue(added)
+
+    def test_title_index_backfilled_per_database(self):
+        """
+        Every database gets its missing title index filled on first use
+        """
+        movies = {"a.db": (1, "Heat (1995)", "tt0113277"), "b.db": (2, "Alien (1979)", "tt0078748")}
+        expected = {"a.db": [(1, "heat")], "b.db": [(2, "alien")]}
+        for name, movie in movies.items():
+            path = os.path.join(self.tmp.name, name)
+            create_unindexed_db(path, [movie])
+            storage = SQLiteStorage(path)
+            conn = storage.connect()
+            try:
+                self.assertEqual(indexed_titles(conn), expected[name])
+            finally:
+                storage.release(conn)
+
+    def test_concurrent_writers(self):
+        """
+        Concurrent writers on separate connections do not lose rows
+        """
+        conn = self.storage.connect()
+        conn.execute("CREATE TABLE Bench (id INTEGER PRIMARY KEY, worker INTEGER)")
+        conn.commit()
+        self.storage.release(conn)
+
+        def write(worker):
+            db = self.storage.connect()
+            try:
+                for _ in range(50):
+                    db.execute("INSERT INTO Bench (worker) VALUES (?)", (worker,))
+                    db.commit()
+            finally:
+                self.storage.release(db)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        conn = self.storage.connect()
+        count = conn.execute("SELECT COUNT(*) FROM Bench").fetchone()[0]
+        self.storage.release(conn)
+        self.assertEqual(count, 200)
+
+
+class TestCreateStorage(unittest.TestCase):
+    """
+    Test cases for backend selection
+    """
+
+    def test_default_is_sqlite(self):
+        """
+        SQLite is used unless DB_BACKEND says otherwise
+        """
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsInstance(create_storage(), SQLiteStorage)
+
+    def test_mysql_backend(self):
+        """
+        DB_BACKEND=mysql builds a lazily connected pool
+        """
+        with patch.dict(os.environ, {"DB_BACKEND": "mysql", "DB_POOL_SIZE": "64"}):
+            storage = create_storage()
+        self.assertIsInstance(storage, MySQLStorage)
+        self.assertEqual(storage.pool_size, MySQLStorage.MAX_POOL_SIZE)
+
+    def test_unknown_backend(self):
+        """
+        Unknown backends are rejected
+        """
+        with self.assertRaises(ValueError):
+            create_storage("oracle")
+
+
+class TestMySQLStandIn(unittest.TestCase):
+    """
+    Test cases for the MySQL backend against the stand-in driver (see mysql_standin.py)
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = patch.dict(
+            os.environ,
+            {
+                "MOVIES_SQL_PATH": os.path.join(self.tmp.name, "missing.sql"),
+                "MOVIES_CSV_PATH": os.path.join(self.tmp.name, "missing.csv"),
+            },
+        )
+        self.env.start()
+        self.driver = mysql_standin.install()
+        self.driver.start()
+        database = os.path.join(self.tmp.name, "mysql.db")
+        init_db(db_name=database, use_template=False)
+        self.storage = MySQLStorage(database=database, pool_size=2, pool_timeout=5)
+
+    def tearDown(self):
+        self.driver.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_utils_through_storage(self):
+        """
+        The utils data functions send valid format-paramstyle queries
+        """
+        conn = self.storage.connect()
+        try:
+            conn.execute(
+                "INSERT INTO Movies (idMovies, name, imdb_id) VALUES (?, ?, ?)",
+                (1, "Heat (1995)", "tt0113277"),
+            )
+            conn.commit()
+            create_account(conn, "a@test.com", "a", "pw")
+            added, _ = add_to_watched_history(conn, 1, "tt0113277")
+        finally:
+            self.storage.release(conn)
+        self.assertTrue(added)
+
+    def test_insert_or_ignore_skips_duplicates(self):
+        """
+        Re-indexing a movie is ignored instead of failing on the duplicate key
+        """
+        conn = self.storage.connect()
+        try:
+            cursor = conn.cursor()
+            index_movie_titles(cursor, [(1, "Heat (1995)"), (2, "Alien (1979)")])
+            index_movie_titles(cursor, [(1, "Heat (1995)"), (3, "Aliens (1986)")])
+            conn.commit()
+            cursor.execute("SELECT movie_id FROM MovieTitles ORDER BY movie_id")
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 2, 3])
+            with self.assertRaises(mysql_standin.ProgrammingError):
+                # pylint: disable-next=protected-access
+                cursor._cursor.execute("INSERT OR IGNORE INTO MovieTitles VALUES (4, 'x', NULL)")
+        finally:
+            self.storage.release(conn)
+
+    def test_title_index_backfilled(self):
+        """
+        Creating the pool fills a missing title index without holding a pool slot
+        """
+        database = os.path.join(self.tmp.name, "old.db")
+        create_unindexed_db(database, [(1, "Heat (1995)", "tt0113277")])
+        storage = MySQLStorage(database=database, pool_size=1, pool_timeout=5)
+        conn = storage.connect()
+        try:
+            self.assertEqual(indexed_titles(conn), [(1, "heat")])
+        finally:
+            storage.release(conn)
+
+    def test_pool_blocks_until_release(self):
+        """
+        Checkouts beyond the pool size wait for a release instead of exhausting the pool
+        """
+        first = self.storage.connect()
+        second = self.storage.connect()
+        timer = threading.Timer(0.2, self.storage.release, args=(first,))
+        timer.start()
+        third = self.storage.connect()
+        self.storage.release(second)
+        self.storage.release(third)
+        timer.join()
+
+    def test_pool_timeout(self):
+        """
+        A checkout gives up after pool_timeout seconds
+        """
+        self.storage.pool_timeout = 0.1
+        held = [self.storage.connect(), self.storage.connect()]
+        with self.assertRaises(TimeoutError):
+            self.storage.connect()
+        for conn in held:
+            self.storage.release(conn)
+        self.storage.release(self.storage.connect())
+
+
+# CI sets MYSQL_TESTS=required so that a missing server fails instead of skipping
+@unittest.skipUnless(
+    mysql_available() or os.getenv("MYSQL_TESTS") == "required", "MySQL server not available"
+)
+class TestMySQLStorage(unittest.TestCase):
+    """
+    Test cases for the pooled MySQL backend against the init.sql schema
+    """
+
+    def setUp(self):
+        self.storage = MySQLStorage(
+            host=os.getenv("DB_HOST", "127.0.0.1"),
+            password=os.getenv("DB_PASSWORD", "root"),
+            database=os.getenv("DB_DATABASE", "testDB"),
+            pool_size=2,
+            pool_timeout=5,
+        )
+
+    def test_qmark_queries(self):
+        """
+        qmark queries from utils.py run unchanged
+        """
+        conn = self.storage.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM Movies WHERE imdb_id = ?", ["tt0076759"])
+            self.assertEqual(cursor.fetchone()[0], "Star Wars (1977)")
+        finally:
+            self.storage.release(conn)
+
+    def test_pool_blocks_until_release(self):
+        """
+        Checking out more connections than the pool holds waits for a release
+        """
+        first = self.storage.connect()
+        second = self.storage.connect()
+        timer = threading.Timer(0.2, self.storage.release, args=(first,))
+        timer.start()
+        third = self.storage.connect()
+        self.storage.release(second)
+        self.storage.release(third)
+        timer.join()
+
+    def test_insert_or_ignore(self):
+        """
+        INSERT OR IGNORE statements run as INSERT IGNORE
+        """
+        conn = self.storage.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM MovieTitles WHERE movie_id IN (11, 12)")
+            index_movie_titles(cursor, [(11, "Star Wars (1977)")])
+            index_movie_titles(cursor, [(11, "Star Wars (1977)"), (12, "Finding Nemo (2003)")])
+            cursor.execute("SELECT COUNT(*) FROM MovieTitles WHERE movie_id IN (11, 12)")
+            self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            conn.rollback()
+            self.storage.release(conn)
+
+
+if __name__ == "__main__":
+    unittest.main()
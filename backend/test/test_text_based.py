@@ -0,0 +1,182 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import math
+import random
+import statistics
+import sys
+import time
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.prediction_scripts.text_based import (
+    FIELD_WEIGHTS,
+    Bm25Index,
+    query_terms,
+    tokenize,
+)
+
+warnings.filterwarnings("ignore")
+
+MOVIES = pd.DataFrame(
+    [
+        ("Heat (1995)", "Action|Crime|Thriller", "tt0113277", "Michael Mann", "Al Pacino, Robert De Niro", 8.3),
+        ("Inception (2010)", "Action|Science Fiction|Adventure", "tt1375666", "Christopher Nolan", "Leonardo DiCaprio, Tom Hardy", 8.8),
+        ("The Dark Knight (2008)", "Drama|Action|Crime|Thriller", "tt0468569", "Christopher Nolan", "Christian Bale, Heath Ledger", 9.0),
+        ("Airplane! (1980)", "Comedy", "tt0080339", "Jim Abrahams", "Robert Hays, Julie Hagerty", 7.7),
+        ("The Conjuring (2013)", "Horror|Thriller", "tt1457767", "James Wan", "Vera Farmiga, Patrick Wilson", 7.5),
+        ("Ocean's Eleven (2001)", "Thriller|Crime", "tt0240772", "Steven Soderbergh", "George Clooney, Brad Pitt", 7.8),
+        ("Memento (2000)", "Mystery|Thriller", "tt0209144", "Christopher Nolan", "Guy Pearce, Carrie-Anne Moss", "No Rating Found"),
+        ("Amélie (2001)", "Comedy|Romance", "tt0211915", "Jean-Pierre Jeunet", "Audrey Tautou", 8.3),
+    ],
+    columns=["title", "genres", "imdb_id", "director", "actors", "imdb_ratings"],
+)
+
+
+def naive_bm25(movies, query, k1=1.2, b=0.75):
+    """
+    Textbook BM25 with field weights, one movie at a time
+    """
+    docs = []
+    for _, row in movies.iterrows():
+        counts = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for word in tokenize(row[field] if isinstance(row[field], str) else ""):
+                counts[word] = counts.get(word, 0.0) + weight
+        docs.append(counts)
+    lengths = [sum(doc.values()) for doc in docs]
+    average = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in query_terms(query):
+            df = sum(term in other for other in docs)
+            if term not in doc:
+                continue
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average))
+        scores.append(score)
+    return np.array(scores)
+
+
+def synthetic_catalogue(size, rng):
+    """
+    Builds a random catalogue with realistic field sizes
+    """
+    words = [f"word{i}" for i in range(3000)]
+    people = [f"First{i} Last{i}" for i in range(5000)]
+    genres = ["Action", "Comedy", "Drama", "Horror", "Romance", "Science Fiction", "Thriller"]
+    rows = []
+    for i in range(size):
+        rows.append(
+            (
+                " ".join(rng.sample(words, rng.randint(1, 4))) + f" ({rng.randint(1950, 2024)})",
+                "|".join(rng.sample(genres, rng.randint(1, 3))),
+                f"tt{i:07d}",
+                rng.choice(people),
+                ", ".join(rng.sample(people, 5)),
+                round(rng.uniform(1, 9), 1),
+            )
+        )
+    return pd.DataFrame(rows, columns=MOVIES.columns)
+
+
+class TestBm25Index(unittest.TestCase):
+    """
+    Test cases for the local free-text retrieval
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = Bm25Index(MOVIES)
+
+    def titles(self, query, top_k=10):
+        """
+        Returns the titles found for a query
+        """
+        return self.index.recommend(query, top_k)[0]
+
+    def test_query_terms(self):
+        """
+        Stopwords are dropped and genre aliases expanded
+        """
+        self.assertEqual(query_terms("A great Sci-Fi movie"), ["sci", "science", "fi", "fiction"])
+        self.assertEqual(query_terms("something funny"), ["funny", "comedy"])
+        self.assertEqual(tokenize("Amélie"), ["amelie"])
+
+    def test_fields(self):
+        """
+        Genres, directors, actors and titles are all searchable
+        """
+        self.assertEqual(self.titles("funny romantic"), ["Amélie (2001)", "Airplane! (1980)"])
+        self.assertEqual(self.titles("scary", 1), ["The Conjuring (2013)"])
+        self.assertCountEqual(
+            self.titles("dark sci-fi", 2), ["The Dark Knight (2008)", "Inception (2010)"]
+        )
+        self.assertEqual(self.titles("george clooney heist"), ["Ocean's Eleven (2001)"])
+        self.assertEqual(self.titles("amelie"), ["Amélie (2001)"])
+
+    def test_ties_broken_by_rating(self):
+        """
+        Equally relevant movies are ordered by rating, unrated ones last
+        """
+        movies = pd.DataFrame(
+            [
+                (f"Film {i} (2000)", "Drama", f"tt000000{i}", "Christopher Nolan", "Actor A", rating)
+                for i, rating in enumerate([7.0, "No Rating Found", 9.0, 7.0])
+            ],
+            columns=MOVIES.columns,
+        )
+        self.assertEqual(
+            Bm25Index(movies).recommend("christopher nolan")[0],
+            ["Film 2 (2000)", "Film 0 (2000)", "Film 3 (2000)", "Film 1 (2000)"],
+        )
+
+    def test_no_match(self):
+        """
+        Queries without a known term return nothing
+        """
+        self.assertEqual(self.index.recommend("zzz qqq"), ([], [], []))
+        self.assertEqual(self.index.recommend("the movie"), ([], [], []))
+
+    def test_scores_match_textbook_bm25(self):
+        """
+        The CSR index computes the same scores as a direct implementation
+        """
+        movies = synthetic_catalogue(200, random.Random(43))
+        index = Bm25Index(movies)
+        for query in ["word1 word2 comedy", "first7 last7", "science fiction drama word10"]:
+            np.testing.assert_allclose(index.scores(query), naive_bm25(movies, query), rtol=1e-5)
+
+    def test_query_latency(self):
+        """
+        Top-k retrieval over a 20k movie catalogue stays well under 10ms
+        """
+        rng = random.Random(10)
+        index = Bm25Index(synthetic_catalogue(20000, rng))
+        queries = [
+            f"word{rng.randint(0, 2999)} {rng.choice(['action', 'scary', 'funny'])} last{rng.randint(0, 4999)}"
+            for _ in range(50)
+        ]
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            top = index.search(query, 10)
+            timings.append(time.perf_counter() - started)
+            self.assertLessEqual(len(top), 10)
+        self.assertLess(statistics.median(timings), 0.010)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position,protected-access
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.thumbnail_variants import (
+    VariantCache,
+    negotiate_format,
+    snap_width,
+)
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+warnings.filterwarnings("ignore")
+
+
+class TestVariantHelpers(unittest.TestCase):
+    """
+    Test cases for width snapping and format negotiation
+    """
+
+    def test_snap_width(self):
+        """
+        Widths round up to a supported size, capped at the largest
+        """
+        self.assertEqual(snap_width(1), 92)
+        self.assertEqual(snap_width(92), 92)
+        self.assertEqual(snap_width(100), 154)
+        self.assertEqual(snap_width(5000), 500)
+
+    def test_negotiate_format(self):
+        """
+        WebP is used when accepted, unless a format is requested explicitly
+        """
+        self.assertEqual(negotiate_format("image/avif,image/webp,*/*"), "webp")
+        self.assertEqual(negotiate_format("image/*"), "jpeg")
+        self.assertEqual(negotiate_format(None), "jpeg")
+        self.assertEqual(negotiate_format("image/webp", "jpeg"), "jpeg")
+        self.assertEqual(negotiate_format("image/*", "gif"), "jpeg")
+
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class TestVariantCache(unittest.TestCase):
+    """
+    Test cases for the resized thumbnail cache
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "thumbnails")
+        os.makedirs(self.source)
+        Image.new("RGB", (600, 900), (200, 30, 30)).save(
+            os.path.join(self.source, "tt0000001.jpg"), "JPEG", quality=95
+        )
+        self.cache = VariantCache(self.source, os.path.join(self.tmp.name, "variants"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resize_jpeg_and_webp(self):
+        """
+        Variants are scaled to the snapped width and encoded as requested
+        """
+        for fmt, expected in (("jpeg", "JPEG"), ("webp", "WEBP")):
+            directory, name, mimetype = self.cache.get("tt0000001.jpg", 90, fmt)
+            path = os.path.join(directory, name)
+            with Image.open(path) as image:
+                self.assertEqual(image.format, expected)
+                self.assertEqual(image.size, (92, 138))
+                if fmt == "jpeg":
+                    self.assertTrue(image.info.get("progressive"))
+            self.assertEqual(mimetype, f"image/{fmt}")
+            self.assertLess(
+                os.path.getsize(path), os.path.getsize(os.path.join(self.source, "tt0000001.jpg"))
+            )
+
+    def test_variant_rendered_once(self):
+        """
+        Concurrent requests for the same variant render it only once
+        """
+        render = self.cache._render
+        calls = []
+
+        def slow_render(*args):
+            calls.append(args)
+            time.sleep(0.1)
+            render(*args)
+
+        results = []
+        with patch.object(self.cache, "_render", side_effect=slow_render):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(self.cache.get("tt0000001.jpg", 154, "webp"))
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.cache.get("tt0000001.jpg", 154, "webp")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.cache._locks, {})
+
+    def test_missing_poster(self):
+        """
+        Unknown posters raise FileNotFoundError; paths cannot escape the directory
+        """
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get("tt9999999.jpg", 92)
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get("../thumbnails/../secret.jpg", 92)
+
+    def test_undecodable_poster_falls_back(self):
+        """
+        A broken poster is served as-is rather than failing the request
+        """
+        with open(os.path.join(self.source, "broken.jpg"), "wb") as f:
+            f.write(b"not a jpeg")
+        self.assertEqual(
+            self.cache.get("broken.jpg", 92), (self.source, "broken.jpg", "image/jpeg")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
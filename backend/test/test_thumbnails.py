@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.thumbnails import (
+    COMPLETE_MARKER,
+    ThumbnailDownloadError,
+    download_file,
+    download_thumbnails,
+)
+
+warnings.filterwarnings("ignore")
+
+
+def make_fixture_zip():
+    """
+    Builds a small archive with nested posters and some non-image members
+    """
+    rng = random.Random(36)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(40):
+            archive.writestr(f"posters/part{i % 3}/tt{i:07d}.jpg", rng.randbytes(2000 + i))
+        archive.writestr("posters/README.txt", "not an image")
+        archive.writestr("posters/movies.csv", "title\nMovie\n")
+    return buffer.getvalue()
+
+
+FIXTURE = make_fixture_zip()
+FIXTURE_SHA256 = hashlib.sha256(FIXTURE).hexdigest()
+
+
+class FakeKaggle(BaseHTTPRequestHandler):
+    """
+    Serves the fixture archive with Range support, optionally dropping the
+    connection part way through
+    """
+
+    ranges_seen = []
+    cut_after = None
+    honour_range = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serves the whole archive, or the requested byte range
+        """
+        requested = self.headers.get("Range")
+        FakeKaggle.ranges_seen.append(requested)
+        start = 0
+        if requested and FakeKaggle.honour_range:
+            start = int(requested.split("=")[1].split("-")[0])
+            if start >= len(FIXTURE):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(FIXTURE)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(FIXTURE) - 1}/{len(FIXTURE)}")
+        else:
+            self.send_response(200)
+        body = FIXTURE[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if FakeKaggle.cut_after is not None:
+            cut, FakeKaggle.cut_after = FakeKaggle.cut_after, None
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestThumbnails(unittest.TestCase):
+    """
+    Test cases for the streaming thumbnail download
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeKaggle)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/posters.zip"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeKaggle.ranges_seen = []
+        FakeKaggle.cut_after = None
+        FakeKaggle.honour_range = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.zip_path = os.path.join(self.tmp.name, "posters.zip")
+        self.target = os.path.join(self.tmp.name, "thumbnails")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        """
+        Returns the bytes of a file
+        """
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_download_and_extract_jpgs(self):
+        """
+        Only the .jpg members are extracted, flat into the target
+        """
+        download_thumbnails(self.target, self.url, self.zip_path, sha256=FIXTURE_SHA256)
+        files = sorted(os.listdir(self.target))
+        self.assertEqual(files, sorted([COMPLETE_MARKER] + [f"tt{i:07d}.jpg" for i in range(40)]))
+        with zipfile.ZipFile(io.BytesIO(FIXTURE)) as archive:
+            self.assertEqual(
+                self.read(os.path.join(self.target, "tt0000007.jpg")),
+                archive.read("posters/part1/tt0000007.jpg"),
+            )
+        self.assertFalse(os.path.exists(self.zip_path))
+
+        # A completed install is not downloaded again
+        download_thumbnails(self.target, self.url, self.zip_path)
+        self.assertEqual(len(FakeKaggle.ranges_seen), 1)
+
+    def test_resume_from_partial_file(self):
+        """
+        An existing .part file is continued with a Range request
+        """
+        with open(f"{self.zip_path}.part", "wb") as f:
+            f.write(FIXTURE[:1000])
+        download_file(self.url, self.zip_path, sha256=FIXTURE_SHA256)
+        self.assertEqual(FakeKaggle.ranges_seen, ["bytes=1000-"])
+        self.assertEqual(self.read(self.zip_path), FIXTURE)
+
+    def test_resume_of_complete_part_file(self):
+        """
+        A 416 for a .part file that is already complete finalizes it
+        """
+        with open(f"{self.zip_path}.part", "wb") as f:
+            f.write(FIXTURE)
+        download_file(self.url, self.zip_path, sha256=FIXTURE_SHA256)
+        self.assertEqual(FakeKaggle.ranges_seen, [f"bytes={len(FIXTURE)}-"])
+        self.assertEqual(self.read(self.zip_path), FIXTURE)
+        self.assertFalse(os.path.exists(f"{self.zip_path}.part"))
+
+    def test_resume_of_oversized_part_file(self):
+        """
+        A 416 for a .part file longer than the archive discards it
+        """
+        with open(f"{self.zip_path}.part", "wb") as f:
+            f.write(FIXTURE + b"trailing")
+        with self.assertRaises(ThumbnailDownloadError):
+            download_file(self.url, self.zip_path)
+        self.assertFalse(os.path.exists(f"{self.zip_path}.part"))
+
+    def test_resume_after_dropped_connection(self):
+        """
+        A connection dropped mid-stream is resumed where it stopped
+        """
+        FakeKaggle.cut_after = 5000
+        download_file(
+            self.url, self.zip_path, sha256=FIXTURE_SHA256, backoff=0, chunk_size=1000
+        )
+        self.assertEqual(FakeKaggle.ranges_seen, [None, "bytes=5000-"])
+        self.assertEqual(self.read(self.zip_path), FIXTURE)
+
+    def test_server_without_range_support(self):
+        """
+        A 200 reply to a Range request restarts the file from scratch
+        """
+        FakeKaggle.honour_range = False
+        with open(f"{self.zip_path}.part", "wb") as f:
+            f.write(b"garbage")
+        download_file(self.url, self.zip_path, sha256=FIXTURE_SHA256)
+        self.assertEqual(self.read(self.zip_path), FIXTURE)
+
+    def test_checksum_mismatch(self):
+        """
+        A corrupt download is rejected and discarded
+        """
+        with self.assertRaises(ThumbnailDownloadError):
+            download_file(self.url, self.zip_path, sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.zip_path))
+        self.assertFalse(os.path.exists(f"{self.zip_path}.part"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import sqlite3
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.titles import (
+    TitleResolver,
+    create_title_table,
+    ensure_title_index,
+    split_title,
+)
+
+warnings.filterwarnings("ignore")
+
+MOVIES = [
+    (1, "Star Wars (1977)", "tt0076759"),
+    (2, "Star Wars: The Clone Wars (2008)", "tt1185834"),
+    (3, "Amélie (2001)", "tt0211915"),
+    (4, "Matrix, The (1999)", "tt0133093"),
+    (5, "Little Women (1994)", "tt0110367"),
+    (6, "Little Women (2019)", "tt3281548"),
+    (7, "Fast & Furious (2009)", "tt1013752"),
+]
+
+
+class CountingConnection:
+    """
+    sqlite3 connection wrapper counting the executed statements
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = []
+
+    def cursor(self):
+        """
+        Returns a cursor recording its queries
+        """
+        outer = self
+
+        class Cursor:
+            """
+            Cursor proxy
+            """
+
+            def __init__(self):
+                self.cursor = outer.conn.cursor()
+
+            def execute(self, query, params=()):
+                """
+                Records and runs a query
+                """
+                outer.queries.append(query)
+                return self.cursor.execute(query, params)
+
+            def __getattr__(self, name):
+                return getattr(self.cursor, name)
+
+        return Cursor()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+class TestTitleResolver(unittest.TestCase):
+    """
+    Test cases for the batched title resolver
+    """
+
+    def setUp(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE Movies (idMovies INTEGER PRIMARY KEY, name TEXT, imdb_id TEXT)")
+        conn.executemany("INSERT INTO Movies VALUES (?, ?, ?)", MOVIES)
+        # A database created before MovieTitles existed, as storage.py prepares it
+        create_title_table(conn.cursor())
+        ensure_title_index(conn)
+        self.db = CountingConnection(conn)
+        self.fallback_calls = []
+        self.resolver = TitleResolver(max_entries=8, fallback=self.fallback)
+
+    def fallback(self, title):
+        """
+        Stand-in for the in-memory search index
+        """
+        self.fallback_calls.append(title)
+        return "tt0000001" if title == "Search Only" else None
+
+    def test_split_title(self):
+        """
+        Case, accents, punctuation, years and trailing articles are ignored
+        """
+        self.assertEqual(split_title("Amélie (2001)"), ("amelie", 2001))
+        self.assertEqual(split_title("Matrix, The (1999)"), ("the matrix", 1999))
+        self.assertEqual(split_title("  THE MATRIX "), ("the matrix", None))
+        self.assertEqual(split_title("Fast & Furious"), ("fast and furious", None))
+        self.assertEqual(split_title("Star Wars: The Clone Wars"), ("star wars the clone wars", None))
+
+    def test_batch_resolves_with_one_query(self):
+        """
+        All titles resolve in order with a single lookup query
+        """
+        titles = ["The Matrix", "amelie", "Star Wars", "Fast and Furious", "Unknown Film"]
+        ids = self.resolver.resolve(self.db, titles)
+        self.assertEqual(ids, ["tt0133093", "tt0211915", "tt0076759", "tt1013752", None])
+        lookups = [q for q in self.db.queries if "IN (" in q]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(self.fallback_calls, ["Unknown Film"])
+
+    def test_exact_name_beats_prefix(self):
+        """
+        "Star Wars" is not resolved to a longer title sharing its prefix
+        """
+        self.assertEqual(
+            self.resolver.resolve(self.db, ["Star Wars: The Clone Wars", "Star Wars"]),
+            ["tt1185834", "tt0076759"],
+        )
+
+    def test_year_disambiguates(self):
+        """
+        The year given with a title picks between movies of the same name
+        """
+        ids = self.resolver.resolve(
+            self.db, ["Little Women (2019)", "Little Women (1994)", "Little Women"]
+        )
+        self.assertEqual(ids, ["tt3281548", "tt0110367", "tt0110367"])
+
+    def test_fallback_and_cache(self):
+        """
+        Unresolved titles use the fallback, and repeats are served from the LRU
+        """
+        first = self.resolver.resolve(self.db, ["Search Only", "Star Wars", "Nothing"])
+        self.assertEqual(first, ["tt0000001", "tt0076759", None])
+        queries = len(self.db.queries)
+        second = self.resolver.resolve(self.db, ["star wars", "Nothing", "SEARCH ONLY"])
+        self.assertEqual(second, ["tt0076759", None, "tt0000001"])
+        self.assertEqual(len(self.db.queries), queries)
+        self.assertEqual(self.fallback_calls, ["Search Only", "Nothing"])
+
+    def test_lru_is_bounded(self):
+        """
+        The cache evicts the least recently used titles
+        """
+        self.resolver.resolve(self.db, [f"Film {i}" for i in range(20)])
+        self.assertEqual(len(self.resolver._entries), 8)  # pylint: disable=protected-access
+        self.assertEqual(self.resolver.resolve(self.db, []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
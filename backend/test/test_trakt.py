@@ -0,0 +1,150 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp.trakt import TrendingStore
+
+warnings.filterwarnings("ignore")
+
+TRENDING = [
+    {"watchers": 10, "movie": {"title": f"Movie {i}", "ids": {"imdb": f"tt{i:07d}"}}}
+    for i in range(15)
+]
+
+
+class FakeTrakt(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the Trakt trending endpoint with ETag support
+    """
+
+    requests_seen = []
+    failures = 0
+    etag = '"v1"'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serves the trending list, honouring If-None-Match
+        """
+        FakeTrakt.requests_seen.append(dict(self.headers))
+        if FakeTrakt.failures:
+            FakeTrakt.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == FakeTrakt.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(TRENDING).encode()
+        self.send_response(200)
+        self.send_header("ETag", FakeTrakt.etag)
+        self.send_header("Last-Modified", "Mon, 06 Jan 2025 09:00:00 GMT")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestTrendingStore(unittest.TestCase):
+    """
+    Test cases for the cached Trakt trending store
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTrakt)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/movies/trending"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeTrakt.requests_seen = []
+        FakeTrakt.failures = 0
+        FakeTrakt.etag = '"v1"'
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "trending.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, **kwargs):
+        """
+        Builds a store pointed at the fake server
+        """
+        return TrendingStore(path=self.path, url=self.url, client_id="id", backoff=0.01, **kwargs)
+
+    def test_empty_before_refresh(self):
+        """
+        Reading an empty store makes no request
+        """
+        self.assertEqual(self.make_store().movies(), [])
+        self.assertEqual(FakeTrakt.requests_seen, [])
+
+    def test_refresh_stores_top_ten(self):
+        """
+        A refresh stores the top 10 titles for every reader
+        """
+        self.assertTrue(self.make_store().refresh())
+        movies = self.make_store().movies()
+        self.assertEqual(len(movies), 10)
+        self.assertEqual(movies[0], {"title": "Movie 0", "imdb_id": "tt0000000"})
+
+    def test_conditional_refresh(self):
+        """
+        Unchanged data is revalidated with If-None-Match and a 304
+        """
+        store = self.make_store()
+        store.refresh()
+        self.assertFalse(store.refresh())
+        self.assertEqual(FakeTrakt.requests_seen[-1]["If-None-Match"], '"v1"')
+        self.assertIn("If-Modified-Since", FakeTrakt.requests_seen[-1])
+        self.assertEqual(len(store.movies()), 10)
+        FakeTrakt.etag = '"v2"'
+        self.assertTrue(store.refresh())
+
+    def test_retry_with_backoff(self):
+        """
+        Transient failures are retried
+        """
+        FakeTrakt.failures = 2
+        self.assertTrue(self.make_store(retries=3).refresh())
+        self.assertEqual(len(FakeTrakt.requests_seen), 3)
+
+    def test_gives_up_after_retries(self):
+        """
+        Persistent failures raise and keep the previous data
+        """
+        store = self.make_store(retries=1)
+        store.refresh()
+        FakeTrakt.failures = 5
+        with self.assertRaises(requests.RequestException):
+            store.refresh()
+        self.assertEqual(len(store.movies()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: bingesuggest-next
+"""
+
+# pylint: disable=wrong-import-position
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.recommenderapp import worker
+from src.recommenderapp.leader import LeaderLock
+from src.recommenderapp.storage import SQLiteStorage
+
+warnings.filterwarnings("ignore")
+
+
+class FakeScheduler:
+    """
+    Scheduler double recording whether it is running
+    """
+
+    running = []
+
+    def __init__(self, lock):
+        self.lock = lock
+
+    def start(self):
+        """
+        Marks this scheduler as running
+        """
+        FakeScheduler.running.append(self.lock.owner)
+
+    def shutdown(self, wait=True):  # pylint: disable=unused-argument
+        """
+        Marks this scheduler as stopped
+        """
+        FakeScheduler.running.remove(self.lock.owner)
+
+
+class TestLeaderLock(unittest.TestCase):
+    """
+    Test cases for leader election through the lock row
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = SQLiteStorage(os.path.join(self.tmp.name, "movies.db"))
+        self.first = LeaderLock(self.storage, lease=0.5, owner="first")
+        self.second = LeaderLock(self.storage, lease=0.5, owner="second")
+        self.first.initialize()
+        self.second.initialize()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_single_leader(self):
+        """
+        Only one process holds the lease; the holder can renew it
+        """
+        self.assertTrue(self.first.acquire())
+        self.assertFalse(self.second.acquire())
+        self.assertTrue(self.first.acquire())
+        self.assertTrue(self.first.held())
+        self.assertFalse(self.second.held())
+
+    def test_expired_lease_is_taken_over(self):
+        """
+        A leader that stops renewing loses the lease once it expires
+        """
+        self.assertTrue(self.first.acquire())
+        time.sleep(0.6)
+        self.assertFalse(self.first.held())
+        self.assertTrue(self.second.acquire())
+        self.assertFalse(self.first.acquire())
+
+    def test_initialize_errors_propagate(self):
+        """
+        Only a lock row created by another process is ignored, not a broken table
+        """
+        conn = self.storage.connect()
+        conn.execute("DROP TABLE SchedulerLock")
+        conn.execute("CREATE TABLE SchedulerLock (name VARCHAR(64) PRIMARY KEY)")
+        conn.commit()
+        self.storage.release(conn)
+        with self.assertRaises(sqlite3.OperationalError):
+            LeaderLock(self.storage, owner="third").initialize()
+
+    def test_release(self):
+        """
+        A released lease can be taken immediately
+        """
+        self.assertTrue(self.first.acquire())
+        self.first.release()
+        self.assertFalse(self.first.held())
+        self.assertTrue(self.second.acquire())
+
+    def test_jobs_skipped_without_lease(self):
+        """
+        Scheduled jobs only run while the lease is held
+        """
+        calls = []
+        job = worker._leader_only(self.first, lambda: calls.append(1))  # pylint: disable=protected-access
+        job()
+        self.first.acquire()
+        job()
+        self.assertEqual(calls, [1])
+
+    def test_one_worker_runs_the_scheduler(self):
+        """
+        Of two workers only the leader runs the scheduler; the other takes
+        over when the leader stops
+        """
+        FakeScheduler.running = []
+        stops = [threading.Event(), threading.Event()]
+        with patch.object(worker, "build_scheduler", FakeScheduler):
+            threads = [
+                threading.Thread(target=worker.run, args=(lock, stop, 0.05))
+                for lock, stop in zip((self.first, self.second), stops)
+            ]
+            threads[0].start()
+            time.sleep(0.2)
+            threads[1].start()
+            time.sleep(0.3)
+            self.assertEqual(FakeScheduler.running, ["first"])
+
+            stops[0].set()
+            threads[0].join()
+            time.sleep(0.3)
+            self.assertEqual(FakeScheduler.running, ["second"])
+
+            stops[1].set()
+            threads[1].join()
+        self.assertEqual(FakeScheduler.running, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
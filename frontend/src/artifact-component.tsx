@@ -44,6 +44,7 @@ const LoginPage = ({ setUser }) => {
     setError("");
     try {
       const response = await fetch(`${API_BASE_URL}/log`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ username, password }),
@@ -67,6 +68,7 @@ const LoginPage = ({ setUser }) => {
     setError("");
     try {
       const response = await fetch(`${API_BASE_URL}/`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ username, password, email }),
@@ -92,6 +94,7 @@ const LoginPage = ({ setUser }) => {
     setError("");
     try {
       const response = await fetch(`${API_BASE_URL}/guest`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ guest: "guest" }),
@@ -202,6 +205,7 @@ const SearchPage = () => {
 
     try {
       const response = await fetch(`${API_BASE_URL}/search`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/x-www-form-urlencoded" },
         body: `q=${encodeURIComponent(term)}`,
@@ -236,6 +240,7 @@ const handleSelectMovie = async (movieTitle: string) => {
   try {
     // Fetch IMDb ID using new `/get_imdb_id` route
     const response = await fetch(`${API_BASE_URL}/get_imdb_id`, {
+      credentials: "include",
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ movie_name: movieTitle }),
@@ -368,6 +373,7 @@ const RecommendationsPage = ({ user }: { user: string | null }) => {
     const movies = userMovies.split(",").map((movie) => movie.trim());
     try {
       const response = await fetch(`${API_BASE_URL}/${recommendationType}`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ movie_list: movies }),
@@ -404,6 +410,7 @@ const RecommendationsPage = ({ user }: { user: string | null }) => {
   const handleSelectMovie = async (movieTitle: string) => {
     try {
       const response = await fetch(`${API_BASE_URL}/get_imdb_id`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ movie_name: movieTitle }),
@@ -481,7 +488,7 @@ const WatchlistPage = ({ user }) => {
 
   const fetchWatchlist = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/getWatchlistData`);
+      const response = await fetch(`${API_BASE_URL}/getWatchlistData`, { credentials: "include" });
       if (response.ok) {
         const data = await response.json();
         setWatchlist(data);
@@ -507,6 +514,7 @@ const WatchlistPage = ({ user }) => {
   const handleAddToWatchlist = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/add_to_watchlist`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ movieName: movieToAdd }),
@@ -536,6 +544,7 @@ const WatchlistPage = ({ user }) => {
   const handleDeleteFromWatchlist = async (imdb_id) => {
     try {
       const response = await fetch(`${API_BASE_URL}/deleteWatchlistData`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(imdb_id), // Corrected line
@@ -643,7 +652,7 @@ const WatchedHistoryPage = ({ user }) => {
 
   const fetchWatchedHistory = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/getWatchedHistoryData`);
+      const response = await fetch(`${API_BASE_URL}/getWatchedHistoryData`, { credentials: "include" });
       if (response.ok) {
         const data = await response.json();
         setWatchedHistory(data);
@@ -662,6 +671,7 @@ const WatchedHistoryPage = ({ user }) => {
   const handleDeleteFromWatchedHistory = async (imdb_id) => {
     try {
       const response = await fetch(`${API_BASE_URL}/removeFromWatchedHistory`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ imdb_id: imdb_id }), // Send as an object
@@ -696,6 +706,7 @@ const WatchedHistoryPage = ({ user }) => {
 
     try {
       const response = await fetch(`${API_BASE_URL}/add_to_watched_history`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -823,7 +834,7 @@ const WallPage = ({ user }) => {
 
   const fetchWallPosts = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/getWallData`);
+      const response = await fetch(`${API_BASE_URL}/getWallData`, { credentials: "include" });
       if (response.ok) {
         const data = await response.json();
         setWallPosts(data);
@@ -852,6 +863,7 @@ const WallPage = ({ user }) => {
 
     try {
       const response = await fetch(`${API_BASE_URL}/review`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -1006,7 +1018,7 @@ const FriendsPage = ({ user }) => {
 
   const fetchFriends = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/getFriends`);
+      const response = await fetch(`${API_BASE_URL}/getFriends`, { credentials: "include" });
       if (response.ok) {
         const data = await response.json();
         const usernames = data.map((item) => item[0]); // Extract usernames
@@ -1022,6 +1034,7 @@ const FriendsPage = ({ user }) => {
   const handleAddFriend = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/friend`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ username: friendUsername }),
@@ -1043,6 +1056,7 @@ const FriendsPage = ({ user }) => {
   const fetchFriendActivity = async (friend) => {
     try {
       const response = await fetch(`${API_BASE_URL}/getRecentFriendMovies`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(friend),
@@ -1067,6 +1081,7 @@ const FriendsPage = ({ user }) => {
   const handleSelectMovie = async (movieTitle) => {
     try {
       const response = await fetch(`${API_BASE_URL}/get_imdb_id`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ movie_name: movieTitle }),
@@ -1200,7 +1215,7 @@ const MoviePage = ({ user }) => {
   const fetchDiscussion = async () => {
     try {
       const response = await fetch(
-        `${API_BASE_URL}/movieDiscussion/${movieId}`
+        `${API_BASE_URL}/movieDiscussion/${movieId}`, { credentials: "include" }
       );
       if (response.ok) {
         const data = await response.json();
@@ -1228,6 +1243,7 @@ const MoviePage = ({ user }) => {
       const response = await fetch(
         `${API_BASE_URL}/movieDiscussion/${movieId}`,
         {
+          credentials: "include",
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ user: user, comment: comment }),
@@ -1353,6 +1369,7 @@ const RecommendationGenieTab: React.FC = () => {
     setLoading(true);
     try {
       const response = await fetch(`${API_BASE_URL}/ai_recommendations`, {
+        credentials: "include",
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query }),
@@ -1399,7 +1416,7 @@ const RecommendationGenieTab: React.FC = () => {
                 <span className="text-sm font-medium">{index + 1}.</span>
                 <span className="flex-1">{movie[0]}</span>
                 <img 
-                  src={`http://localhost:5000/thumbnails/${movie[1].split('/').pop()}`}
+                  src={`http://localhost:5000/thumbnails/${movie[1].split('/').pop()}?w=154`}
                   alt={`${movie[0]} poster`}
                   className="w-16 h-24 object-cover rounded"
                   onError={(e: React.SyntheticEvent<HTMLImageElement>) => {
@@ -1437,7 +1454,7 @@ const App = () => {
 
   const handleLogout = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/out`, { method: "POST" });
+      const response = await fetch(`${API_BASE_URL}/out`, { credentials: "include", method: "POST" });
       if (response.ok) {
         setUser(null);
       } else {